@@ -1,10 +1,16 @@
 import os
+import sys
 import json
-from pymongo import MongoClient
 
-# MongoDB 연결
-client = MongoClient("mongodb://localhost:32017")
-db = client["consumption_db"]
+# MongoDB 연결 - 소비 기록 쓰기는 fastapi-backend 의 ledger_store.append_records 를 그대로 사용
+# (users.profile.records + transactions 동시 기록, ledger_version 증가, 월별 집계 갱신)
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:32017")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fastapi-backend"))
+
+from app.db import get_consumption_db, close_mongo  # noqa: E402
+from app.ledger_store import append_records  # noqa: E402
+
+db = get_consumption_db()
 collection = db["users"]
 
 # 사용자 매핑
@@ -38,6 +44,7 @@ file_list = os.listdir(folder)
 
 # 사용자별 데이터 묶기
 user_data = {}
+user_records = {}
 
 for filename in file_list:
     if filename.endswith(".json"):
@@ -71,12 +78,18 @@ for filename in file_list:
                 }
             }
 
-        # ✅ 날짜별 소비목록 그대로 누적
-        user_data[key]["profile"]["records"].extend(records)
+        # ✅ 날짜별 소비목록 그대로 누적 (저장은 append_records 로)
+        user_records.setdefault(key, []).extend(records)
 
 # MongoDB 저장
 collection.delete_many({})  # 기존 데이터 제거 (선택)
-for doc in user_data.values():
+# 사용자를 지웠으니 파생 데이터(transactions, 월별 집계)도 함께 비움
+db["transactions"].delete_many({})
+db["monthly_rollups"].delete_many({})
+for key, doc in user_data.items():
     collection.insert_one(doc)
+    count = append_records(doc["username"], user_records.get(key, []))
+    print(f"✅ {doc['username']}: 소비 항목 {count}개")
+close_mongo()
 
 print("MongoDB 저장 완료!")
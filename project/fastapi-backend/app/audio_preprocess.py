@@ -0,0 +1,119 @@
+# app/audio_preprocess.py ← STT 전처리: 앞뒤 무음 잘라내기 + 16kHz 모노 변환 (WAV/PCM)
+#
+# 일기 녹음은 앞뒤로 긴 무음이 붙고 44.1/48kHz 스테레오로 올라오는 경우가 많다.
+# Whisper 는 16kHz 모노로 처리하므로 그 이상은 업로드 시간만 늘린다.
+#   1. wave 로 PCM 디코딩 (8/16/24/32bit 정수)
+#   2. 채널 평균으로 모노 다운믹스
+#   3. 20ms 프레임 RMS(dBFS) 를 NumPy 로 한 번에 계산 → STT_VAD_THRESHOLD_DB 넘는 첫/마지막 프레임 사이만 남김 (앞뒤 여유 STT_VAD_PAD_MS)
+#   4. 16kHz 로 리샘플 (박스 필터로 앨리어싱 완화 후 선형 보간) → 16bit WAV
+# 압축 포맷(webm/opus 등)은 건드리지 않는다.
+import io
+import os
+import wave
+import numpy as np
+
+STT_TARGET_SAMPLE_RATE = 16000
+STT_VAD_THRESHOLD_DB = float(os.getenv("STT_VAD_THRESHOLD_DB", "-40"))
+STT_VAD_FRAME_MS = 20
+STT_VAD_PAD_MS = float(os.getenv("STT_VAD_PAD_MS", "200"))
+STT_PREPROCESS_MAX_BYTES = int(os.getenv("STT_PREPROCESS_MAX_BYTES", str(100 * 1024 * 1024)))
+
+
+class UnsupportedAudioError(Exception):
+    pass
+
+
+def is_wav(head):
+    return len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+
+
+def decode_wav(data):
+    """WAV bytes → (float32 [-1, 1] 배열 (frames, channels), sample_rate)"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as reader:
+            channels = reader.getnchannels()
+            width = reader.getsampwidth()
+            rate = reader.getframerate()
+            raw = reader.readframes(reader.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise UnsupportedAudioError(f"PCM WAV 가 아닙니다: {e}")
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        # 24bit: 3바이트씩 묶어 상위 바이트 부호 확장
+        triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        samples = np.where(values >= 1 << 23, values - (1 << 24), values).astype(np.float32) / (1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise UnsupportedAudioError(f"지원하지 않는 샘플 크기: {width}바이트")
+    usable = len(samples) - len(samples) % channels
+    return samples[:usable].reshape(-1, channels), rate
+
+
+def voiced_bounds(mono, rate, threshold_db=STT_VAD_THRESHOLD_DB, frame_ms=STT_VAD_FRAME_MS, pad_ms=STT_VAD_PAD_MS):
+    """(시작 샘플, 끝 샘플) - 프레임 에너지가 threshold_db 를 넘는 구간, 없으면 None"""
+    frame = max(1, int(rate * frame_ms / 1000))
+    count = len(mono) // frame
+    if count == 0:
+        return None
+    frames = mono[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    db = 20 * np.log10(np.maximum(rms, 1e-10))
+    voiced = np.flatnonzero(db > threshold_db)
+    if voiced.size == 0:
+        return None
+    pad = int(rate * pad_ms / 1000)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(mono), (voiced[-1] + 1) * frame + pad)
+    return start, end
+
+
+def resample(mono, rate, target=STT_TARGET_SAMPLE_RATE):
+    if rate == target or len(mono) == 0:
+        return mono
+    if rate > target:
+        # 다운샘플 전 이동 평균(박스 필터)으로 나이퀴스트 이상 성분을 줄임
+        width = int(np.ceil(rate / target))
+        if width > 1:
+            mono = np.convolve(mono, np.ones(width, dtype=np.float32) / width, mode="same")
+    length = int(round(len(mono) * target / rate))
+    positions = np.arange(length, dtype=np.float64) * (rate / target)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def encode_wav(mono, rate=STT_TARGET_SAMPLE_RATE):
+    pcm = (np.clip(mono, -1, 1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def preprocess_wav(data):
+    """WAV bytes → (16kHz 모노 16bit WAV bytes, 보고용 dict) - 블로킹(CPU)이라 to_thread 로 호출"""
+    samples, rate = decode_wav(data)
+    channels = samples.shape[1]
+    mono = samples.mean(axis=1) if channels > 1 else samples[:, 0]
+    input_seconds = len(mono) / rate if rate else 0
+
+    bounds = voiced_bounds(mono, rate)
+    if bounds is not None:
+        mono = mono[bounds[0]:bounds[1]]
+    output = resample(mono, rate)
+    encoded = encode_wav(output)
+    return encoded, {
+        "sample_rate_in": rate,
+        "channels_in": channels,
+        "input_seconds": round(input_seconds, 2),
+        "output_seconds": round(len(output) / STT_TARGET_SAMPLE_RATE, 2),
+        "trimmed_seconds": round(input_seconds - len(mono) / rate, 2) if rate else 0,
+        "voice_detected": bounds is not None,
+    }
@@ -0,0 +1,45 @@
+# app/categories.py ← 소비 항목 → 예산 카테고리 매핑 (coach, 월별 집계에서 공용)
+
+CATEGORY_MAP = {
+    # 식비 관련
+    "점심식사": "식비", "점심": "식비", "아침식사": "식비", "아침": "식비",
+    "저녁식사": "식비", "저녁": "식비", "식사": "식비",
+    "카페": "식비", "커피": "식비", "음료": "식비",
+    "식당": "식비", "배달": "식비", "배달음식": "식비",
+    "간식": "식비", "디저트": "식비", "음식": "식비",
+    
+    # 쇼핑 관련  
+    "스트레스 쇼핑": "쇼핑", "스트레스쇼핑": "쇼핑",
+    "패션": "쇼핑", "의류": "쇼핑", "옷": "쇼핑",
+    "온라인쇼핑": "쇼핑", "온라인 쇼핑": "쇼핑",
+    "화장품": "쇼핑", "뷰티": "쇼핑",
+    "액세서리": "쇼핑", "잡화": "쇼핑",
+    "생활용품": "쇼핑", "일용품": "쇼핑",
+    
+    # 교통 관련
+    "교통": "교통", "택시": "교통", "버스": "교통", "지하철": "교통",
+    "기차": "교통", "항공": "교통", "주유": "교통", "주차": "교통",
+    
+    # 문화/오락
+    "문화": "문화", "영화": "문화", "게임": "문화", "책": "문화",
+    "콘서트": "문화", "전시": "문화", "여행": "문화",
+    
+    # 의료/건강
+    "의료": "의료", "병원": "의료", "약국": "의료", "헬스": "의료",
+    "운동": "의료", "피트니스": "의료",
+    
+    # 기타
+    "업무비품": "기타", "교육": "기타", "세금": "기타",
+    "보험": "기타", "통신": "기타", "utilities": "기타"
+}
+
+
+# ✅ 카테고리 정규화 함수 개선
+def normalize_category_backend(category):
+    """백엔드용 카테고리 정규화 - 실제 소비를 예산 카테고리로 매핑"""
+    if not category or not isinstance(category, str):
+        return "기타"
+    
+    category = category.strip().lower()
+    
+    return CATEGORY_MAP.get(category, "기타")
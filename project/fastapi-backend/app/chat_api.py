@@ -1,13 +1,13 @@
 # filename: chat_api.py
 
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import os
+import json
 from dotenv import load_dotenv
 
-# 수정된 import: deprecated된 langchain.chat_models 대신 langchain_openai 사용
-from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 
@@ -15,14 +15,18 @@ from langchain_core.prompts import PromptTemplate
 from langchain import smith
 import langsmith
 
+from app.llm import get_chat_model, call_llm, stream_llm
+from app.response_cache import response_cache, message_fingerprint
+from app.resilience import CircuitOpenError
+
 load_dotenv()
 router = APIRouter()
 
-# LangChain LLM 초기화 (OpenAI 기반)
-llm = ChatOpenAI(
-    model="gpt-4",  # 필요 시 gpt-3.5-turbo, gpt-4o로 변경 가능
-    temperature=0,
-)
+# LangChain LLM 초기화 (OpenAI 기반, app.llm 의 공유 커넥션 풀 사용)
+CHAT_MODEL = "gpt-4"  # 필요 시 gpt-3.5-turbo, gpt-4o로 변경 가능
+llm = get_chat_model(CHAT_MODEL, temperature=0)
+# 아래 프롬프트를 바꾸면 버전을 올릴 것 (답변 캐시 키에 포함)
+CHAT_PROMPT_VERSION = "chat-v1"
 
 # LangChain 프롬프트 템플릿 구성
 prompt = PromptTemplate.from_template("""
@@ -47,17 +51,72 @@ class ChatResponse(BaseModel):
     reply: str
 
 # FastAPI 라우터 정의
+def reply_cache_key(message):
+    return message_fingerprint("chat", CHAT_PROMPT_VERSION, CHAT_MODEL, message)
+
+
 @router.post("/chat", response_model=ChatResponse)
-def chat_with_gpt(req: ChatRequest):
+async def chat_with_gpt(req: ChatRequest):
+    cache_key = reply_cache_key(req.message)
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        return ChatResponse(reply=cached)
     try:
         # LangSmith 추적을 위한 메타데이터 설정 (선택사항)
-        result = chain.invoke(
+        result = await call_llm(CHAT_MODEL, lambda: chain.ainvoke(
             {"message": req.message},
             config={
                 "tags": ["fastapi-chat"],
                 "metadata": {"user_id": req.user_id}
             }
-        )
+        ))
+        await response_cache.put(cache_key, result)
         return ChatResponse(reply=result)
+    except CircuitOpenError:
+        # 브레이커 열림 → 답변 문자열 대신 503 + Retry-After
+        raise
     except Exception as e:
-        return ChatResponse(reply=f"LangChain 호출 오류: {str(e)}")
\ No newline at end of file
+        return ChatResponse(reply=f"LangChain 호출 오류: {str(e)}")
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# 토큰 스트리밍 (Server-Sent Events) - 기존 JSON /chat 은 그대로 유지
+#   event: token  data: {"token": "..."}   (생성되는 대로)
+#   event: done   data: {"reply": "전체 답변"}
+#   event: error  data: {"error": "..."}
+@router.post("/chat/stream")
+async def chat_with_gpt_stream(req: ChatRequest):
+    cache_key = reply_cache_key(req.message)
+    cached = await response_cache.get(cache_key)
+
+    async def events():
+        if cached is not None:
+            yield sse_event("token", {"token": cached})
+            yield sse_event("done", {"reply": cached})
+            return
+        reply = []
+        try:
+            async for token in stream_llm(CHAT_MODEL, lambda: chain.astream(
+                {"message": req.message},
+                config={
+                    "tags": ["fastapi-chat", "stream"],
+                    "metadata": {"user_id": req.user_id}
+                }
+            )):
+                if token:
+                    reply.append(token)
+                    yield sse_event("token", {"token": token})
+            await response_cache.put(cache_key, "".join(reply))
+            yield sse_event("done", {"reply": "".join(reply)})
+        except Exception as e:
+            print(f"LangChain 스트리밍 오류: {e}")
+            yield sse_event("error", {"error": f"LangChain 호출 오류: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,26 +1,28 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
-import requests
-from openai import OpenAI
+import asyncio
+import time
 from dotenv import load_dotenv
 from fastapi.responses import StreamingResponse
 from io import BytesIO
+from app.llm import chat_completion, chat_completion_stream
+from app.response_cache import response_cache, message_fingerprint
+from app.resilience import CircuitOpenError
+from app.tts import ELEVEN_API_KEY, TTS_MAX_CHARS, SentenceSplitter, synthesize
 
 # .env 환경변수 로드
 load_dotenv()
 router = APIRouter()
 
 # API 키 설정
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-ELEVEN_API_KEY = os.getenv("ELEVEN_API_KEY")
+CHAT_MODEL = "gpt-4"
+# build_gpt_messages 프롬프트를 바꾸면 버전을 올릴 것 (답변 캐시 키에 포함)
+CHAT_PROMPT_VERSION = "chat-tts-v1"
+# 파이프라인 모드에서 동시에 합성할 문장 수 (순서는 유지)
+TTS_PIPELINE_CONCURRENCY = int(os.getenv("TTS_PIPELINE_CONCURRENCY", "2"))
 
-# 한국어에 더 적합한 VOICE_ID를 ElevenLabs Voice Library에서 찾아서 여기에 입력하세요.
-# 예시:
-# VOICE_ID = "21m00Tcm4TlvDq8ikWAM" # 한국어 여성 음성 (ElevenLabs 기본 Voice Library 중 하나)
-# VOICE_ID = "EXAVO3S0K6yihJmXm9mB" # 한국어 남성 음성 (ElevenLabs 기본 Voice Library 중 하나)
-# VOICE_ID = "YOUR_KOREAN_VOICE_ID_HERE" # 실제 사용하실 VOICE_ID로 변경 필요
-VOICE_ID = "uyVNoMrnUku1dZyVEXwD" # 임시 한국어 여성 Voice ID (ElevenLabs 기본 샘플 중 하나)
+# 음성(VOICE_ID), 모델, ElevenLabs 호출은 app/tts.py 에서 관리
 
 # 키 유효성 확인 (실제 배포 시에는 로깅 레벨 조정)
 print("✅ ELEVEN_API_KEY 로드됨:", bool(ELEVEN_API_KEY))
@@ -33,12 +35,8 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     reply: str
 
-# GPT만 사용하는 기존 엔드포인트
-@router.post("/chat", response_model=ChatResponse)
-def chat_with_gpt(req: ChatRequest):
-    message = req.message
-
-    gpt_messages = [
+def build_gpt_messages(message):
+    return [
         {
             "role": "system",
             "content": "당신은 감정 소비를 이해하고 공감하며 따뜻한 조언을 해주는 챗봇입니다. 현실적이고 부드러운 대안을 제공합니다."
@@ -49,13 +47,28 @@ def chat_with_gpt(req: ChatRequest):
         }
     ]
 
+def reply_cache_key(message):
+    return message_fingerprint("chat-tts", CHAT_PROMPT_VERSION, CHAT_MODEL, message)
+
+# GPT만 사용하는 기존 엔드포인트
+@router.post("/chat", response_model=ChatResponse)
+async def chat_with_gpt(req: ChatRequest):
+    message = req.message
+
+    gpt_messages = build_gpt_messages(message)
+
+    cache_key = reply_cache_key(message)
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        return ChatResponse(reply=cached)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=gpt_messages
-        )
-        reply = response.choices[0].message.content
+        reply = await chat_completion(gpt_messages, model=CHAT_MODEL)
+        await response_cache.put(cache_key, reply)
         return ChatResponse(reply=reply)
+    except CircuitOpenError:
+        # 브레이커 열림 → 사과 문구(200) 대신 503 + Retry-After
+        raise
     except Exception as e:
         # 오류 메시지를 사용자에게 직접 보여주기보다는 내부 로깅 후 일반적인 메시지 반환 권장
         print(f"GPT 호출 중 오류 발생: {e}")
@@ -64,71 +77,126 @@ def chat_with_gpt(req: ChatRequest):
 
 # GPT + TTS 동시 처리
 @router.post("/chat-tts")
-def chat_with_gpt_and_tts(req: ChatRequest):
+async def chat_with_gpt_and_tts(req: ChatRequest):
     message = req.message
 
-    # 1. GPT 응답 생성
-    gpt_messages = [
-        {
-            "role": "system",
-            "content": "당신은 감정 소비를 이해하고 공감하며 따뜻한 조언을 해주는 챗봇입니다. 현실적이고 부드러운 대안을 제공합니다."
-        },
-        {
-            "role": "user",
-            "content": f"{message}\n\n세 문장 이내로 따뜻하게 말하면서 명확한 감정 해소 대안을 제시해줘."
-        }
-    ]
-
+    # 1. GPT 응답 생성 (/chat 과 같은 프롬프트이므로 같은 캐시 키를 공유)
+    cache_key = reply_cache_key(message)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=gpt_messages
-        )
-        reply = response.choices[0].message.content.strip()
+        reply = await response_cache.get(cache_key)
+        if reply is None:
+            reply = (await chat_completion(build_gpt_messages(message), model=CHAT_MODEL)).strip()
+            await response_cache.put(cache_key, reply)
         print("🧠 GPT 응답:", reply)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         print(f"GPT 호출 실패: {e}")
         raise HTTPException(status_code=500, detail=f"GPT 응답 생성에 실패했습니다. {str(e)}")
 
-    # 2. TTS 요청 준비
-    # ElevenLabs API는 텍스트 길이에 제한이 있습니다 (무료 플랜 기준 약 5000자, 유료 플랜은 더 길어짐)
-    # 현재 코드는 4900자로 잘라내지만, 실제 제한에 맞춰 조정하는 것이 좋습니다.
-    if len(reply) > 4900: # 5000자 제한을 고려하여 안전하게 4900자로 설정
-        reply = reply[:4900]
+    # 2. TTS - ElevenLabs API는 텍스트 길이에 제한이 있어 4900자로 자름
+    if len(reply) > TTS_MAX_CHARS:
+        reply = reply[:TTS_MAX_CHARS]
         print("✂ 응답이 너무 길어 잘라냄")
 
-    tts_url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
-    tts_headers = {
-        "xi-api-key": ELEVEN_API_KEY,
-        "Content-Type": "application/json",
-        "Accept": "audio/mpeg"
-    }
-    tts_payload = {
-        "text": reply,
-        # eleven_monolingual_v1 대신 eleven_multilingual_v2 사용
-        "model_id": "eleven_multilingual_v2", # <-- 한국어 지원에 더 적합한 모델로 변경
-        "voice_settings": {
-            "stability": 0.7,
-            "similarity_boost": 0.7
-            # "style": 0.5, # eleven_v3에서 사용 가능한 설정 (감정 표현)
-            # "use_speaker_boost": True # eleven_v3에서 사용 가능한 설정
-        }
-    }
-
-    # 3. ElevenLabs 호출
+    # 3. ElevenLabs 호출 → mp3 파일 StreamingResponse로 반환
     try:
-        tts_response = requests.post(tts_url, json=tts_payload, headers=tts_headers)
-        print("🎤 TTS 응답 코드:", tts_response.status_code)
-
-        if tts_response.status_code != 200:
-            print("❌ TTS 응답 오류:", tts_response.text)
-            raise Exception(f"ElevenLabs TTS 오류: {tts_response.status_code} - {tts_response.text}")
-
-        # 4. mp3 파일 StreamingResponse로 반환
-        audio_stream = BytesIO(tts_response.content)
-        return StreamingResponse(audio_stream, media_type="audio/mpeg")
+        audio = await synthesize(reply)
+        return StreamingResponse(BytesIO(audio), media_type="audio/mpeg")
 
+    except CircuitOpenError:
+        raise
     except Exception as e:
         print(f"TTS 생성 실패: {e}")
         raise HTTPException(status_code=500, detail=f"음성 생성에 실패했습니다. {str(e)}")
 
+
+async def reply_sentences(message):
+    """GPT 답변을 문장 단위로 yield (캐시에 있으면 캐시된 답변을 나눠서) - 끝나면 전체 답변을 캐시에 저장"""
+    cache_key = reply_cache_key(message)
+    splitter = SentenceSplitter()
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        for sentence in splitter.feed(cached) + splitter.flush():
+            yield sentence
+        return
+
+    reply = []
+    async for token in chat_completion_stream(build_gpt_messages(message), model=CHAT_MODEL):
+        reply.append(token)
+        for sentence in splitter.feed(token):
+            yield sentence
+    for sentence in splitter.flush():
+        yield sentence
+    await response_cache.put(cache_key, "".join(reply).strip())
+
+
+async def pipeline_audio(message):
+    """문장이 완성되는 대로 TTS 를 시작하고, 합성된 mp3 조각을 문장 순서대로 yield
+
+    GPT 스트림(생산자)과 TTS 합성(최대 TTS_PIPELINE_CONCURRENCY 개 동시)이 겹쳐서 돌아가므로
+    첫 오디오까지 시간 ≈ 첫 문장 생성 + 첫 문장 합성.
+    """
+    pending = asyncio.Queue()
+    slots = asyncio.Semaphore(TTS_PIPELINE_CONCURRENCY)
+
+    async def synthesize_in_slot(sentence, previous_text):
+        async with slots:
+            return await synthesize(sentence, previous_text=previous_text)
+
+    async def produce():
+        previous = None
+        try:
+            async for sentence in reply_sentences(message):
+                pending.put_nowait(asyncio.create_task(synthesize_in_slot(sentence, previous)))
+                previous = sentence
+        finally:
+            pending.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            task = await pending.get()
+            if task is None:
+                break
+            yield await task
+        await producer  # GPT 스트림 오류 전달
+    finally:
+        producer.cancel()
+        while not pending.empty():
+            task = pending.get_nowait()
+            if task is not None:
+                task.cancel()
+
+
+# GPT → TTS 문장 단위 파이프라인 (mp3 조각을 순서대로 이어서 스트리밍)
+@router.post("/chat-tts/stream")
+async def chat_with_gpt_and_tts_stream(req: ChatRequest):
+    started = time.perf_counter()
+    chunks = pipeline_audio(req.message)
+
+    # 첫 조각까지는 기다렸다가 응답 시작 → GPT/TTS 실패를 정상적인 HTTP 오류로 돌려줄 수 있음
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="GPT 응답이 비어 있습니다.")
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"파이프라인 TTS 실패: {e}")
+        raise HTTPException(status_code=500, detail=f"음성 생성에 실패했습니다. {str(e)}")
+    print(f"🎧 첫 오디오 {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    async def body():
+        yield first
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            # 이미 일부 오디오를 보낸 뒤라 상태 코드를 바꿀 수 없음 - 여기서 끊음
+            print(f"파이프라인 중간 실패: {e}")
+        finally:
+            await chunks.aclose()
+        print(f"🎧 전체 오디오 {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    return StreamingResponse(body(), media_type="audio/mpeg", headers={"X-Accel-Buffering": "no"})
@@ -0,0 +1,74 @@
+# app/coach_results.py ← 미리 계산한 /coach 결과 저장소
+#
+# consumption_db.coaching_results 에 사용자별 최신 코칭 결과 1건을 보관한다.
+#   { username, month, fingerprint, result: {budgets, saving_goal, tips}, computed_by, computed_at }
+# fingerprint 는 코칭 입력(월 집계 + 프롬프트 버전 + 모델)의 해시라서, 소비 기록이 바뀌면 자연히 불일치 →
+# 요청 경로에서 다시 계산한다. 전체 사용자 일괄 계산은 scripts/precompute_coaching.py (야간 배치).
+import hashlib
+import json
+from datetime import datetime
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+from app.db import get_async_consumption_db
+
+COACHING_RESULTS_COLLECTION = "coaching_results"
+COACHING_RESULT_INDEXES = [
+    ([("username", ASCENDING)], {"name": "username", "unique": True}),
+]
+
+# 코칭 프롬프트에 들어가는 집계 필드
+FINGERPRINT_FIELDS = ("total_income", "total_expense", "by_category", "by_normalized")
+
+
+def coaching_results_collection():
+    return get_async_consumption_db()[COACHING_RESULTS_COLLECTION]
+
+
+def _canonical(value):
+    """$inc 로 쌓인 1000.0 과 직접 합산한 1000 이 같은 지문이 되도록 정수값 float 은 int 로"""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def rollup_fingerprint(month, rollup, *salt):
+    """월 + 코칭 입력 집계 (+ 프롬프트 버전/모델 등) 의 안정적인 해시"""
+    payload = {"month": month, "salt": list(salt), **{field: _canonical(rollup.get(field)) for field in FINGERPRINT_FIELDS}}
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def get_stored_coaching(username, fingerprint):
+    """fingerprint 가 일치하는 저장된 결과 (없거나 오래됐으면 None)"""
+    try:
+        return await coaching_results_collection().find_one(
+            {"username": username, "fingerprint": fingerprint},
+            {"_id": 0, "result": 1, "month": 1, "computed_by": 1, "computed_at": 1},
+        )
+    except PyMongoError as e:
+        print(f"⚠️ 코칭 결과 조회 실패: {e}")
+        return None
+
+
+async def get_stored_fingerprint(username):
+    doc = await coaching_results_collection().find_one({"username": username}, {"_id": 0, "fingerprint": 1})
+    return doc.get("fingerprint") if doc else None
+
+
+async def save_coaching(username, month, fingerprint, result, computed_by):
+    try:
+        await coaching_results_collection().update_one(
+            {"username": username},
+            {"$set": {
+                "month": month,
+                "fingerprint": fingerprint,
+                "result": result,
+                "computed_by": computed_by,
+                "computed_at": datetime.now(),
+            }},
+            upsert=True,
+        )
+    except PyMongoError as e:
+        print(f"⚠️ 코칭 결과 저장 실패: {e}")
@@ -3,19 +3,12 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
-import pymongo
-import os
 from dotenv import load_dotenv
+from app.db import get_async_emotion_db
 
 load_dotenv()
 router = APIRouter()
 
-# MongoDB 연결
-MONGO_URI = os.getenv("MONGODB_URI", "mongodb://mongodb.default.svc.cluster.local:27017")
-client = pymongo.MongoClient(MONGO_URI)
-db = client.emotion_spending
-print(f"DEBUG: Using emotion_spending database for conversations")
-
 class ConversationSummary(BaseModel):
     date: str
     spending: str
@@ -28,12 +21,12 @@ class ConversationSummary(BaseModel):
 async def get_user_conversations(user_id: str, limit: int = 10):
     """사용자의 최근 대화 기록 조회 - 날짜 정렬 문제 해결"""
     try:
-        collection = db.conversations
+        collection = get_async_emotion_db().conversations
         query = {"user_id": user_id}
         
         # 🔥 _id로 정렬 (가장 최근 생성된 순서)
         # _id는 MongoDB에서 자동으로 생성되는 ObjectId로, 생성 시간순으로 정렬됨
-        results = list(collection.find(query).sort("_id", -1).limit(limit))
+        results = await collection.find(query).sort("_id", -1).limit(limit).to_list(length=None)
         
         print(f"✅ Found {len(results)} conversations using _id sort")
         
@@ -91,10 +84,10 @@ async def get_user_conversations(user_id: str, limit: int = 10):
 async def get_latest_conversation(user_id: str):
     """사용자의 가장 최근 대화 조회 - _id 기준으로 수정"""
     try:
-        collection = db.conversations
+        collection = get_async_emotion_db().conversations
         
         # 🔥 _id로 정렬 (가장 최근 생성된 문서)
-        latest = collection.find_one(
+        latest = await collection.find_one(
             {"user_id": user_id},
             sort=[("_id", -1)]
         )
@@ -136,10 +129,10 @@ async def get_latest_conversation(user_id: str):
 async def get_all_dates(user_id: str):
     """모든 대화의 날짜 확인용"""
     try:
-        collection = db.conversations
+        collection = get_async_emotion_db().conversations
         
-        # 모든 문서를 _id 순으로 정렬
-        all_docs = list(collection.find({"user_id": user_id}).sort("_id", -1))
+        # 모든 문서를 _id 순으로 정렬 (날짜 확인용이므로 date만 조회)
+        all_docs = await collection.find({"user_id": user_id}, {"date": 1}).sort("_id", -1).to_list(length=None)
         
         dates_info = []
         for doc in all_docs:
@@ -165,7 +158,7 @@ async def get_conversation_analytics(user_id: str):
         thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         
         # 먼저 모든 대화를 가져온 후 필터링
-        all_conversations = list(db.conversations.find({"user_id": user_id}))
+        all_conversations = await get_async_emotion_db().conversations.find({"user_id": user_id}).to_list(length=None)
         
         # 날짜 필터링 (문자열 비교로)
         conversations = []
@@ -213,10 +206,11 @@ async def get_conversation_analytics(user_id: str):
 async def debug_conversations(user_id: str):
     """디버깅용 - 사용자의 모든 대화 구조 확인"""
     try:
+        db = get_async_emotion_db()
         collection = db.conversations
         
         # 해당 사용자의 모든 문서 조회
-        all_docs = list(collection.find({"user_id": user_id}))
+        all_docs = await collection.find({"user_id": user_id}).to_list(length=None)
         
         debug_info = {
             "total_documents": len(all_docs),
@@ -243,9 +237,9 @@ async def debug_conversations(user_id: str):
         
         # 컬렉션 정보
         debug_info["collection_info"] = {
-            "total_docs_in_collection": collection.count_documents({}),
-            "user_docs_count": collection.count_documents({"user_id": user_id}),
-            "available_collections": db.list_collection_names()
+            "total_docs_in_collection": await collection.count_documents({}),
+            "user_docs_count": await collection.count_documents({"user_id": user_id}),
+            "available_collections": await db.list_collection_names()
         }
         
         return debug_info
@@ -1,16 +1,12 @@
 from fastapi import APIRouter, HTTPException # HTTPException도 import하는 것이 좋습니다.
 from pydantic import BaseModel
-from pymongo import MongoClient
 from typing import List
-import os
+from app.db import get_emotion_db
 
 router = APIRouter()
 
-mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-client = MongoClient(mongo_uri)
-db = client["emotion_spending"]
-collection = db["conversations"]
-print(f"DEBUG: MongoDB URI used by FastAPI: {mongo_uri}")
+def get_collection():
+    return get_emotion_db()["conversations"]
 
 class HistoryItem(BaseModel):
     role: str
@@ -31,7 +27,7 @@ def save_conversation(log: ConvoLog):
         }
         print(f"DEBUG: Attempting to insert doc: {doc}") # 삽입 시도 전 데이터 확인
         
-        result = collection.insert_one(doc) # <-- 여기를 수정했습니다!
+        result = get_collection().insert_one(doc) # <-- 여기를 수정했습니다!
         
         print(f"DEBUG: Data inserted with ID: {result.inserted_id}") # 삽입 성공 시 ID 출력
         return {"message": "대화 로그 저장 완료", "id": str(result.inserted_id)} # ID도 함께 반환 (선택 사항)
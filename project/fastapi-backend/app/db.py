@@ -0,0 +1,185 @@
+# app/db.py ← 모든 라우터가 공유하는 MongoDB 연결 (커넥션 풀 1개)
+import os
+import threading
+from pymongo import MongoClient, monitoring
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ✅ 연결 설정 - 풀 크기/타임아웃은 환경변수로 조정
+MONGODB_URI = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI") or "mongodb://mongodb.default.svc.cluster.local:27017"
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+
+CONSUMPTION_DB_NAME = "consumption_db"
+EMOTION_DB_NAME = "emotion_spending"
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """커넥션 풀 이벤트를 집계하는 리스너 (/metrics 에서 조회)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checked_out": 0,
+            "checked_in": 0,
+            "checkout_failures": 0,
+            "wait_queue_timeouts": 0,
+            "pool_cleared": 0,
+        }
+
+    def _inc(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["in_use"] = stats["checked_out"] - stats["checked_in"]
+        stats["open"] = stats["connections_created"] - stats["connections_closed"]
+        return stats
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc("pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc("connections_closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._inc("checkout_failures")
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self._inc("wait_queue_timeouts")
+
+    def connection_checked_out(self, event):
+        self._inc("checked_out")
+
+    def connection_checked_in(self, event):
+        self._inc("checked_in")
+
+
+pool_metrics = PoolMetricsListener()
+async_pool_metrics = PoolMetricsListener()
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def client_options():
+    """MongoClient 공통 옵션"""
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+
+
+def init_mongo():
+    """공용 MongoClient 생성 - 연결은 백그라운드에서 이루어지므로 ping 없이 바로 반환"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(MONGODB_URI, event_listeners=[pool_metrics], **client_options())
+            print(f"DEBUG: Shared MongoDB client created (maxPoolSize={MONGO_MAX_POOL_SIZE}, "
+                  f"waitQueueTimeoutMS={MONGO_WAIT_QUEUE_TIMEOUT_MS})")
+    return _client
+
+
+def init_async_mongo():
+    """async def 라우트용 Motor 클라이언트 - 이벤트 루프 안(lifespan)에서 생성"""
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncIOMotorClient(MONGODB_URI, event_listeners=[async_pool_metrics], **client_options())
+            print("DEBUG: Shared async MongoDB client created")
+    return _async_client
+
+
+def close_mongo():
+    """lifespan 종료 시 커넥션 풀 정리"""
+    global _client, _async_client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+            print("DEBUG: Shared MongoDB client closed")
+        if _async_client is not None:
+            _async_client.close()
+            _async_client = None
+            print("DEBUG: Shared async MongoDB client closed")
+
+
+def get_client():
+    """공용 MongoClient 반환 (lifespan 밖에서 호출되면 지연 생성)"""
+    return _client if _client is not None else init_mongo()
+
+
+def get_consumption_db():
+    return get_client()[CONSUMPTION_DB_NAME]
+
+
+def get_emotion_db():
+    return get_client()[EMOTION_DB_NAME]
+
+
+def get_async_client():
+    """공용 Motor 클라이언트 반환 (lifespan 밖에서 호출되면 지연 생성)"""
+    return _async_client if _async_client is not None else init_async_mongo()
+
+
+def get_async_consumption_db():
+    return get_async_client()[CONSUMPTION_DB_NAME]
+
+
+def get_async_emotion_db():
+    return get_async_client()[EMOTION_DB_NAME]
+
+
+def get_users_collection():
+    """consumption_db.users - 사용자 소비 기록"""
+    return get_consumption_db().users
+
+
+def pool_stats():
+    """커넥션 풀 설정 + 이벤트 카운터"""
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "initialized": _client is not None,
+        **pool_metrics.snapshot(),
+        "async": {
+            "initialized": _async_client is not None,
+            **async_pool_metrics.snapshot(),
+        },
+    }
@@ -1,22 +1,24 @@
 # app/diary_api.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-import pymongo
-import os
 import re
 import random
+import base64
+import heapq
+import json
+from itertools import islice
+from bson import ObjectId
 from dotenv import load_dotenv
+from app.db import get_async_consumption_db
+from app.ledger_store import find_ledger_user_async, load_ledger_async, load_record_page_async
+from app.ledger_parser import parse_records
+from app.rollups import get_user_rollups_async, diary_rollup_update, summarize_month
 
 load_dotenv()
 router = APIRouter()
 
-# MongoDB 연결
-MONGO_URI = os.getenv("MONGODB_URI", "mongodb://mongodb.default.svc.cluster.local:27017")
-client = pymongo.MongoClient(MONGO_URI)
-db = client.consumption_db
-
 class ReceiptData(BaseModel):
     store: str
     items: List[str]
@@ -184,45 +186,176 @@ def calculate_satisfaction(상세내역: str) -> int:
         return 3
     return 2
 
+# ---------- 조언 카탈로그 (정적 문구 - scripts/prerender_tts.py 가 음성으로 미리 합성) ----------
+
+NIGHT_ADVICE = {
+    "충동구매": [
+        "밤에 쇼핑하면 다음날 후회 확률 90%! 폰 충전기 뽑고 잠시 눈 좀 붙여보세요 😴",
+        "새벽 쇼핑의 유혹... 내일 아침에도 정말 갖고 싶을까요? 일단 자고 생각해보기!",
+        "야밤에 들른 온라인 쇼핑몰... 장바구니에 담기만 하고 결제는 내일로 미뤄보세요!"
+    ],
+    "폭식": [
+        "야식의 유혹이 찾아왔군요! 물 한 잔 마시고 5분만 참아보세요 💧",
+        "배달앱 대신 수면앱을 켜보는 건 어떨까요? 잠이 최고의 야식 차단제예요!",
+        "새벽 폭식은 내일 아침 후회의 지름길... 따뜻한 차 한 잔으로 달래보세요 🍵"
+    ]
+}
+
+MORNING_ADVICE = {
+    "카페소비": ["아침 카페인 충전! 오늘 하루 화이팅하세요 ☕", "모닝 커피로 하루를 시작하는 소소한 행복이네요!"],
+    "충동구매": ["아침부터 쇼핑 욕구가? 오늘 할 일 리스트부터 작성해보는 건 어떨까요? 📝"]
+}
+
+AFTERNOON_ADVICE = {
+    "음식소비": ["점심시간 맛있는 한 끼! 오후도 힘내세요 🍽️", "맛있는 점심으로 오후 에너지 충전 완료!"],
+    "충동구매": ["오후 쇼핑 타임... 정말 필요한 건지 한 번 더 생각해보세요!", "일과 중 잠깐의 쇼핑 휴식? 잠시 산책은 어떨까요? 🚶‍♀️"]
+}
+
+EVENING_ADVICE = {
+    "음식소비": ["저녁 식사 시간! 맛있게 드세요 🌆", "하루 고생한 자신에게 주는 맛있는 저녁!"],
+    "충동구매": ["퇴근 후 쇼핑? 하루 동안 고생한 스트레스 때문일 수 있어요. 잠시 휴식부터!"]
+}
+
+CREATIVE_ADVICE_POOL = {
+    "충동구매": {
+        "스트레스": [
+            "쇼핑카트에 담기 → 30분 타이머 설정 → 여전히 갖고 싶으면 구매하기!",
+            "스트레스 쇼핑 대신 '내가 정말 좋아하는 것들' 리스트 만들어보기 📝",
+            "온라인 쇼핑몰 창 닫고 유튜브에서 '강아지 영상' 검색해보세요 🐕",
+            "쇼핑 욕구 = 뇌의 도파민 갈망! 대신 좋아하는 음악 들으며 춤춰보세요 💃",
+            "결제하기 전에 '6개월 뒤에도 이걸 쓸까?' 자문해보기!"
+        ],
+        "우울": [
+            "우울할 때 산 물건들 한 번 돌아보세요. 지금도 행복한가요? 🤔",
+            "쇼핑 대신 과거에 샀던 좋아하는 물건들을 다시 꺼내보세요 ✨",
+            "온라인 쇼핑몰 대신 예쁜 카페나 도서관에 가보는 건 어떨까요? ☕",
+            "우울쇼핑 = 일시적 기분전환. 진짜 필요한 건 따뜻한 위로일지도요 🤗"
+        ],
+        "지루함": [
+            "지루해서 쇼핑? 위시리스트 정리하기, 옷장 정리하기는 어떨까요? 🗂️",
+            "쇼핑 대신 새로운 취미 찾기 미션! 요리, 그림, 독서 중 하나 도전해보세요",
+            "지루함의 진짜 해결책은 새로운 자극! 동네 산책이나 친구 연락해보기 📞"
+        ]
+    },
+    "폭식": {
+        "스트레스": [
+            "배달앱 대신 스마트폰 타이머 5분 설정! 진짜 배고픈지 확인해보세요 ⏰",
+            "스트레스 폭식 전에 물 2컵 천천히 마시며 창밖 바라보기 💧",
+            "냉장고 문 앞에서 10까지 천천히 세어보세요. 여전히 배고픈가요?",
+            "폭식 욕구 = 감정의 신호! 지금 진짜 필요한 건 음식일까 위로일까요? 🤔",
+            "스트레스 먹기 대신 스트레스 해소 플레이리스트 만들어보기 🎵"
+        ],
+        "우울": [
+            "우울할 때 음식으로 마음을 달래려 하셨군요. 마음이 많이 힘드신가 봐요 💙",
+            "폭식 후의 죄책감보다는 지금의 마음을 돌봐주는 게 우선이에요",
+            "음식 대신 따뜻한 차 한 잔과 좋아하는 영상 하나는 어떨까요? 🍵",
+            "우울한 마음, 혼자 견디지 마세요. 누군가에게 연락해보는 건 어떨까요?"
+        ],
+        "지루함": [
+            "지루해서 먹는 건... 진짜 배고픔인지 입심심한지 구분해보세요!",
+            "지루함을 음식으로? 대신 손으로 할 수 있는 간단한 일 찾아보기 ✋",
+            "무료한 마음에 든 먹거리... 산책하며 팟캐스트 듣는 건 어떨까요? 🎧"
+        ]
+    },
+    "게임결제": {
+        "지루함": [
+            "게임 과금 전에 '이 돈으로 진짜 게임 하나 더 살 수 있는데?' 생각해보기 🎮",
+            "가챠 욕구 참기 어렵죠... 대신 무료 이벤트나 일일미션에 집중해보세요!",
+            "게임 과금 = 확률의 함정! 그 돈으로 확실한 재미를 찾아보는 건 어떨까요?"
+        ],
+        "성취욕구": [
+            "게임에서의 성취감도 좋지만, 현실에서의 작은 성취도 만들어보세요! 💪",
+            "과금으로 얻는 성취 vs 실력으로 얻는 성취... 어떤 게 더 뿌듯할까요?",
+            "게임 실력 늘리기 도전! 공략 영상 보며 연습하는 건 어떨까요? 📚"
+        ]
+    },
+    "카페소비": {
+        "스트레스": [
+            "카페에서 잠시 쉬어가는 시간! 커피 향으로 마음의 여유를 찾으세요 ☕",
+            "카페 시간 = 나만의 힐링 타임! 좋아하는 음악과 함께 즐기세요 🎵",
+            "스트레스 받을 때 카페 한 잔... 완벽한 선택이에요! 마음의 쉼표 찍기 📍"
+        ],
+        "중립": [
+            "일상의 소소한 카페 타임! 오늘도 수고했어요 ✨",
+            "카페에서의 여유로운 시간, 자신에게 주는 작은 선물이네요 🎁",
+            "맛있는 커피 한 잔으로 에너지 충전! 좋은 하루 되세요 ☀️"
+        ]
+    },
+    "음식소비": {
+        "스트레스": [
+            "맛있는 음식으로 스트레스 해소! 가끔은 이런 힐링도 필요해요 🍽️",
+            "스트레스를 음식으로 달래는 마음 이해해요. 맛있게 드시고 마음도 달래세요",
+            "음식으로 위로받는 시간! 죄책감 갖지 마시고 잘 드세요 😊"
+        ],
+        "중립": [
+            "맛있는 한 끼! 음식은 삶의 즐거움 중 하나죠 🍴",
+            "좋은 음식과 함께하는 시간, 소중한 일상이에요",
+            "맛있게 드시고 든든한 하루 보내세요! 🌟"
+        ]
+    }
+}
+
+MONDAY_ADVICE = {
+    "충동구매": "월요병과 함께 온 쇼핑 욕구군요! 이번 주 목표부터 세워보는 건 어떨까요? 📅",
+    "폭식": "월요일 스트레스를 음식으로? 이번 주는 건강한 식단으로 시작해보세요! 🥗",
+    "카페소비": "월요일 모닝커피! 새로운 한 주를 활기차게 시작하세요 ☕"
+}
+
+FRIDAY_ADVICE = {
+    "충동구매": "불금 쇼핑? 주말에 더 즐거운 일들을 계획해보는 건 어떨까요? 🎉",
+    "폭식": "금요일 저녁 치킨? 일주일 고생한 자신에게 주는 선물이네요! 🍗",
+    "카페소비": "불금 카페 타임! 한 주 마무리 수고하셨어요 ✨"
+}
+
+WEEKEND_ADVICE = {
+    "충동구매": "주말 쇼핑! 평일에 스트레스 받았던 마음을 달래려 하시나요? 🛍️",
+    "폭식": "주말 맛집 탐방? 가끔은 이런 즐거움도 필요해요! 😋",
+    "카페소비": "여유로운 주말 카페 시간! 힐링하세요 🌸"
+}
+
+TIME_DEFAULT_ADVICE = {
+    "night": "늦은 시간 소비보다는 충분한 휴식이 필요해 보여요!",
+    "morning": "오늘도 건강한 하루 보내세요!",
+    "afternoon": "오후 시간을 알차게 보내고 계시네요!",
+    "evening": "저녁 시간 잘 보내고 계시네요!",
+}
+CREATIVE_DEFAULT_ADVICE = "건강한 소비 습관을 만들어가고 계시네요! 화이팅! 💪"
+AMOUNT_STATIC_ADVICE = [
+    "적당한 소비 수준이에요! 가끔은 자신에게 선물하는 것도 필요해요 ✨",
+    "소소한 소비! 일상의 작은 즐거움이네요 😊",
+]
+
+def advice_catalog() -> List[str]:
+    """generate_advice 가 돌려줄 수 있는 정적 문구 전체 (금액/유형이 끼워지는 문구 제외, 중복 제거)"""
+    texts = []
+    for advice_map in (NIGHT_ADVICE, MORNING_ADVICE, AFTERNOON_ADVICE, EVENING_ADVICE):
+        for advice_list in advice_map.values():
+            texts.extend(advice_list)
+    texts.extend(TIME_DEFAULT_ADVICE.values())
+    for by_emotion in CREATIVE_ADVICE_POOL.values():
+        for advice_list in by_emotion.values():
+            texts.extend(advice_list)
+    texts.append(CREATIVE_DEFAULT_ADVICE)
+    for advice_map in (MONDAY_ADVICE, FRIDAY_ADVICE, WEEKEND_ADVICE):
+        texts.extend(advice_map.values())
+    texts.extend(AMOUNT_STATIC_ADVICE)
+    return list(dict.fromkeys(texts))
+
 def get_time_based_advice(consumption_type: str, emotion: str) -> str:
     """시간대별 맞춤 조언"""
     current_hour = datetime.now().hour
     
     if 22 <= current_hour or current_hour <= 6:  # 야간 (10PM-6AM)
-        night_advice = {
-            "충동구매": [
-                "밤에 쇼핑하면 다음날 후회 확률 90%! 폰 충전기 뽑고 잠시 눈 좀 붙여보세요 😴",
-                "새벽 쇼핑의 유혹... 내일 아침에도 정말 갖고 싶을까요? 일단 자고 생각해보기!",
-                "야밤에 들른 온라인 쇼핑몰... 장바구니에 담기만 하고 결제는 내일로 미뤄보세요!"
-            ],
-            "폭식": [
-                "야식의 유혹이 찾아왔군요! 물 한 잔 마시고 5분만 참아보세요 💧",
-                "배달앱 대신 수면앱을 켜보는 건 어떨까요? 잠이 최고의 야식 차단제예요!",
-                "새벽 폭식은 내일 아침 후회의 지름길... 따뜻한 차 한 잔으로 달래보세요 🍵"
-            ]
-        }
-        return random.choice(night_advice.get(consumption_type, ["늦은 시간 소비보다는 충분한 휴식이 필요해 보여요!"]))
+        return random.choice(NIGHT_ADVICE.get(consumption_type, [TIME_DEFAULT_ADVICE["night"]]))
     
     elif 6 <= current_hour <= 11:  # 오전
-        morning_advice = {
-            "카페소비": ["아침 카페인 충전! 오늘 하루 화이팅하세요 ☕", "모닝 커피로 하루를 시작하는 소소한 행복이네요!"],
-            "충동구매": ["아침부터 쇼핑 욕구가? 오늘 할 일 리스트부터 작성해보는 건 어떨까요? 📝"]
-        }
-        return random.choice(morning_advice.get(consumption_type, ["오늘도 건강한 하루 보내세요!"]))
+        return random.choice(MORNING_ADVICE.get(consumption_type, [TIME_DEFAULT_ADVICE["morning"]]))
     
     elif 12 <= current_hour <= 18:  # 오후
-        afternoon_advice = {
-            "음식소비": ["점심시간 맛있는 한 끼! 오후도 힘내세요 🍽️", "맛있는 점심으로 오후 에너지 충전 완료!"],
-            "충동구매": ["오후 쇼핑 타임... 정말 필요한 건지 한 번 더 생각해보세요!", "일과 중 잠깐의 쇼핑 휴식? 잠시 산책은 어떨까요? 🚶‍♀️"]
-        }
-        return random.choice(afternoon_advice.get(consumption_type, ["오후 시간을 알차게 보내고 계시네요!"]))
+        return random.choice(AFTERNOON_ADVICE.get(consumption_type, [TIME_DEFAULT_ADVICE["afternoon"]]))
     
     else:  # 저녁 (6PM-10PM)
-        evening_advice = {
-            "음식소비": ["저녁 식사 시간! 맛있게 드세요 🌆", "하루 고생한 자신에게 주는 맛있는 저녁!"],
-            "충동구매": ["퇴근 후 쇼핑? 하루 동안 고생한 스트레스 때문일 수 있어요. 잠시 휴식부터!"]
-        }
-        return random.choice(evening_advice.get(consumption_type, ["저녁 시간 잘 보내고 계시네요!"]))
+        return random.choice(EVENING_ADVICE.get(consumption_type, [TIME_DEFAULT_ADVICE["evening"]]))
 
 def get_amount_based_advice(amount: int, consumption_type: str, emotion: str) -> str:
     """금액별 맞춤 조언"""
@@ -235,92 +368,13 @@ def get_amount_based_advice(amount: int, consumption_type: str, emotion: str) ->
     elif amount >= 50000:  # 5만원 이상
         return f"{amount:,}원... 중간 정도 소비네요. 만족도는 어떠셨나요?"
     elif amount >= 10000:  # 1만원 이상
-        return "적당한 소비 수준이에요! 가끔은 자신에게 선물하는 것도 필요해요 ✨"
+        return AMOUNT_STATIC_ADVICE[0]
     else:
-        return "소소한 소비! 일상의 작은 즐거움이네요 😊"
+        return AMOUNT_STATIC_ADVICE[1]
 
 def get_creative_advice_by_type(consumption_type: str, emotion: str) -> List[str]:
     """소비 유형별 창의적인 조언 모음"""
-    advice_pool = {
-        "충동구매": {
-            "스트레스": [
-                "쇼핑카트에 담기 → 30분 타이머 설정 → 여전히 갖고 싶으면 구매하기!",
-                "스트레스 쇼핑 대신 '내가 정말 좋아하는 것들' 리스트 만들어보기 📝",
-                "온라인 쇼핑몰 창 닫고 유튜브에서 '강아지 영상' 검색해보세요 🐕",
-                "쇼핑 욕구 = 뇌의 도파민 갈망! 대신 좋아하는 음악 들으며 춤춰보세요 💃",
-                "결제하기 전에 '6개월 뒤에도 이걸 쓸까?' 자문해보기!"
-            ],
-            "우울": [
-                "우울할 때 산 물건들 한 번 돌아보세요. 지금도 행복한가요? 🤔",
-                "쇼핑 대신 과거에 샀던 좋아하는 물건들을 다시 꺼내보세요 ✨",
-                "온라인 쇼핑몰 대신 예쁜 카페나 도서관에 가보는 건 어떨까요? ☕",
-                "우울쇼핑 = 일시적 기분전환. 진짜 필요한 건 따뜻한 위로일지도요 🤗"
-            ],
-            "지루함": [
-                "지루해서 쇼핑? 위시리스트 정리하기, 옷장 정리하기는 어떨까요? 🗂️",
-                "쇼핑 대신 새로운 취미 찾기 미션! 요리, 그림, 독서 중 하나 도전해보세요",
-                "지루함의 진짜 해결책은 새로운 자극! 동네 산책이나 친구 연락해보기 📞"
-            ]
-        },
-        "폭식": {
-            "스트레스": [
-                "배달앱 대신 스마트폰 타이머 5분 설정! 진짜 배고픈지 확인해보세요 ⏰",
-                "스트레스 폭식 전에 물 2컵 천천히 마시며 창밖 바라보기 💧",
-                "냉장고 문 앞에서 10까지 천천히 세어보세요. 여전히 배고픈가요?",
-                "폭식 욕구 = 감정의 신호! 지금 진짜 필요한 건 음식일까 위로일까요? 🤔",
-                "스트레스 먹기 대신 스트레스 해소 플레이리스트 만들어보기 🎵"
-            ],
-            "우울": [
-                "우울할 때 음식으로 마음을 달래려 하셨군요. 마음이 많이 힘드신가 봐요 💙",
-                "폭식 후의 죄책감보다는 지금의 마음을 돌봐주는 게 우선이에요",
-                "음식 대신 따뜻한 차 한 잔과 좋아하는 영상 하나는 어떨까요? 🍵",
-                "우울한 마음, 혼자 견디지 마세요. 누군가에게 연락해보는 건 어떨까요?"
-            ],
-            "지루함": [
-                "지루해서 먹는 건... 진짜 배고픔인지 입심심한지 구분해보세요!",
-                "지루함을 음식으로? 대신 손으로 할 수 있는 간단한 일 찾아보기 ✋",
-                "무료한 마음에 든 먹거리... 산책하며 팟캐스트 듣는 건 어떨까요? 🎧"
-            ]
-        },
-        "게임결제": {
-            "지루함": [
-                "게임 과금 전에 '이 돈으로 진짜 게임 하나 더 살 수 있는데?' 생각해보기 🎮",
-                "가챠 욕구 참기 어렵죠... 대신 무료 이벤트나 일일미션에 집중해보세요!",
-                "게임 과금 = 확률의 함정! 그 돈으로 확실한 재미를 찾아보는 건 어떨까요?"
-            ],
-            "성취욕구": [
-                "게임에서의 성취감도 좋지만, 현실에서의 작은 성취도 만들어보세요! 💪",
-                "과금으로 얻는 성취 vs 실력으로 얻는 성취... 어떤 게 더 뿌듯할까요?",
-                "게임 실력 늘리기 도전! 공략 영상 보며 연습하는 건 어떨까요? 📚"
-            ]
-        },
-        "카페소비": {
-            "스트레스": [
-                "카페에서 잠시 쉬어가는 시간! 커피 향으로 마음의 여유를 찾으세요 ☕",
-                "카페 시간 = 나만의 힐링 타임! 좋아하는 음악과 함께 즐기세요 🎵",
-                "스트레스 받을 때 카페 한 잔... 완벽한 선택이에요! 마음의 쉼표 찍기 📍"
-            ],
-            "중립": [
-                "일상의 소소한 카페 타임! 오늘도 수고했어요 ✨",
-                "카페에서의 여유로운 시간, 자신에게 주는 작은 선물이네요 🎁",
-                "맛있는 커피 한 잔으로 에너지 충전! 좋은 하루 되세요 ☀️"
-            ]
-        },
-        "음식소비": {
-            "스트레스": [
-                "맛있는 음식으로 스트레스 해소! 가끔은 이런 힐링도 필요해요 🍽️",
-                "스트레스를 음식으로 달래는 마음 이해해요. 맛있게 드시고 마음도 달래세요",
-                "음식으로 위로받는 시간! 죄책감 갖지 마시고 잘 드세요 😊"
-            ],
-            "중립": [
-                "맛있는 한 끼! 음식은 삶의 즐거움 중 하나죠 🍴",
-                "좋은 음식과 함께하는 시간, 소중한 일상이에요",
-                "맛있게 드시고 든든한 하루 보내세요! 🌟"
-            ]
-        }
-    }
-    
-    return advice_pool.get(consumption_type, {}).get(emotion, ["건강한 소비 습관을 만들어가고 계시네요! 화이팅! 💪"])
+    return CREATIVE_ADVICE_POOL.get(consumption_type, {}).get(emotion, [CREATIVE_DEFAULT_ADVICE])
 
 def get_contextual_advice(consumption_type: str, emotion: str) -> str:
     """요일/상황별 맞춤 조언"""
@@ -328,44 +382,29 @@ def get_contextual_advice(consumption_type: str, emotion: str) -> str:
     
     # 월요일 특별 조언
     if today.weekday() == 0:  # Monday
-        monday_advice = {
-            "충동구매": "월요병과 함께 온 쇼핑 욕구군요! 이번 주 목표부터 세워보는 건 어떨까요? 📅",
-            "폭식": "월요일 스트레스를 음식으로? 이번 주는 건강한 식단으로 시작해보세요! 🥗",
-            "카페소비": "월요일 모닝커피! 새로운 한 주를 활기차게 시작하세요 ☕"
-        }
-        if consumption_type in monday_advice:
-            return monday_advice[consumption_type]
+        if consumption_type in MONDAY_ADVICE:
+            return MONDAY_ADVICE[consumption_type]
     
     # 금요일 특별 조언
     elif today.weekday() == 4:  # Friday
-        friday_advice = {
-            "충동구매": "불금 쇼핑? 주말에 더 즐거운 일들을 계획해보는 건 어떨까요? 🎉",
-            "폭식": "금요일 저녁 치킨? 일주일 고생한 자신에게 주는 선물이네요! 🍗",
-            "카페소비": "불금 카페 타임! 한 주 마무리 수고하셨어요 ✨"
-        }
-        if consumption_type in friday_advice:
-            return friday_advice[consumption_type]
+        if consumption_type in FRIDAY_ADVICE:
+            return FRIDAY_ADVICE[consumption_type]
     
     # 주말 특별 조언
     elif today.weekday() in [5, 6]:  # Weekend
-        weekend_advice = {
-            "충동구매": "주말 쇼핑! 평일에 스트레스 받았던 마음을 달래려 하시나요? 🛍️",
-            "폭식": "주말 맛집 탐방? 가끔은 이런 즐거움도 필요해요! 😋",
-            "카페소비": "여유로운 주말 카페 시간! 힐링하세요 🌸"
-        }
-        if consumption_type in weekend_advice:
-            return weekend_advice[consumption_type]
+        if consumption_type in WEEKEND_ADVICE:
+            return WEEKEND_ADVICE[consumption_type]
     
     return None
 
-def check_repetitive_pattern(user_id: str, consumption_type: str) -> bool:
+async def check_repetitive_pattern(user_id: str, consumption_type: str) -> bool:
     """최근 반복 패턴 체크"""
     try:
         # 최근 7일간의 기록 확인
-        recent_entries = list(db.diary_entries.find({
+        recent_entries = await get_async_consumption_db().diary_entries.find({
             "user_id": user_id,
             "date": {"$gte": (datetime.now() - timedelta(days=7)).isoformat().split('T')[0]}
-        }).sort("date", -1).limit(10))
+        }).sort("date", -1).limit(10).to_list(length=10)
         
         # 같은 소비 타입이 3번 이상 반복되면 True
         same_type_count = sum(1 for entry in recent_entries if entry.get("consumptionType") == consumption_type)
@@ -373,7 +412,7 @@ def check_repetitive_pattern(user_id: str, consumption_type: str) -> bool:
     except:
         return False
 
-def generate_advice(emotion: str, consumption_type: str, amount: int, user_id: str = None) -> str:
+async def generate_advice(emotion: str, consumption_type: str, amount: int, user_id: str = None) -> str:
     """개선된 조언 생성 - 다양하고 창의적인 조언"""
     
     # 1. 시간대별 조언 우선 체크
@@ -393,7 +432,7 @@ def generate_advice(emotion: str, consumption_type: str, amount: int, user_id: s
             return amount_advice
     
     # 4. 반복 패턴 감지
-    if user_id and check_repetitive_pattern(user_id, consumption_type):
+    if user_id and await check_repetitive_pattern(user_id, consumption_type):
         repetitive_advice = f"최근 {consumption_type} 패턴이 반복되고 있어요! 잠시 다른 활동은 어떨까요? 🔄"
         if random.random() < 0.5:  # 50% 확률로 반복 패턴 조언
             return repetitive_advice
@@ -491,80 +530,163 @@ def validate_receipt_data(receipt_data: dict) -> dict:
     
     return receipt_data
 
+# ---------- /entries 키셋 페이지 ----------
+# 정렬 키 (date, source, seq) 내림차순. 같은 날짜면 새 일기(DIARY_SOURCE)가 기존 기록보다 먼저.
+#   기존 기록: (원본 날짜, 0, record_index)   새 일기: (저장된 date, 1, str(_id))
+# 날짜는 저장된 값 그대로 비교하고(검증/보정은 응답에만), 문자열이 아니면 "" 로 가장 오래된 쪽에 둔다.
+LEGACY_SOURCE = 0
+DIARY_SOURCE = 1
+DIARY_PAGE_DEFAULT = 50
+DIARY_PAGE_MAX = 200
+
+
+def encode_entry_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode()).decode()
+
+
+def decode_entry_cursor(cursor):
+    try:
+        date, source, seq = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if source == DIARY_SOURCE:
+            ObjectId(seq)
+        elif source != LEGACY_SOURCE or not isinstance(seq, int):
+            raise ValueError(source)
+        return (str(date), source, seq)
+    except Exception:
+        raise HTTPException(status_code=400, detail="잘못된 before 커서입니다")
+
+
+def legacy_main_item(record):
+    """기존 기록 한 건의 주요 항목 (금액이 가장 큰 지출), 일기로 보여줄 날이 아니면 None"""
+    items = parse_records([record]).items
+    if not items:
+        return None
+    main_item = max(items, key=lambda x: x.amount if x.kind == "지출" else 0)
+    return main_item if main_item.kind == "지출" else None
+
+
+async def fetch_legacy_page(user, before, limit):
+    """before 보다 앞선 기존 기록 중 일기로 보여줄 날을 최신순으로 limit 개까지 (레코드를 한 묶음씩만 조회)"""
+    # 새 일기 커서면 같은 날짜의 기존 기록은 모두 그 뒤 순서
+    bound = None if before is None else (before[0], before[2] if before[1] == LEGACY_SOURCE else None)
+    days = []
+    while len(days) < limit:
+        batch = await load_record_page_async(user, bound, limit)
+        for record_index, date_key, record in batch:
+            main_item = legacy_main_item(record)
+            if main_item is not None:
+                days.append(((date_key, LEGACY_SOURCE, record_index), main_item))
+        if len(batch) < limit:
+            break
+        bound = (batch[-1][1], batch[-1][0])
+    return days[:limit]
+
+
+def diary_entry_key(entry):
+    date = entry.get("date")
+    return (date if isinstance(date, str) else "", DIARY_SOURCE, str(entry["_id"]))
+
+
+async def fetch_diary_page(db, user_id, before, limit):
+    """diary_entries 를 (date, _id) 내림차순 키셋으로 limit 개까지
+
+    문자열 날짜는 (user_id, date, _id) 인덱스 범위로, 그 외(누락/숫자 등, 키 "")는 _id 순으로 따로 조회해 합친다.
+    """
+    string_query = {"user_id": user_id, "date": {"$type": "string"}}
+    other_query = {"user_id": user_id, "date": {"$not": {"$type": "string"}}}
+    if before:
+        date, source, seq = before
+        if source == DIARY_SOURCE:
+            string_query["$or"] = [{"date": {"$lt": date}}, {"date": date, "_id": {"$lt": ObjectId(seq)}}]
+        else:
+            string_query["date"]["$lt"] = date
+        if date == "":
+            if source != DIARY_SOURCE:
+                other_query = None
+            else:
+                other_query["_id"] = {"$lt": ObjectId(seq)}
+    entries = await db.diary_entries.find(string_query).sort([("date", -1), ("_id", -1)]).limit(limit).to_list(length=None)
+    if other_query is not None and len(entries) < limit:
+        entries += await db.diary_entries.find(other_query).sort("_id", -1).limit(limit).to_list(length=None)
+    page = sorted(((diary_entry_key(entry), entry) for entry in entries), key=lambda pair: pair[0], reverse=True)
+    return page[:limit]
+
+
 @router.get("/entries/{user_id}")
-async def get_diary_entries(user_id: str):
+async def get_diary_entries(
+    user_id: str,
+    limit: int = Query(DIARY_PAGE_DEFAULT, ge=1, le=DIARY_PAGE_MAX),
+    before: Optional[str] = Query(None, description="이전 응답의 next_cursor"),
+):
     try:
-        user = db.users.find_one({"username": user_id})
+        db = get_async_consumption_db()
+        user = await find_ledger_user_async(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다")
         
-        diary_entries = []
+        before_key = decode_entry_cursor(before) if before else None
         
-        # 1. 기존 데이터 (users 컬렉션의 profile.records)
-        records = user.get("profile", {}).get("records", [])
+        # 1. 기존 데이터 (소비 기록) 와 2. 새로 작성한 일기 (diary_entries) 를 최신순으로 병합
+        #    - 한 페이지(limit + 1개)만 꺼내고, 조언 생성 등 무거운 작업은 꺼낸 항목에만 수행
+        legacy_page = await fetch_legacy_page(user, before_key, limit + 1)
+        diary_page = await fetch_diary_page(db, user_id, before_key, limit + 1)
+        merged = heapq.merge(legacy_page, diary_page, key=lambda pair: pair[0], reverse=True)
+        page = list(islice(merged, limit + 1))
+        has_more = len(page) > limit
+        page = page[:limit]
         
-        for record in records:
-            date = record.get("날짜")
-            consumption_items = record.get("소비목록", [])
-            
-            # 날짜 검증
-            validated_date = validate_and_fix_date(date)
-            
-            # 해당 날짜의 소비 항목들을 하나의 일기로 합치기
-            if consumption_items:
-                total_amount = sum(item.get("금액", 0) for item in consumption_items if item.get("분류") == "지출")
+        diary_entries = []
+        for key, source in page:
+            if key[1] == LEGACY_SOURCE:
+                main_item = source
+                validated_date = validate_and_fix_date(key[0])
+                emotion = map_emotion_tag(main_item.emotion, main_item.detail)
+                consumption_type = classify_consumption_type(main_item.category, main_item.detail)
+                satisfaction = calculate_satisfaction(main_item.detail)
+                individual_amount = main_item.amount
+                advice = await generate_advice(emotion, consumption_type, individual_amount, user_id)
                 
-                # 주요 소비 항목 선택 (금액이 가장 큰 것)
-                main_item = max(consumption_items, key=lambda x: x.get("금액", 0) if x.get("분류") == "지출" else 0)
+                diary_entries.append({
+                    "id": validated_date,
+                    "date": validated_date,
+                    "text": main_item.detail,
+                    "emotion": emotion,
+                    "consumptionType": consumption_type,
+                    "amount": individual_amount,
+                    "satisfaction": satisfaction,
+                    "advice": advice,
+                    "emoji": get_emoji(consumption_type),
+                    "score": -1 if consumption_type in ["충동구매", "폭식"] else 0,
+                    "receiptData": None
+                })
+            else:
+                entry = source
+                # 저장된 날짜도 검증 (문자열이 아니면 키가 "" → 오늘 날짜)
+                validated_date = validate_and_fix_date(key[0])
                 
-                if main_item.get("분류") == "지출":
-                    emotion = map_emotion_tag(main_item.get("감정개입", ""), main_item.get("상세내역", ""))
-                    consumption_type = classify_consumption_type(main_item.get("항목", ""), main_item.get("상세내역", ""))
-                    satisfaction = calculate_satisfaction(main_item.get("상세내역", ""))
-                    individual_amount = main_item.get("금액", 0)
-                    advice = generate_advice(emotion, consumption_type, individual_amount, user_id)
-                    
-                    diary_entry = {
-                        "id": validated_date,
-                        "date": validated_date,
-                        "text": main_item.get("상세내역", ""),
-                        "emotion": emotion,
-                        "consumptionType": consumption_type,
-                        "amount": individual_amount,
-                        "satisfaction": satisfaction,
-                        "advice": advice,
-                        "emoji": get_emoji(consumption_type),
-                        "score": -1 if consumption_type in ["충동구매", "폭식"] else 0,
-                        "receiptData": None
-                    }
-                    diary_entries.append(diary_entry)
-        
-        # 2. 새로 작성한 일기 (diary_entries 컬렉션)
-        new_entries = db.diary_entries.find({"user_id": user_id})
-        for entry in new_entries:
-            # 저장된 날짜도 검증
-            validated_date = validate_and_fix_date(entry.get("date", ""))
-            
-            diary_entry = {
-                "id": str(entry["_id"]),
-                "date": validated_date,
-                "text": entry["text"],
-                "emotion": entry["emotion"],
-                "consumptionType": entry["consumptionType"],
-                "amount": entry["amount"],
-                "satisfaction": entry["satisfaction"],
-                "advice": entry["advice"],
-                "emoji": get_emoji(entry.get("consumptionType", "")),
-                "score": -1 if entry.get("consumptionType") in ["충동구매", "폭식"] else 0,
-                "receiptData": entry.get("receiptData")
-            }
-            diary_entries.append(diary_entry)
+                diary_entries.append({
+                    "id": str(entry["_id"]),
+                    "date": validated_date,
+                    "text": entry["text"],
+                    "emotion": entry["emotion"],
+                    "consumptionType": entry["consumptionType"],
+                    "amount": entry["amount"],
+                    "satisfaction": entry["satisfaction"],
+                    "advice": entry["advice"],
+                    "emoji": get_emoji(entry.get("consumptionType", "")),
+                    "score": -1 if entry.get("consumptionType") in ["충동구매", "폭식"] else 0,
+                    "receiptData": entry.get("receiptData")
+                })
         
-        # 3. 날짜순 정렬 (최신순)
-        diary_entries.sort(key=lambda x: x["date"], reverse=True)
-        
-        return {"entries": diary_entries, "total": len(diary_entries)}
+        return {
+            "entries": diary_entries,
+            "total": len(diary_entries),
+            "has_more": has_more,
+            "next_cursor": encode_entry_cursor(page[-1][0]) if has_more else None,
+        }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"데이터 조회 실패: {str(e)}")
         raise HTTPException(status_code=500, detail=f"데이터 조회 실패: {str(e)}")
@@ -607,7 +729,7 @@ async def create_diary_entry(user_id: str, entry: DiaryEntry):
             print(f"텍스트 기반 분석 결과: emotion={emotion}, type={consumption_type}, amount={amount}, date={date}")
         
         # 개선된 조언 생성 (user_id 포함)
-        advice = generate_advice(emotion, consumption_type, amount, user_id)
+        advice = await generate_advice(emotion, consumption_type, amount, user_id)
         print(f"생성된 조언: {advice}")
         
         new_entry = {
@@ -625,7 +747,9 @@ async def create_diary_entry(user_id: str, entry: DiaryEntry):
         
         print(f"저장할 데이터: {new_entry}")
         
-        result = db.diary_entries.insert_one(new_entry)
+        # 월별 집계 갱신 실패는 저장을 실패시키지 않음 (재시도 시 중복 저장 방지) - rollups_ready 만 내려감
+        async with diary_rollup_update(user_id, added=[new_entry]):
+            result = await get_async_consumption_db().diary_entries.insert_one(new_entry)
         print(f"저장 완료: {result.inserted_id}")
         
         return {"message": "저장 완료", "id": str(result.inserted_id)}
@@ -637,7 +761,8 @@ async def create_diary_entry(user_id: str, entry: DiaryEntry):
 @router.get("/analytics/{user_id}")
 async def get_consumption_analytics(user_id: str):
     try:
-        user = db.users.find_one({"username": user_id})
+        db = get_async_consumption_db()
+        user = await find_ledger_user_async(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다")
         
@@ -646,35 +771,24 @@ async def get_consumption_analytics(user_id: str):
         consumption_by_type = {}
         total_entries = 0
         
-        # 기존 데이터 분석
-        records = user.get("profile", {}).get("records", [])
+        # 월별 집계가 최신인 사용자는 집계 문서만 합산
+        rollups = await get_user_rollups_async(user)
+        if rollups is None:
+            # 기존 데이터 + 일기를 집계와 같은 규칙(summarize_month)으로 바로 계산 → rollups_ready 전후 숫자가 같음
+            ledger = await load_ledger_async(user)
+            diary_entries = await db.diary_entries.find(
+                {"user_id": user_id}, {"_id": 0, "date": 1, "amount": 1, "consumptionType": 1}
+            ).to_list(length=None)
+            rollups = [summarize_month(user_id, None, ledger.items, diary_entries)]
         
-        for record in records:
-            for item in record.get("소비목록", []):
-                if item.get("분류") == "지출":
-                    amount = item.get("금액", 0)
-                    total_spent += amount
-                    total_entries += 1
-                    
-                    item_type = item.get("항목", "")
-                    if item_type == "스트레스 쇼핑":
-                        stress_shopping_amount += amount
-                    
+        for rollup in rollups:
+            total_spent += rollup["total_expense"] + rollup["diary_amount"]
+            total_entries += rollup["expense_items"] + rollup["diary_count"]
+            stress_shopping_amount += rollup["by_category"].get("스트레스 쇼핑", 0) + rollup["diary_stress_amount"]
+            for source in (rollup["by_category"], rollup["diary_by_type"]):
+                for item_type, amount in source.items():
                     consumption_by_type[item_type] = consumption_by_type.get(item_type, 0) + amount
         
-        # 새로운 일기 데이터 분석
-        new_entries = db.diary_entries.find({"user_id": user_id})
-        for entry in new_entries:
-            amount = entry.get("amount", 0)
-            total_spent += amount
-            total_entries += 1
-            
-            consumption_type = entry.get("consumptionType", "")
-            if consumption_type in ["충동구매", "폭식"]:
-                stress_shopping_amount += amount
-            
-            consumption_by_type[consumption_type] = consumption_by_type.get(consumption_type, 0) + amount
-        
         return {
             "totalSpent": total_spent,
             "stressShoppingAmount": stress_shopping_amount,
@@ -731,16 +845,19 @@ async def fix_invalid_dates():
         current_date = datetime.now().isoformat().split('T')[0]
         
         # diary_entries 컬렉션의 잘못된 날짜 수정
-        entries = db.diary_entries.find({})
-        for entry in entries:
+        db = get_async_consumption_db()
+        entries = db.diary_entries.find({}, {"date": 1, "user_id": 1, "amount": 1, "consumptionType": 1})
+        async for entry in entries:
             original_date = entry.get('date', '')
             validated_date = validate_and_fix_date(original_date)
             
             if original_date != validated_date:
-                db.diary_entries.update_one(
-                    {"_id": entry["_id"]},
-                    {"$set": {"date": validated_date}}
-                )
+                # 월이 바뀔 수 있으므로 이전 월 집계에서 빼고 새 월에 더한다
+                async with diary_rollup_update(entry.get("user_id"), added=[{**entry, "date": validated_date}], removed=[entry]):
+                    await db.diary_entries.update_one(
+                        {"_id": entry["_id"]},
+                        {"$set": {"date": validated_date}}
+                    )
                 fixed_count += 1
                 print(f"날짜 수정: {original_date} → {validated_date}")
         
@@ -0,0 +1,167 @@
+# app/indexes.py ← 컬렉션 인덱스 선언/생성/점검
+#
+# 자주 쓰는 조회(HOT_QUERIES)가 의존하는 인덱스를 한곳에 선언한다.
+#   - ensure_indexes(): 선언된 인덱스 생성 (이미 있으면 no-op)
+#   - index_report():  선언됐지만 없는 인덱스 / $indexStats 기준 사용되지 않은 인덱스
+#   - check_query_plans(): explain 결과가 COLLSCAN 인 조회 경고
+# 서버 시작 시 백그라운드로 한 번 실행되고(MONGO_ENSURE_INDEXES=0 이면 생략),
+# 배포 전 점검은 scripts/ensure_indexes.py 로 한다.
+import os
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+from app.db import get_client, CONSUMPTION_DB_NAME, EMOTION_DB_NAME
+from app.ledger_store import TRANSACTION_INDEXES
+from app.rollups import ROLLUP_INDEXES
+from app.coach_results import COACHING_RESULTS_COLLECTION, COACHING_RESULT_INDEXES
+from app.response_cache import RESPONSE_CACHE_COLLECTION, RESPONSE_CACHE_INDEXES
+from app.stt import STT_CACHE_COLLECTION, STT_CACHE_INDEXES
+from app.tts_audio import TTS_AUDIO_COLLECTION, TTS_AUDIO_INDEXES, REPLAYABLE
+
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "1") != "0"
+
+# (db, collection) → [(keys, options)]
+INDEX_SPECS = {
+    (CONSUMPTION_DB_NAME, "users"): [
+        ([("username", ASCENDING)], {"name": "username"}),
+    ],
+    (CONSUMPTION_DB_NAME, "diary_entries"): [
+        # /diary/entries 키셋 페이지 (date, _id 내림차순), /diary/analytics, check_repetitive_pattern
+        ([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], {"name": "user_id_date_id"}),
+    ],
+    (CONSUMPTION_DB_NAME, "transactions"): TRANSACTION_INDEXES,
+    (CONSUMPTION_DB_NAME, "monthly_rollups"): ROLLUP_INDEXES,
+    (CONSUMPTION_DB_NAME, COACHING_RESULTS_COLLECTION): COACHING_RESULT_INDEXES,
+    (EMOTION_DB_NAME, "conversations"): [
+        # /conversations/{user_id} 최신순 (_id 내림차순)
+        ([("user_id", ASCENDING), ("_id", DESCENDING)], {"name": "user_id_id"}),
+    ],
+    (EMOTION_DB_NAME, "daily_emotion_logs"): [
+        ([("user_id", ASCENDING)], {"name": "user_id"}),
+    ],
+    (EMOTION_DB_NAME, RESPONSE_CACHE_COLLECTION): RESPONSE_CACHE_INDEXES,
+    (EMOTION_DB_NAME, TTS_AUDIO_COLLECTION): TTS_AUDIO_INDEXES,
+    (EMOTION_DB_NAME, STT_CACHE_COLLECTION): STT_CACHE_INDEXES,
+}
+
+# explain 으로 확인할 조회 형태 (값은 플랜 선택에 영향 없는 더미)
+PROBE_USER = "__index_probe__"
+HOT_QUERIES = [
+    ("diary recent pattern", CONSUMPTION_DB_NAME, "diary_entries",
+     {"user_id": PROBE_USER, "date": {"$gte": "2000-01-01"}}, [("date", DESCENDING)]),
+    ("diary by user", CONSUMPTION_DB_NAME, "diary_entries", {"user_id": PROBE_USER}, None),
+    ("diary entries page", CONSUMPTION_DB_NAME, "diary_entries",
+     {"user_id": PROBE_USER, "date": {"$lt": "2000-01-01"}}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    ("conversations latest", EMOTION_DB_NAME, "conversations", {"user_id": PROBE_USER}, [("_id", DESCENDING)]),
+    ("emotion logs", EMOTION_DB_NAME, "daily_emotion_logs", {"user_id": PROBE_USER}, None),
+    ("ledger user", CONSUMPTION_DB_NAME, "users", {"username": PROBE_USER}, None),
+    ("transactions month", CONSUMPTION_DB_NAME, "transactions",
+     {"username": PROBE_USER, "month": "2000-01"}, [("record_index", ASCENDING), ("item_index", ASCENDING)]),
+    ("monthly rollup", CONSUMPTION_DB_NAME, "monthly_rollups", {"username": PROBE_USER, "month": "2000-01"}, None),
+    ("coaching result", CONSUMPTION_DB_NAME, COACHING_RESULTS_COLLECTION,
+     {"username": PROBE_USER, "fingerprint": "0"}, None),
+    ("tts replay latest", EMOTION_DB_NAME, TTS_AUDIO_COLLECTION, {"user_id": PROBE_USER, **REPLAYABLE}, [("_id", DESCENDING)]),
+    ("tts replay file", EMOTION_DB_NAME, TTS_AUDIO_COLLECTION, {"s3_key": "tts_audio/__probe__.mp3"}, None),
+]
+
+# 마지막 점검 결과 (/metrics 에서 조회)
+last_report = {}
+
+
+def _collection(db_name, collection_name):
+    return get_client()[db_name][collection_name]
+
+
+def ensure_indexes():
+    """선언된 인덱스 생성 - 생성(또는 확인)한 인덱스 이름 목록 반환"""
+    created = []
+    for (db_name, collection_name), specs in INDEX_SPECS.items():
+        collection = _collection(db_name, collection_name)
+        for keys, options in specs:
+            try:
+                created.append(f"{db_name}.{collection_name}.{collection.create_index(keys, **options)}")
+            except OperationFailure as e:
+                # 같은 키가 다른 이름/옵션으로 이미 있는 경우 - 기존 인덱스를 그대로 두고 보고만 한다
+                print(f"⚠️ 인덱스 생성 건너뜀 ({db_name}.{collection_name} {options['name']}): {e}")
+    return created
+
+
+def _key_tuple(keys):
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys)
+
+
+def index_report():
+    """컬렉션별 누락 인덱스와 사용되지 않은 인덱스 ($indexStats ops == 0, 서버 재시작 이후 기준)"""
+    report = {}
+    for (db_name, collection_name), specs in INDEX_SPECS.items():
+        collection = _collection(db_name, collection_name)
+        existing = {
+            _key_tuple(info["key"]): name for name, info in collection.index_information().items()
+        }
+        missing = [options["name"] for keys, options in specs if _key_tuple(keys) not in existing]
+
+        unused = []
+        try:
+            for stat in collection.aggregate([{"$indexStats": {}}]):
+                if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0:
+                    unused.append(stat["name"])
+        except PyMongoError as e:
+            print(f"⚠️ $indexStats 조회 실패 ({db_name}.{collection_name}): {e}")
+
+        report[f"{db_name}.{collection_name}"] = {
+            "existing": sorted(existing.values()),
+            "missing": missing,
+            "unused": sorted(unused),
+        }
+        if missing:
+            print(f"⚠️ 인덱스 누락: {db_name}.{collection_name} {missing}")
+    return report
+
+
+def _plan_stages(plan):
+    """explain 결과의 winningPlan 트리에서 stage 이름 전부 수집"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+def check_query_plans():
+    """HOT_QUERIES 를 explain 해서 COLLSCAN 으로 실행되는 조회 경고 - {이름: 플랜 stage 목록}"""
+    plans = {}
+    for name, db_name, collection_name, query, sort in HOT_QUERIES:
+        cursor = _collection(db_name, collection_name).find(query).limit(10)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = cursor.explain()
+        except PyMongoError as e:
+            print(f"⚠️ explain 실패 ({name}): {e}")
+            continue
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        plans[name] = stages
+        if "COLLSCAN" in stages:
+            print(f"⚠️ COLLSCAN: '{name}' ({db_name}.{collection_name} {query}) - 인덱스를 확인하세요")
+    return plans
+
+
+def provision_indexes():
+    """인덱스 생성 → 누락/미사용 보고 → 조회 플랜 점검 (서버 시작 시, 스크립트에서 호출)"""
+    global last_report
+    report = {"checked_at": datetime.now().isoformat()}
+    try:
+        report["ensured"] = ensure_indexes()
+        report["collections"] = index_report()
+        report["plans"] = check_query_plans()
+        report["collscans"] = sorted(name for name, stages in report["plans"].items() if "COLLSCAN" in stages)
+    except PyMongoError as e:
+        report["error"] = str(e)
+        print(f"❌ 인덱스 점검 실패: {e}")
+    last_report = report
+    return report
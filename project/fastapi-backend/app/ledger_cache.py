@@ -0,0 +1,216 @@
+# app/ledger_cache.py ← 워커 프로세스 단위 사용자 소비 기록 캐시 (LRU + TTL + 바이트 상한)
+#
+# 대시보드 한 번에 /summary, /actuals, /coach, /diary/entries 가 같은 사용자를 연달아 조회한다.
+# 사용자 라우팅 문서(find_ledger_user 결과)와 CanonicalLedger, 거기서 나온 파생 결과(월 목록, 월 합계 등)를
+# username 단위로 보관해서 같은 워커 안에서는 MongoDB 왕복과 BSON 디코딩/집계를 한 번만 하게 한다.
+#   - 파생 결과는 사용자 문서 버전(ledger_version_key)이 같을 때만 재사용
+#   - 쓰기(append_records 등)는 invalidate(username) 로 즉시 무효화
+#   - 다른 워커/스크립트의 쓰기는 TTL(LEDGER_CACHE_TTL_SECONDS) 안에 반영
+#     (캐시된 라우팅 문서의 버전을 기준으로 하므로 파생 결과도 최대 TTL 만큼 늦을 수 있음)
+#   - 전체 크기가 LEDGER_CACHE_MAX_BYTES 를 넘으면 가장 오래 안 쓴 사용자부터 제거
+import os
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+
+LEDGER_CACHE_MAX_BYTES = int(os.getenv("LEDGER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LEDGER_CACHE_TTL_SECONDS = float(os.getenv("LEDGER_CACHE_TTL_SECONDS", "60"))
+
+ENTRY_OVERHEAD_BYTES = 512
+
+
+def ledger_version_key(user):
+    """사용자 문서가 교체되거나(_id) 저장소가 바뀌거나 기록이 추가되면(ledger_version) 달라지는 키"""
+    return (user.get("_id"), user.get("ledger_storage"), user.get("ledger_version", 0))
+
+
+def estimate_ledger_bytes(ledger):
+    """CanonicalLedger 메모리 사용량 근사치 (튜플 + 문자열 필드)"""
+    if ledger is None:
+        return 0
+    total = sys.getsizeof(ledger.items) + sum(sys.getsizeof(items) for items in ledger.by_month.values())
+    for item in ledger.items:
+        total += sys.getsizeof(item)
+        for value in item:
+            if isinstance(value, str):
+                total += sys.getsizeof(value)
+    return total
+
+
+def estimate_value_bytes(value):
+    """파생 결과(튜플/집합/dict/숫자) 메모리 사용량 근사치 - 한 단계 안쪽까지만"""
+    total = sys.getsizeof(value)
+    if isinstance(value, dict):
+        total += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        total += sum(sys.getsizeof(v) for v in value)
+    return total
+
+
+class _Entry:
+    __slots__ = ("user", "ledger", "derived", "version", "expires_at", "nbytes")
+
+    def __init__(self, user, expires_at):
+        self.user = user
+        self.ledger = None
+        self.derived = {}
+        self.version = ledger_version_key(user)
+        self.expires_at = expires_at
+        self.nbytes = ENTRY_OVERHEAD_BYTES
+
+
+class LedgerCache:
+    def __init__(self, max_bytes=LEDGER_CACHE_MAX_BYTES, ttl_seconds=LEDGER_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self.counters = {
+            "user_hits": 0,
+            "user_misses": 0,
+            "ledger_hits": 0,
+            "ledger_misses": 0,
+            "derived_hits": 0,
+            "derived_misses": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.ttl_seconds > 0
+
+    def _live_entry(self, username):
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop(username)
+            self.counters["expirations"] += 1
+            return None
+        self._entries.move_to_end(username)
+        return entry
+
+    def _drop(self, username):
+        entry = self._entries.pop(username, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            username = next(iter(self._entries))
+            self._drop(username)
+            self.counters["evictions"] += 1
+
+    def get_user(self, username):
+        """캐시된 사용자 라우팅 문서 (없거나 만료되면 None)"""
+        with self._lock:
+            entry = self._live_entry(username)
+            self.counters["user_hits" if entry else "user_misses"] += 1
+            return dict(entry.user) if entry else None
+
+    def put_user(self, user):
+        if not self.enabled or not user or not user.get("username"):
+            return user
+        username = user["username"]
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry.version == ledger_version_key(user):
+                # 같은 버전이면 파싱된 ledger 는 유지하고 만료 시각만 갱신
+                entry.user = dict(user)
+                entry.expires_at = time.monotonic() + self.ttl_seconds
+                self._entries.move_to_end(username)
+                return user
+            self._drop(username)
+            entry = _Entry(dict(user), time.monotonic() + self.ttl_seconds)
+            self._entries[username] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+        return user
+
+    def get_ledger(self, user):
+        """사용자 문서 버전이 같은 CanonicalLedger (없으면 None)"""
+        with self._lock:
+            entry = self._live_entry(user.get("username"))
+            if entry is not None and entry.ledger is not None and entry.version == ledger_version_key(user):
+                self.counters["ledger_hits"] += 1
+                return entry.ledger
+            self.counters["ledger_misses"] += 1
+            return None
+
+    def put_ledger(self, user, ledger):
+        if not self.enabled or not user.get("username"):
+            return ledger
+        nbytes = ENTRY_OVERHEAD_BYTES + estimate_ledger_bytes(ledger)
+        if nbytes > self.max_bytes:
+            return ledger
+        username = user["username"]
+        with self._lock:
+            previous = self._entries.get(username)
+            self._drop(username)
+            entry = _Entry(dict(user), time.monotonic() + self.ttl_seconds)
+            entry.ledger = ledger
+            if previous is not None and previous.version == entry.version:
+                # 같은 버전에서 이미 계산된 파생 결과는 유지
+                entry.derived = previous.derived
+                nbytes += previous.nbytes - ENTRY_OVERHEAD_BYTES - estimate_ledger_bytes(previous.ledger)
+            entry.nbytes = nbytes
+            self._entries[username] = entry
+            self._bytes += nbytes
+            self._evict()
+        return ledger
+
+    def get_derived(self, user, key):
+        """사용자 문서 버전이 같을 때 계산해 둔 파생 결과 (없으면 None)"""
+        with self._lock:
+            entry = self._live_entry(user.get("username"))
+            if entry is not None and entry.version == ledger_version_key(user) and key in entry.derived:
+                self.counters["derived_hits"] += 1
+                return entry.derived[key]
+            self.counters["derived_misses"] += 1
+            return None
+
+    def put_derived(self, user, key, value):
+        """파생 결과 저장 - 같은 버전의 캐시 항목(find_ledger_user 로 들어온 것)이 있을 때만"""
+        if not self.enabled or value is None:
+            return value
+        nbytes = estimate_value_bytes(value)
+        with self._lock:
+            entry = self._entries.get(user.get("username"))
+            if entry is None or entry.version != ledger_version_key(user) or key in entry.derived:
+                return value
+            entry.derived[key] = value
+            entry.nbytes += nbytes
+            self._bytes += nbytes
+            self._evict()
+        return value
+
+    def invalidate(self, username):
+        """사용자 기록이 바뀌는 쓰기 후 호출"""
+        with self._lock:
+            if username in self._entries:
+                self._drop(username)
+                self.counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        stats["ttl_seconds"] = self.ttl_seconds
+        for kind in ("user", "ledger", "derived"):
+            lookups = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_ratio"] = round(stats[f"{kind}_hits"] / lookups, 3) if lookups else 0
+        return stats
+
+
+ledger_cache = LedgerCache()
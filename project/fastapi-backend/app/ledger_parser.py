@@ -0,0 +1,127 @@
+# app/ledger_parser.py ← 소비 기록 정규화 (필드 별칭/날짜/금액 규칙을 한곳에서)
+#
+# users.profile.records 또는 transactions 에서 읽은 레코드를 한 번만 훑어
+# 항목 하나당 튜플 하나(LedgerItem)로 된 CanonicalLedger 를 만든다.
+# 결과는 app/ledger_cache.py 에 사용자 문서 버전(_id, ledger_storage, ledger_version) 단위로 캐시되어
+# 같은 버전이면 coach / diary / rollup 재계산이 모두 같은 객체를 재사용한다.
+from itertools import groupby
+from typing import NamedTuple, Optional
+
+DATE_FIELDS = ("날짜", "날", "date")
+ITEM_LIST_FIELDS = ("소비목록", "consumption_list", "items")
+ITEM_FIELDS = ("시간", "분류", "항목", "금액", "상세내역", "감정개입")
+
+
+def record_date(record):
+    """레코드의 날짜 필드 (날짜/날/date 중 먼저 있는 것)"""
+    for field in DATE_FIELDS:
+        if field in record:
+            return record[field]
+    return None
+
+
+def record_items(record):
+    """레코드의 소비목록 필드 (소비목록/consumption_list/items 중 먼저 있는 것)"""
+    for field in ITEM_LIST_FIELDS:
+        if field in record:
+            return record[field]
+    return None
+
+
+def month_of(date_value):
+    if isinstance(date_value, str) and len(date_value) >= 7:
+        return date_value[:7]
+    return None
+
+
+def item_kind(item):
+    return item.get("분류", item.get("type", ""))
+
+
+def item_category(item):
+    return item.get("항목", item.get("category", ""))
+
+
+def item_amount(item):
+    return item.get("금액", item.get("amount", 0))
+
+
+def coerce_amount(value):
+    """집계에 쓰는 금액 - 숫자(bool 제외)만 인정, 그 외는 0 (집계 파이프라인의 $type: number 와 같은 규칙)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return 0
+
+
+class LedgerItem(NamedTuple):
+    # 앞 네 필드 (month, kind, category, amount) 는 rollups.ledger_deltas 가 그대로 사용
+    month: Optional[str]
+    kind: str
+    category: str
+    amount: float
+    record_index: int
+    date: Optional[str]
+    time: Optional[str]
+    detail: str
+    emotion: str
+
+
+class CanonicalLedger:
+    """정규화된 소비 항목 목록 + 월별 인덱스"""
+    __slots__ = ("items", "by_month", "_derived")
+
+    def __init__(self, items):
+        self.items = items
+        self._derived = {}
+        self.by_month = {}
+        for item in items:
+            self.by_month.setdefault(item.month, []).append(item)
+
+    def months(self):
+        return set(self.by_month) - {None}
+
+    def month_items(self, month):
+        return self.by_month.get(month, [])
+
+    def derived(self, name, build):
+        """ledger 에서 파생된 뷰를 한 번만 계산해 보관 (ledger 가 캐시되는 동안 함께 재사용)"""
+        if name not in self._derived:
+            self._derived[name] = build(self)
+        return self._derived[name]
+
+    def records(self):
+        """레코드(날짜) 단위 묶음 - (record_index, date, [LedgerItem])"""
+        for record_index, group in groupby(self.items, key=lambda item: item.record_index):
+            group = list(group)
+            yield record_index, group[0].date, group
+
+
+def parse_records(records):
+    """레코드 목록 → CanonicalLedger (한 번만 순회)"""
+    items = []
+    append = items.append
+    for record_index, record in enumerate(records or ()):
+        if not isinstance(record, dict):
+            continue
+        raw_items = record_items(record)
+        if not isinstance(raw_items, list):
+            continue
+        date_value = record_date(record)
+        month = month_of(date_value)
+        for item in raw_items:
+            if not isinstance(item, dict):
+                continue
+            category = item_category(item)
+            append(LedgerItem(
+                month,
+                item_kind(item),
+                category.strip() if isinstance(category, str) else "",
+                coerce_amount(item_amount(item)),
+                record_index,
+                date_value,
+                item.get("시간"),
+                item.get("상세내역", "") or "",
+                item.get("감정개입", "") or "",
+            ))
+    return CanonicalLedger(items)
+
@@ -0,0 +1,436 @@
+# app/ledger_store.py ← 소비 기록 저장소 (users.profile.records → transactions 컬렉션)
+#
+# 소비목록 항목 하나당 문서 하나를 consumption_db.transactions 에 저장한다.
+# 마이그레이션(scripts/migrate_transactions.py)이 끝난 사용자는 users 문서에
+# ledger_storage="transactions" 표시가 붙고, 그 전까지는 기존 임베디드 배열을 읽는다 (dual-read).
+import os
+import re
+from itertools import groupby
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.db import get_consumption_db, get_async_consumption_db
+from app.rollups import apply_transactions, get_month_rollup
+from app.ledger_parser import (
+    DATE_FIELDS,
+    ITEM_LIST_FIELDS,
+    ITEM_FIELDS,
+    record_date,
+    record_items,
+    month_of,
+    item_kind,
+    item_category,
+    item_amount,
+    parse_records,
+)
+from app.ledger_cache import ledger_cache
+
+# embedded: 기존 users.profile.records 만 사용
+# dual: 마이그레이션 완료 표시가 있는 사용자만 transactions 사용 (기본값)
+# transactions: 항상 transactions 사용
+LEDGER_READ_MODE = os.getenv("LEDGER_READ_MODE", "dual")
+MIGRATED_MARKER = "transactions"
+DUPLICATE_KEY_ERROR = 11000
+
+TRANSACTION_INDEXES = [
+    ([("username", ASCENDING), ("month", ASCENDING), ("record_index", ASCENDING), ("item_index", ASCENDING)],
+     {"name": "username_month_record_item"}),
+    ([("username", ASCENDING), ("record_index", ASCENDING), ("item_index", ASCENDING)],
+     {"name": "username_record_item", "unique": True}),
+]
+
+USER_ROUTING_PROJECTION = {"_id": 1, "username": 1, "ledger_storage": 1, "ledger_version": 1, "rollups_ready": 1}
+EMBEDDED_PROJECTION = {"profile.records": 1}
+TRANSACTION_PROJECTION = {"_id": 0, "record_index": 1, "date": 1, **{field: 1 for field in ITEM_FIELDS}}
+
+
+def get_transactions_collection():
+    return get_consumption_db().transactions
+
+
+def ensure_transaction_indexes():
+    collection = get_transactions_collection()
+    for keys, options in TRANSACTION_INDEXES:
+        collection.create_index(keys, **options)
+
+
+def explode_records(username, records, start_index=0):
+    """임베디드 레코드 → transactions 문서 목록 (필드 별칭은 여기서 한 번만 정리)"""
+    docs = []
+    for record_index, record in enumerate(records, start_index):
+        if not isinstance(record, dict):
+            continue
+        items = record_items(record)
+        if not isinstance(items, list):
+            continue
+        date_value = record_date(record)
+        for item_index, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            docs.append({
+                "username": username,
+                "record_index": record_index,
+                "item_index": item_index,
+                "date": date_value,
+                "month": month_of(date_value),
+                "시간": item.get("시간"),
+                "분류": item_kind(item),
+                "항목": item_category(item),
+                "금액": item_amount(item),
+                "상세내역": item.get("상세내역", ""),
+                "감정개입": item.get("감정개입", ""),
+            })
+    return docs
+
+
+def regroup_transactions(docs):
+    """record_index 순으로 정렬된 transactions → 기존 레코드 형태 [{날짜, 소비목록}]"""
+    records = []
+    for _, group in groupby(docs, key=lambda doc: doc["record_index"]):
+        group = list(group)
+        records.append({
+            "날짜": group[0].get("date"),
+            "소비목록": [{field: doc.get(field) for field in ITEM_FIELDS} for doc in group],
+        })
+    return records
+
+
+def filter_embedded_records(user_doc, month=None):
+    records = (user_doc or {}).get("profile", {}).get("records", [])
+    if not isinstance(records, list):
+        return []
+    if not month:
+        return records
+    return [
+        record for record in records
+        if isinstance(record, dict) and isinstance(record_date(record), str) and record_date(record).startswith(month)
+    ]
+
+
+def uses_transactions(user):
+    if LEDGER_READ_MODE == "transactions":
+        return True
+    if LEDGER_READ_MODE == "embedded":
+        return False
+    return user.get("ledger_storage") == MIGRATED_MARKER
+
+
+def month_prefix_filter(month):
+    """날짜 문자열 prefix 매칭 (기존 date.startswith(month) 와 동일)"""
+    return {"$regex": f"^{re.escape(month)}"}
+
+
+def transaction_query(username, month=None):
+    query = {"username": username}
+    if month and len(month) == 7:
+        query["month"] = month
+    elif month:
+        query["date"] = month_prefix_filter(month)
+    return query
+
+
+# ---------- 집계 파이프라인 (월 합계/카테고리 합계를 서버에서 계산) ----------
+
+def _first_present(*paths):
+    """$ifNull 체인 - 별칭 필드 중 먼저 값이 있는 것"""
+    expr = paths[-1]
+    for path in reversed(paths[:-1]):
+        expr = {"$ifNull": [path, expr]}
+    return expr
+
+
+# ---------- 임베디드 배열 월 단위 projection (해당 월 레코드/날짜만 전송) ----------
+
+EMBEDDED_RECORDS_ARRAY = {"$cond": [{"$isArray": "$profile.records"}, "$profile.records", []]}
+
+
+def _string_date_expr(record_var):
+    """레코드 날짜 (날짜/날/date 중 값이 있는 것, 문자열이 아니면 "")"""
+    date = _first_present(*(f"{record_var}.{field}" for field in DATE_FIELDS), "")
+    return {"$cond": [{"$eq": [{"$type": date}, "string"]}, date, ""]}
+
+
+def month_records_expr(month):
+    """$filter - profile.records 중 날짜가 month 로 시작하는 레코드만 (date.startswith(month) 와 동일)"""
+    return {"$filter": {
+        "input": EMBEDDED_RECORDS_ARRAY,
+        "as": "record",
+        "cond": {"$regexMatch": {"input": _string_date_expr("$$record"), "regex": f"^{re.escape(month)}"}},
+    }}
+
+
+# 레코드 본문 없이 "YYYY-MM" 목록만 (서버에서 중복 제거)
+EMBEDDED_MONTHS_PROJECTION = {
+    "_id": 0,
+    "months": {"$setUnion": [{"$map": {
+        "input": EMBEDDED_RECORDS_ARRAY,
+        "as": "record",
+        "in": {"$substrCP": [_string_date_expr("$$record"), 0, 7]},
+    }}]},
+}
+
+
+def embedded_records_projection(month=None):
+    if not month:
+        return EMBEDDED_PROJECTION
+    return {"_id": 0, "records": month_records_expr(month)}
+
+
+def embedded_records_of(user_doc, month=None):
+    if not month:
+        return filter_embedded_records(user_doc)
+    records = (user_doc or {}).get("records")
+    return records if isinstance(records, list) else []
+
+
+def _embedded_item_stages(user_id, month):
+    """users 문서의 임베디드 배열을 transactions 와 같은 {분류, 항목, 금액} 형태로 펼치는 단계"""
+    return [
+        {"$match": {"_id": user_id}},
+        {"$project": {"_id": 0, "record": month_records_expr(month)}},
+        {"$unwind": "$record"},
+        {"$project": {"items": _first_present(*(f"$record.{field}" for field in ITEM_LIST_FIELDS))}},
+        # 소비목록이 배열이 아니면 건너뜀 ($unwind 는 배열이 아닌 값을 항목 하나로 취급 - parse_records 와 맞춤)
+        {"$match": {"$expr": {"$isArray": "$items"}}},
+        {"$unwind": "$items"},
+        {"$match": {"items": {"$type": "object"}}},
+        {"$project": {
+            "분류": _first_present("$items.분류", "$items.type", ""),
+            "항목": _first_present("$items.항목", "$items.category", ""),
+            "금액": _first_present("$items.금액", "$items.amount", 0),
+        }},
+    ]
+
+
+POSITIVE_AMOUNT = {"금액": {"$type": "number", "$gt": 0}}
+
+MONTH_SUMMARY_STAGES = [
+    {"$match": POSITIVE_AMOUNT},
+    {"$group": {
+        "_id": None,
+        "total_income": {"$sum": {"$cond": [{"$eq": ["$분류", "수입"]}, "$금액", 0]}},
+        "total_expense": {"$sum": {"$cond": [{"$eq": ["$분류", "지출"]}, "$금액", 0]}},
+        "processed_items": {"$sum": 1},
+    }},
+]
+
+CATEGORY_TOTAL_STAGES = [
+    {"$match": {"분류": "지출", "항목": {"$type": "string"}, **POSITIVE_AMOUNT}},
+    {"$project": {"금액": 1, "category": {"$trim": {"input": "$항목"}}}},
+    {"$match": {"category": {"$ne": ""}}},
+    {"$group": {"_id": "$category", "total": {"$sum": "$금액"}}},
+]
+
+
+def _aggregate_month(user, month, tail_stages):
+    if uses_transactions(user):
+        return list(get_transactions_collection().aggregate(
+            [{"$match": transaction_query(user["username"], month)}, *tail_stages]
+        ))
+    return list(get_consumption_db().users.aggregate(_embedded_item_stages(user["_id"], month) + tail_stages))
+
+
+def month_summary(user, month):
+    """해당 월 (총 수입, 총 지출, 처리 항목 수) - 금액이 양수인 숫자 항목만 집계"""
+    result = _aggregate_month(user, month, MONTH_SUMMARY_STAGES)
+    if not result:
+        return 0, 0, 0
+    return result[0]["total_income"], result[0]["total_expense"], result[0]["processed_items"]
+
+
+def month_category_totals(user, month):
+    """해당 월 지출 항목별 합계 {항목: 금액}"""
+    return {row["_id"]: row["total"] for row in _aggregate_month(user, month, CATEGORY_TOTAL_STAGES)}
+
+
+# ---------- 동기 (def 라우트용) ----------
+
+def find_ledger_user(username):
+    """사용자 존재 확인 + 저장소 판별용 최소 projection 조회 (워커 캐시 우선)"""
+    user = ledger_cache.get_user(username)
+    if user is None:
+        user = ledger_cache.put_user(get_consumption_db().users.find_one({"username": username}, USER_ROUTING_PROJECTION))
+    return user
+
+
+def load_records(user, month=None):
+    """사용자 레코드를 기존 형태로 반환 (month 지정 시 해당 월만)"""
+    if uses_transactions(user):
+        cursor = get_transactions_collection().find(
+            transaction_query(user["username"], month), TRANSACTION_PROJECTION
+        ).sort([("record_index", ASCENDING), ("item_index", ASCENDING)])
+        return regroup_transactions(cursor)
+
+    user_doc = get_consumption_db().users.find_one({"_id": user["_id"]}, embedded_records_projection(month))
+    return embedded_records_of(user_doc, month)
+
+
+def _query_months(user):
+    if uses_transactions(user):
+        return {m for m in get_transactions_collection().distinct("month", {"username": user["username"]}) if m}
+    user_doc = get_consumption_db().users.find_one({"_id": user["_id"]}, EMBEDDED_MONTHS_PROJECTION) or {}
+    return {m for m in user_doc.get("months") or () if len(m) == 7}
+
+
+def load_months(user):
+    """데이터가 있는 월 목록 (정렬 안 됨, 문서 버전이 같으면 캐시된 결과 재사용)"""
+    months = ledger_cache.get_derived(user, "months")
+    if months is None:
+        months = ledger_cache.put_derived(user, "months", frozenset(_query_months(user)))
+    return set(months)
+
+
+def month_totals(user, month):
+    """해당 월 (총 수입, 총 지출, 처리 항목 수) - 월별 집계 문서 우선, 없으면 집계 파이프라인 (버전 단위 캐시)"""
+    key = ("month_totals", month)
+    totals = ledger_cache.get_derived(user, key)
+    if totals is None:
+        rollup = get_month_rollup(user, month) if len(month) == 7 else None
+        if rollup is not None:
+            totals = (rollup["total_income"], rollup["total_expense"], rollup["processed_items"])
+        else:
+            totals = month_summary(user, month)
+        ledger_cache.put_derived(user, key, tuple(totals))
+    return tuple(totals)
+
+
+def month_actuals(user, month):
+    """해당 월 지출 항목별 합계 - 월별 집계 문서 우선, 없으면 집계 파이프라인 (버전 단위 캐시)"""
+    key = ("month_actuals", month)
+    actuals = ledger_cache.get_derived(user, key)
+    if actuals is None:
+        rollup = get_month_rollup(user, month)
+        actuals = rollup["by_category"] if rollup is not None else month_category_totals(user, month)
+        ledger_cache.put_derived(user, key, dict(actuals))
+    return dict(actuals)
+
+
+def load_ledger(user):
+    """사용자 전체 기록의 CanonicalLedger (문서 버전이 같으면 캐시된 결과 재사용)"""
+    return ledger_cache.get_ledger(user) or ledger_cache.put_ledger(user, parse_records(load_records(user)))
+
+
+def load_month_items(user, month):
+    """한 달치 LedgerItem - 전체 ledger 가 캐시돼 있으면 거기서, 아니면 해당 월만 조회"""
+    ledger = ledger_cache.get_ledger(user)
+    if ledger is None:
+        ledger = parse_records(load_records(user, month))
+    return ledger.month_items(month)
+
+
+# ---------- 비동기 (async def 라우트용, Motor) ----------
+
+async def find_ledger_user_async(username):
+    user = ledger_cache.get_user(username)
+    if user is None:
+        user = ledger_cache.put_user(
+            await get_async_consumption_db().users.find_one({"username": username}, USER_ROUTING_PROJECTION)
+        )
+    return user
+
+
+async def load_records_async(user, month=None):
+    db = get_async_consumption_db()
+    if uses_transactions(user):
+        cursor = db.transactions.find(
+            transaction_query(user["username"], month), TRANSACTION_PROJECTION
+        ).sort([("record_index", ASCENDING), ("item_index", ASCENDING)])
+        return regroup_transactions(await cursor.to_list(length=None))
+
+    user_doc = await db.users.find_one({"_id": user["_id"]}, embedded_records_projection(month))
+    return embedded_records_of(user_doc, month)
+
+
+async def load_ledger_async(user):
+    return ledger_cache.get_ledger(user) or ledger_cache.put_ledger(user, parse_records(await load_records_async(user)))
+
+
+# ---------- 레코드 키셋 페이지 (전체 ledger 를 읽지 않고 한 페이지씩) ----------
+# 정렬 키 (date_key, record_index) 내림차순. date_key 는 원본 날짜 문자열, 문자열이 아니면 "" (가장 오래된 쪽).
+
+def _record_keyset_stages(before):
+    """before=(date_key, record_index) 보다 앞선 레코드만, record_index 가 None 이면 그 날짜 전체 포함"""
+    if before is None:
+        return []
+    date_key, record_index = before
+    if record_index is None:
+        return [{"$match": {"date_key": {"$lte": date_key}}}]
+    return [{"$match": {"$or": [
+        {"date_key": {"$lt": date_key}},
+        {"date_key": date_key, "record_index": {"$lt": record_index}},
+    ]}}]
+
+
+def record_page_pipeline(user, before, limit):
+    """(컬렉션 이름, 파이프라인) - 결과 문서는 {record_index, date_key, record(기존 레코드 형태)}"""
+    tail = [*_record_keyset_stages(before), {"$sort": {"date_key": -1, "record_index": -1}}, {"$limit": limit}]
+    if uses_transactions(user):
+        return "transactions", [
+            {"$match": {"username": user["username"]}},
+            {"$sort": {"record_index": 1, "item_index": 1}},
+            {"$group": {
+                "_id": "$record_index",
+                "date": {"$first": "$date"},
+                "items": {"$push": {field: f"${field}" for field in ITEM_FIELDS}},
+            }},
+            {"$project": {
+                "_id": 0,
+                "record_index": "$_id",
+                "date_key": {"$cond": [{"$eq": [{"$type": "$date"}, "string"]}, "$date", ""]},
+                "record": {"날짜": "$date", "소비목록": "$items"},
+            }},
+            *tail,
+        ]
+    return "users", [
+        {"$match": {"_id": user["_id"]}},
+        {"$project": {"_id": 0, "record": EMBEDDED_RECORDS_ARRAY}},
+        {"$unwind": {"path": "$record", "includeArrayIndex": "record_index"}},
+        {"$project": {"record": 1, "record_index": 1, "date_key": _string_date_expr("$record")}},
+        *tail,
+    ]
+
+
+async def load_record_page_async(user, before, limit):
+    """before 보다 앞선 레코드 limit 개 (최신순) - [(record_index, date_key, record)]"""
+    collection, pipeline = record_page_pipeline(user, before, limit)
+    cursor = get_async_consumption_db()[collection].aggregate(pipeline)
+    return [(doc["record_index"], doc["date_key"], doc["record"]) async for doc in cursor]
+
+
+# ---------- 쓰기 ----------
+
+def append_records(username, records):
+    """새 레코드 추가 - 호환 기간 동안 임베디드 배열과 transactions 에 함께 기록"""
+    records = list(records)
+    # 배열 추가와 record_index 범위 예약을 한 번의 원자적 갱신으로 (동시 추가 시 인덱스 충돌 방지)
+    # 갱신 전 문서의 배열 길이가 이번 레코드들의 시작 인덱스, ledger_version 증가 → 메모된 CanonicalLedger 무효화
+    appended = {"$concatArrays": [EMBEDDED_RECORDS_ARRAY, {"$literal": records}]}
+    user = get_consumption_db().users.find_one_and_update(
+        {"username": username},
+        [{"$set": {
+            "profile.records": appended,
+            "record_count": {"$size": appended},
+            "ledger_version": {"$add": [{"$ifNull": ["$ledger_version", 0]}, 1]},
+        }}],
+        projection={"_id": 1, "ledger_version": 1, "record_count": {"$size": EMBEDDED_RECORDS_ARRAY}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not user:
+        return 0
+    ledger_cache.invalidate(username)
+    docs = explode_records(username, records, user.get("record_count", 0))
+    if not docs:
+        return 0
+    try:
+        get_transactions_collection().insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # 일부만 실패해도 들어간 문서는 집계에 반영 (중복 키는 이미 있는 항목이라 무시)
+        errors = e.details.get("writeErrors", [])
+        failed = {error["index"] for error in errors}
+        docs = [doc for index, doc in enumerate(docs) if index not in failed]
+        apply_transactions(username, docs, user.get("ledger_version", 0))
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        print(f"⚠️ transactions 중복 항목 {len(failed)}개 건너뜀 ({username})")
+        return len(docs)
+    apply_transactions(username, docs, user.get("ledger_version", 0))
+    return len(docs)
@@ -0,0 +1,289 @@
+# app/llm.py ← 모든 라우터가 공유하는 비동기 OpenAI 클라이언트
+#
+# - AsyncOpenAI 하나 + keep-alive httpx 커넥션 풀 (LangChain ChatOpenAI 도 같은 풀 사용)
+# - 호출마다 deadline (세마포어 대기 시간 포함)
+# - 전역 세마포어로 동시 업스트림 호출 수 제한 → /chat 폭주가 다른 라우트의 스레드를 잡아먹지 않음
+# - 모델별 지연 시간 통계 (/metrics)
+# - app.resilience 의 "openai" 서킷 브레이커 + 전역 재시도 예산 (SDK 자체 재시도는 기본 0)
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+import httpx
+from openai import AsyncOpenAI, APITimeoutError
+from dotenv import load_dotenv
+from app.resilience import call_async, get_breaker
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# 재시도는 resilience.call_async 가 전역 예산 안에서 처리 (SDK 재시도까지 켜면 곱으로 늘어남)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "512"))
+
+_http_client = None
+_client = None
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+class LatencyStats:
+    """모델별 호출 수/오류/타임아웃과 최근 LLM_LATENCY_WINDOW 건의 지연 시간 분위수"""
+
+    def __init__(self, window=LLM_LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self._models = {}
+
+    def _model(self, model):
+        if model not in self._models:
+            self._models[model] = {
+                "calls": 0,
+                "errors": 0,
+                "timeouts": 0,
+                "samples": deque(maxlen=self._window),
+                "queue_wait_ms": deque(maxlen=self._window),
+                "ttft_ms": deque(maxlen=self._window),
+            }
+        return self._models[model]
+
+    def record(self, model, elapsed_ms, queue_wait_ms, outcome="ok", ttft_ms=None):
+        with self._lock:
+            stats = self._model(model)
+            if ttft_ms is not None:
+                stats["ttft_ms"].append(ttft_ms)
+            stats["calls"] += 1
+            if outcome == "timeout":
+                stats["timeouts"] += 1
+            elif outcome == "error":
+                stats["errors"] += 1
+            stats["samples"].append(elapsed_ms)
+            stats["queue_wait_ms"].append(queue_wait_ms)
+
+    @staticmethod
+    def _percentile(values, q):
+        if not values:
+            return 0
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                model: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "timeouts": stats["timeouts"],
+                    "p50_ms": self._percentile(stats["samples"], 0.5),
+                    "p95_ms": self._percentile(stats["samples"], 0.95),
+                    "max_ms": round(max(stats["samples"]), 1) if stats["samples"] else 0,
+                    "queue_wait_p95_ms": self._percentile(stats["queue_wait_ms"], 0.95),
+                    "ttft_p50_ms": self._percentile(stats["ttft_ms"], 0.5),
+                    "ttft_p95_ms": self._percentile(stats["ttft_ms"], 0.95),
+                }
+                for model, stats in self._models.items()
+            }
+
+
+latency_stats = LatencyStats()
+
+
+def llm_available():
+    return bool(OPENAI_API_KEY)
+
+
+def get_http_client():
+    """OpenAI 호출용 keep-alive httpx 풀 (LangChain 에도 전달)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONCURRENCY * 2,
+                max_keepalive_connections=LLM_MAX_CONCURRENCY,
+            ),
+        )
+    return _http_client
+
+
+def get_async_openai():
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+            http_client=get_http_client(),
+            max_retries=LLM_MAX_RETRIES,
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+    return _client
+
+
+def get_chat_model(model, **kwargs):
+    """공유 풀을 쓰는 LangChain ChatOpenAI (ainvoke/astream 은 call_llm 으로 감싸서 호출)"""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        http_async_client=get_http_client(),
+        request_timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+        **kwargs,
+    )
+
+
+async def close_llm():
+    global _client, _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _client = None
+    _http_client = None
+
+
+async def call_llm(model, make_call, timeout=None):
+    """동시성 제한 + deadline + 지연 시간 기록으로 감싼 업스트림 호출
+
+    make_call: 인자 없는 코루틴 팩토리 (예: lambda: client.chat.completions.create(...))
+    timeout:   세마포어 대기와 재시도를 포함한 전체 deadline (초). 초과 시 asyncio.TimeoutError
+    브레이커가 열려 있으면 업스트림 호출 없이 resilience.CircuitOpenError (503)
+    """
+    deadline = timeout or LLM_TIMEOUT_SECONDS
+    started = time.perf_counter()
+    acquired_at = None
+    outcome = "ok"
+    try:
+        async with asyncio.timeout(deadline):
+            async with _semaphore:
+                acquired_at = time.perf_counter()
+                return await call_async("openai", make_call)
+    except TimeoutError:
+        outcome = "timeout"
+        # deadline 으로 취소된 호출은 call_async 가 기록하지 못하므로 여기서 실패 처리 (세마포어 대기 중이었으면 제외)
+        if acquired_at is not None:
+            get_breaker("openai").record_failure()
+        raise
+    except APITimeoutError:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        now = time.perf_counter()
+        acquired_at = acquired_at or now
+        latency_stats.record(model, (now - acquired_at) * 1000, (acquired_at - started) * 1000, outcome)
+
+
+async def stream_llm(model, make_stream, timeout=None):
+    """call_llm 의 스트리밍 버전 - 청크를 그대로 흘려보내고 첫 청크까지 시간(TTFT)도 기록
+
+    make_stream: 인자 없이 async iterator 를 돌려주는 팩토리 (예: lambda: chain.astream(...))
+    timeout:     세마포어 대기부터 마지막 청크까지 전체 deadline (초)
+    이미 토큰을 보낸 뒤에는 다시 시도할 수 없으므로 재시도 없이 브레이커만 적용
+    """
+    breaker = get_breaker("openai")
+    breaker.before_call()
+    # deadline 은 청크를 기다리는 구간에만 적용 (yield 로 응답을 보내는 동안 취소되지 않도록)
+    deadline_at = asyncio.get_running_loop().time() + (timeout or LLM_TIMEOUT_SECONDS)
+    started = time.perf_counter()
+    acquired_at = started
+    first_chunk_at = None
+    outcome = "ok"
+    acquired = False
+    iterator = None
+    try:
+        async with asyncio.timeout_at(deadline_at):
+            await _semaphore.acquire()
+        acquired = True
+        acquired_at = time.perf_counter()
+        iterator = make_stream().__aiter__()
+        while True:
+            try:
+                async with asyncio.timeout_at(deadline_at):
+                    chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+            yield chunk
+        breaker.record_success()
+    except (TimeoutError, APITimeoutError):
+        outcome = "timeout"
+        if acquired:
+            breaker.record_failure()
+        raise
+    except (GeneratorExit, asyncio.CancelledError):
+        # 클라이언트가 연결을 끊은 경우 - 오류로 세지 않음
+        if first_chunk_at is not None:
+            breaker.record_success()
+        raise
+    except Exception as e:
+        outcome = "error"
+        breaker.record(e)
+        raise
+    finally:
+        if iterator is not None and hasattr(iterator, "aclose"):
+            await iterator.aclose()
+        if acquired:
+            _semaphore.release()
+        now = time.perf_counter()
+        ttft_ms = (first_chunk_at - started) * 1000 if first_chunk_at is not None else None
+        latency_stats.record(model, (now - acquired_at) * 1000, (acquired_at - started) * 1000, outcome, ttft_ms)
+
+
+async def chat_completion(messages, model="gpt-4o-mini", timeout=None, **kwargs):
+    """chat.completions.create → 응답 텍스트"""
+    client = get_async_openai()
+    response = await call_llm(
+        model,
+        lambda: client.chat.completions.create(model=model, messages=messages, **kwargs),
+        timeout,
+    )
+    return response.choices[0].message.content
+
+
+async def chat_completion_stream(messages, model="gpt-4o-mini", timeout=None, **kwargs):
+    """chat.completions.create(stream=True) → 텍스트 조각을 생성되는 대로 yield"""
+    client = get_async_openai()
+
+    async def deltas():
+        stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+    async for text in stream_llm(model, deltas, timeout):
+        yield text
+
+
+async def transcribe(file, model="whisper-1", timeout=None, **kwargs):
+    """audio.transcriptions.create → 응답 객체 (file 은 (파일명, bytes, content_type) 튜플)
+
+    timeout 을 주면 call_llm deadline 과 HTTP 요청 타임아웃에 모두 적용 (긴 녹음은 응답까지 30초를 넘김)
+    """
+    client = get_async_openai()
+    if timeout:
+        kwargs["timeout"] = timeout
+    return await call_llm(
+        model,
+        lambda: client.audio.transcriptions.create(model=model, file=file, **kwargs),
+        timeout,
+    )
+
+
+def llm_stats():
+    return {
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "in_flight": LLM_MAX_CONCURRENCY - _semaphore._value,
+        "timeout_seconds": LLM_TIMEOUT_SECONDS,
+        "models": latency_stats.snapshot(),
+    }
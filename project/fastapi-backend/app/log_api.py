@@ -3,15 +3,13 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
-from pymongo import MongoClient
 from datetime import datetime
-import os
+from app.db import get_emotion_db
 
 router = APIRouter()
 
-client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
-db = client["emotion_spending"]
-collection = db["daily_emotion_logs"]
+def get_collection():
+    return get_emotion_db()["daily_emotion_logs"]
 
 class Emotion(BaseModel):
     label: str
@@ -29,7 +27,7 @@ class SpendingEntry(BaseModel):
 def save_log(entry: SpendingEntry):
     entry_dict = entry.dict()
     entry_dict["created_at"] = datetime.now().isoformat()
-    result = collection.insert_one(entry_dict)
+    result = get_collection().insert_one(entry_dict)
 
     # ObjectId를 문자열로 변환하여 응답
     return {
@@ -1,6 +1,7 @@
 # app/ocr_api.py - 환경변수 JSON 방식으로 수정
 
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from google.cloud import vision
 from google.oauth2 import service_account
@@ -11,6 +12,7 @@ import base64
 import os
 import json
 from typing import List
+from app.resilience import call_sync, CircuitOpenError
 
 router = APIRouter()
 
@@ -64,6 +66,12 @@ def initialize_vision_client():
 
 # 클라이언트 초기화
 client = initialize_vision_client()
+OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", "20"))
+
+def detect_text(content: bytes):
+    """Vision text_detection (google_vision 브레이커/재시도 적용, 스레드풀에서 실행)"""
+    image = vision.Image(content=content)
+    return call_sync("google_vision", lambda: client.text_detection(image=image, timeout=OCR_TIMEOUT_SECONDS))
 
 class OCRResult(BaseModel):
     store: str
@@ -219,8 +227,7 @@ async def process_receipt(file: UploadFile = File(...)):
         print(f"📁 파일 크기: {len(contents)} bytes")
         
         # Google Vision API 요청
-        image = vision.Image(content=contents)
-        response = client.text_detection(image=image)
+        response = await run_in_threadpool(detect_text, contents)
         
         # 에러 체크
         if response.error.message:
@@ -247,6 +254,9 @@ async def process_receipt(file: UploadFile = File(...)):
             'raw_text': ocr_text[:500] + "..." if len(ocr_text) > 500 else ocr_text  # 로그 크기 제한
         }
         
+    except CircuitOpenError:
+        # 브레이커 열림 → 503 + Retry-After 그대로 전달
+        raise
     except Exception as e:
         print(f"❌ OCR 처리 에러: {str(e)}")
         return {
@@ -280,8 +290,7 @@ async def process_receipt_base64(request: OCRRequest):
         print(f"📁 디코딩된 이미지 크기: {len(image_content)} bytes")
         
         # Google Vision API 요청
-        image = vision.Image(content=image_content)
-        response = client.text_detection(image=image)
+        response = await run_in_threadpool(detect_text, image_content)
         
         if response.error.message:
             raise Exception(f'Google Vision API 에러: {response.error.message}')
@@ -304,6 +313,8 @@ async def process_receipt_base64(request: OCRRequest):
             'raw_text': ocr_text[:500] + "..." if len(ocr_text) > 500 else ocr_text
         }
         
+    except CircuitOpenError:
+        raise
     except Exception as e:
         print(f"❌ Base64 OCR 처리 에러: {str(e)}")
         return {
@@ -0,0 +1,279 @@
+# app/resilience.py ← 외부 업스트림 호출 공통 보호막 (서킷 브레이커 + 지터 재시도 + 전역 재시도 예산)
+#
+# OpenAI(coach/chat/stt), ElevenLabs(tts), S3(tts_upload/tts_replay), Google Vision(ocr) 장애 시
+# 모든 요청이 타임아웃까지 기다리며 워커를 붙잡지 않도록 한다.
+#   - 공급자별 CircuitBreaker: 연속 실패 BREAKER_FAILURE_THRESHOLD 회 → open (BREAKER_RESET_SECONDS 동안 즉시 503)
+#                              → half-open 에서 시험 호출 1건 성공 시 closed, 실패 시 다시 open
+#   - 재시도: 타임아웃/연결 오류/429/5xx 만, full jitter 지수 백오프 (RETRY_MAX_ATTEMPTS 회까지)
+#   - 전역 RetryBudget: 재시도는 전체 요청 수의 RETRY_BUDGET_RATIO 비율까지만 → 장애 때 재시도 폭주 방지
+# 상태는 /health, /metrics 에서 조회한다.
+#
+#   result = call_sync("elevenlabs", lambda: requests.post(...))
+#   result = await call_async("openai", lambda: client.chat.completions.create(...))
+import asyncio
+import os
+import random
+import threading
+import time
+from fastapi import HTTPException
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "2"))
+RETRY_BASE_DELAY_MS = float(os.getenv("RETRY_BASE_DELAY_MS", "200"))
+RETRY_MAX_DELAY_MS = float(os.getenv("RETRY_MAX_DELAY_MS", "2000"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(HTTPException):
+    """브레이커가 열려 있어 업스트림을 호출하지 않고 바로 실패 (503 + Retry-After)"""
+
+    def __init__(self, provider, retry_after):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=503,
+            detail=f"{provider} 서비스가 일시적으로 불안정합니다. 잠시 후 다시 시도해주세요.",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+class UpstreamStatusError(Exception):
+    """업스트림이 200 이 아닌 응답을 준 경우 (status_code 로 재시도/브레이커 판단)"""
+
+    def __init__(self, provider, status_code, body=""):
+        self.provider = provider
+        self.status_code = status_code
+        self.body = body
+        super().__init__(f"{provider} 오류: {status_code} - {body}")
+
+
+def status_code_of(exc):
+    """여러 SDK 예외에서 HTTP 상태 코드 추출 (openai/httpx/requests/botocore/google)"""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        if isinstance(response, dict):
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        else:
+            status = getattr(response, "status_code", None)
+    if status is None and isinstance(getattr(exc, "code", None), int):
+        status = exc.code
+    return status if isinstance(status, int) else None
+
+
+def is_transient(exc):
+    """재시도할 만하고 공급자 장애로 볼 수 있는 오류 (타임아웃, 연결 실패, 429, 5xx)"""
+    if isinstance(exc, HTTPException):
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    if "Timeout" in name or "Connection" in name or "Connect" in name:
+        return True
+    status = status_code_of(exc)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_started_at = None
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def before_call(self):
+        """호출 가능 여부 확인 - open 이면 CircuitOpenError"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.opened_at + self.reset_seconds - now
+                if remaining > 0:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self.state = HALF_OPEN
+                self._probe_started_at = None
+            # half-open: 시험 호출 1건만 (응답 없이 끊긴 시험 호출은 reset_seconds 후 다른 요청이 대신)
+            if self._probe_started_at is not None and now - self._probe_started_at < self.reset_seconds:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.reset_seconds - (now - self._probe_started_at))
+            self._probe_started_at = now
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                print(f"✅ 서킷 브레이커 닫힘: {self.name}")
+            self.state = CLOSED
+            self._probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counters["opened"] += 1
+                    print(f"🚨 서킷 브레이커 열림: {self.name} (연속 실패 {self.consecutive_failures}회)")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_started_at = None
+
+    def record(self, exc):
+        """호출 결과 기록 - 공급자 장애성 오류만 실패로 센다 (4xx 등 요청 문제는 성공으로 취급)"""
+        if exc is None or not is_transient(exc):
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def snapshot(self):
+        with self._lock:
+            state = self.state
+            retry_after = max(0.0, self.opened_at + self.reset_seconds - time.monotonic()) if state == OPEN else 0
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_after_seconds": round(retry_after, 1),
+                **self.counters,
+            }
+
+
+class RetryBudget:
+    """전역 재시도 토큰 버킷 - 요청마다 ratio 만큼 적립, 재시도마다 1 소비"""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND, max_tokens=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._tokens = max_tokens
+        self._refilled_at = time.monotonic()
+        self.counters = {"requests": 0, "retries": 0, "denied": 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self.counters["requests"] += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.counters["retries"] += 1
+                return True
+            self.counters["denied"] += 1
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            self._refill()
+            return {"tokens": round(self._tokens, 2), "ratio": self.ratio, **self.counters}
+
+
+PROVIDERS = ("openai", "elevenlabs", "s3", "google_vision")
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+retry_budget = RetryBudget()
+
+
+def get_breaker(provider):
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+for _provider in PROVIDERS:
+    get_breaker(_provider)
+
+
+def backoff_seconds(attempt):
+    """full jitter: 0 ~ min(max, base * 2^attempt)"""
+    return random.uniform(0, min(RETRY_MAX_DELAY_MS, RETRY_BASE_DELAY_MS * (2 ** attempt))) / 1000
+
+
+def _should_retry(breaker, exc, attempt, retries):
+    return (
+        attempt < retries
+        and is_transient(exc)
+        and breaker.state == CLOSED
+        and retry_budget.withdraw()
+    )
+
+
+def call_sync(provider, make_call, retries=RETRY_MAX_ATTEMPTS):
+    """동기 업스트림 호출 (requests/boto3/google SDK - 스레드풀 라우트에서 사용)"""
+    breaker = get_breaker(provider)
+    retry_budget.deposit()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = make_call()
+        except Exception as e:
+            breaker.record(e)
+            if not _should_retry(breaker, e, attempt, retries):
+                raise
+            print(f"🔁 {provider} 재시도 {attempt + 1}/{retries}: {e}")
+            time.sleep(backoff_seconds(attempt))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+async def call_async(provider, make_call, retries=RETRY_MAX_ATTEMPTS):
+    """비동기 업스트림 호출 - make_call 은 인자 없는 코루틴 팩토리"""
+    breaker = get_breaker(provider)
+    retry_budget.deposit()
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await make_call()
+        except Exception as e:
+            breaker.record(e)
+            if not _should_retry(breaker, e, attempt, retries):
+                raise
+            print(f"🔁 {provider} 재시도 {attempt + 1}/{retries}: {e}")
+            await asyncio.sleep(backoff_seconds(attempt))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+def breaker_states():
+    """공급자별 상태만 (/health)"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.state for breaker in breakers}
+
+
+def resilience_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {
+        "breakers": {breaker.name: breaker.snapshot() for breaker in breakers},
+        "retry_budget": retry_budget.snapshot(),
+        "retry_max_attempts": RETRY_MAX_ATTEMPTS,
+    }
@@ -0,0 +1,167 @@
+# app/response_cache.py ← /chat, /chat-tts GPT 답변 캐시
+#
+# 사용자 메시지는 반복이 많다 ("스트레스 받아서 옷 샀어", "야식 시켰어 ㅠㅠㅠ").
+# 정규화한 메시지 지문 + 프롬프트 템플릿 버전 + 모델을 키로 답변을 재사용한다.
+#   - 1차: 워커 메모리 LRU + TTL (CHAT_CACHE_MAX_ENTRIES, CHAT_CACHE_TTL_SECONDS)
+#   - 2차: MongoDB chat_response_cache (CHAT_CACHE_MONGO=1 일 때, TTL 인덱스로 자동 만료)
+# 프롬프트를 바꾸면 템플릿 버전을 올려서 이전 답변이 섞이지 않게 한다.
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+from app.db import get_async_emotion_db
+
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", str(24 * 3600)))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "4096"))
+CHAT_CACHE_MONGO = os.getenv("CHAT_CACHE_MONGO", "0") == "1"
+CHAT_CACHE_JAMO = os.getenv("CHAT_CACHE_JAMO", "1") != "0"
+
+RESPONSE_CACHE_COLLECTION = "chat_response_cache"
+RESPONSE_CACHE_INDEXES = [
+    ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+]
+
+_WHITESPACE = re.compile(r"\s+")
+# 숫자가 아닌 같은 글자 3번 이상 반복 → 2번 ("ㅠㅠㅠㅠ" == "ㅠㅠ", "1000" 은 그대로)
+_REPEATS = re.compile(r"(\D)\1{2,}")
+
+
+def normalize_message(message, jamo=CHAT_CACHE_JAMO):
+    """캐시 키용 메시지 정규화
+
+    - NFKC + 소문자, 문장부호/기호/공백 제거 (띄어쓰기가 제각각이라 공백은 아예 무시)
+    - jamo=True 면 한글을 자모 단위(NFKD)로 풀어서 완성형/조합형 입력, 호환 자모(ㅋ, ㅠ)를 같은 형태로 맞춤
+    """
+    text = unicodedata.normalize("NFKD" if jamo else "NFKC", message or "").lower()
+    text = "".join(ch for ch in text if unicodedata.category(ch)[0] not in ("P", "S"))
+    text = _WHITESPACE.sub("", text)
+    return _REPEATS.sub(r"\1\1", text)
+
+
+def message_fingerprint(namespace, template_version, model, message):
+    normalized = normalize_message(message)
+    raw = "\x1f".join((namespace, template_version, model, normalized))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=CHAT_CACHE_MAX_ENTRIES, ttl_seconds=CHAT_CACHE_TTL_SECONDS,
+                 use_mongo=CHAT_CACHE_MONGO, collection=RESPONSE_CACHE_COLLECTION):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self.collection = collection
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.counters = {
+            "hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "mongo_errors": 0,
+        }
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def _collection(self):
+        return get_async_emotion_db()[self.collection]
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            reply, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.counters["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return reply
+
+    def _put_local(self, key, reply, ttl_seconds):
+        with self._lock:
+            self._entries[key] = (reply, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    async def get(self, key):
+        """캐시된 답변 (없으면 None) - 메모리 → MongoDB 순으로 조회"""
+        if not self.enabled:
+            return None
+        reply = self._get_local(key)
+        if reply is not None:
+            self._count("hits")
+            return reply
+        if self.use_mongo:
+            try:
+                doc = await self._collection().find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+                    {"reply": 1, "expires_at": 1},
+                )
+            except PyMongoError as e:
+                print(f"⚠️ 답변 캐시 조회 실패: {e}")
+                self._count("mongo_errors")
+                doc = None
+            if doc:
+                remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+                self._put_local(key, doc["reply"], max(1.0, min(remaining, self.ttl_seconds)))
+                self._count("mongo_hits")
+                return doc["reply"]
+        self._count("misses")
+        return None
+
+    async def put(self, key, reply):
+        if not self.enabled or not reply:
+            return
+        self._put_local(key, reply, self.ttl_seconds)
+        self._count("stores")
+        if self.use_mongo:
+            now = datetime.utcnow()
+            try:
+                await self._collection().update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "reply": reply,
+                        "created_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                    }},
+                    upsert=True,
+                )
+            except PyMongoError as e:
+                print(f"⚠️ 답변 캐시 저장 실패: {e}")
+                self._count("mongo_errors")
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["mongo"] = self.use_mongo
+        lookups = stats["hits"] + stats["mongo_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["mongo_hits"]) / lookups, 3) if lookups else 0
+        return stats
+
+
+response_cache = ResponseCache()
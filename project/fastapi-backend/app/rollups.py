@@ -0,0 +1,332 @@
+# app/rollups.py ← (username, month) 단위 월별 집계 저장소
+#
+# consumption_db.monthly_rollups 에 월 합계를 미리 계산해 둔다.
+#   - 소비 기록: total_income / total_expense / processed_items / expense_items
+#                by_category (항목별 지출), by_normalized (예산 카테고리별 지출)
+#   - 일기:      diary_amount / diary_count / diary_stress_amount / diary_by_type
+# 소비 항목이나 일기가 저장될 때 $inc 로 갱신하고, 전체 재계산은 scripts/rebuild_rollups.py 로 한다.
+# 재계산이 끝난 사용자는 users.rollups_ready=True 로 표시되며, 그 전까지 읽기 API 는 원본을 계산한다.
+# 집계 문서마다 반영된 소비 기록 버전(users.ledger_version)을 ledger_version 으로 남기고,
+# 사용자의 현재 버전과 다르면(증분 갱신 누락, 다른 경로의 쓰기) 읽기 API 는 원본 계산으로 돌아간다.
+# 일기 쓰기는 diary_pending(진행 중) / diary_seq(횟수) 를 올려 두고, 재계산은 그 값이 그대로일 때만
+# 덮어쓴다 (스냅샷을 읽는 사이 들어온 일기 $inc 유실 방지). 갱신에 실패하면 rollups_ready 를 내려 원본 계산으로.
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.db import get_consumption_db, get_async_consumption_db
+from app.categories import normalize_category_backend
+from app.ledger_parser import coerce_amount
+from app.ledger_cache import ledger_cache
+
+ROLLUP_INDEXES = [
+    ([("username", ASCENDING), ("month", ASCENDING)], {"name": "username_month", "unique": True}),
+]
+
+DICT_FIELDS = ("by_category", "by_category_count", "by_normalized", "diary_by_type")
+STRESS_SHOPPING = "스트레스 쇼핑"
+STRESS_DIARY_TYPES = ("충동구매", "폭식")
+
+
+def get_rollups_collection():
+    return get_consumption_db().monthly_rollups
+
+
+def ensure_rollup_indexes():
+    collection = get_rollups_collection()
+    for keys, options in ROLLUP_INDEXES:
+        collection.create_index(keys, **options)
+
+
+def rollups_ready(user):
+    return bool(user and user.get("rollups_ready"))
+
+
+def rollup_is_fresh(user, doc):
+    """집계 문서가 사용자의 현재 소비 기록 버전까지 반영하고 있고 진행 중인 일기 쓰기가 없는지"""
+    return bool(doc) and doc.get("ledger_version") == user.get("ledger_version", 0) and not doc.get("diary_pending")
+
+
+async def mark_rollups_stale_async(username):
+    """증분 갱신 실패 → 재계산 전까지 읽기 API 가 원본을 계산하도록"""
+    await get_async_consumption_db().users.update_one({"username": username}, {"$set": {"rollups_ready": False}})
+    ledger_cache.invalidate(username)
+
+
+def encode_key(key):
+    """MongoDB 필드명에 쓸 수 없는 '.', 선행 '$' 치환"""
+    key = str(key).replace(".", "．")
+    return "＄" + key[1:] if key.startswith("$") else key
+
+
+def decode_key(key):
+    key = key.replace("．", ".")
+    return "$" + key[1:] if key.startswith("＄") else key
+
+
+def decode_rollup(doc):
+    if not doc:
+        return doc
+    for field in DICT_FIELDS:
+        if field in doc:
+            doc[field] = {decode_key(k): v for k, v in doc[field].items()}
+    return doc
+
+
+def empty_rollup(username=None, month=None):
+    return {
+        "username": username,
+        "month": month,
+        "total_income": 0,
+        "total_expense": 0,
+        "processed_items": 0,
+        "expense_items": 0,
+        "by_category": {},
+        "by_category_count": {},
+        "by_normalized": {},
+        "diary_amount": 0,
+        "diary_count": 0,
+        "diary_stress_amount": 0,
+        "diary_by_type": {},
+    }
+
+
+# ---------- 증분 계산 ----------
+
+def ledger_deltas(items):
+    """(month, 분류, 항목, 금액, ...) 튜플 목록 → {month: {필드: 증가량}} (summary/actuals 와 같은 조건)"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for month, kind, category, amount, *_ in items:
+        amount = coerce_amount(amount)
+        if amount <= 0:
+            continue
+        delta = deltas[month]
+        delta["processed_items"] += 1
+        if kind == "수입":
+            delta["total_income"] += amount
+        elif kind == "지출":
+            delta["total_expense"] += amount
+            delta["expense_items"] += 1
+            if isinstance(category, str) and category.strip():
+                category = category.strip()
+                delta[f"by_category.{encode_key(category)}"] += amount
+                delta[f"by_category_count.{encode_key(category)}"] += 1
+                delta[f"by_normalized.{encode_key(normalize_category_backend(category))}"] += amount
+    return deltas
+
+
+def transaction_items(transaction_docs):
+    """transactions 문서 → ledger_deltas 입력 튜플"""
+    return [(doc.get("month"), doc.get("분류"), doc.get("항목"), doc.get("금액")) for doc in transaction_docs]
+
+
+def diary_deltas(entries, sign=1):
+    """diary_entries 문서 목록 → {month: {필드: 증가량}}"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for entry in entries:
+        date_value = entry.get("date")
+        month = date_value[:7] if isinstance(date_value, str) and len(date_value) >= 7 else None
+        amount = entry.get("amount") or 0
+        consumption_type = entry.get("consumptionType")
+        delta = deltas[month]
+        delta["diary_amount"] += sign * amount
+        delta["diary_count"] += sign
+        if consumption_type in STRESS_DIARY_TYPES:
+            delta["diary_stress_amount"] += sign * amount
+        # 유형이 비어 있으면 "diary_by_type." 경로가 돼 MongoDB 가 거부하므로 유형별 합계에서만 제외
+        if isinstance(consumption_type, str) and consumption_type:
+            delta[f"diary_by_type.{encode_key(consumption_type)}"] += sign * amount
+    return deltas
+
+
+def apply_transactions(username, transaction_docs, ledger_version):
+    """새 소비 항목 저장 시 월별 집계 갱신 (ledger_version: 이번 추가 직전의 사용자 버전)
+
+    ledger_version 까지 반영된 문서만 증가시키고 버전을 하나 올린다.
+    이미 어긋난 달은 건드리지 않아 계속 원본 계산으로 읽히고, 재계산 스크립트가 바로잡는다.
+    """
+    collection = get_rollups_collection()
+    now = datetime.now()
+    ops = [
+        UpdateOne(
+            {"username": username, "month": month, "ledger_version": ledger_version},
+            {"$inc": dict(delta), "$set": {"ledger_version": ledger_version + 1, "updated_at": now}},
+            upsert=True,
+        )
+        for month, delta in ledger_deltas(transaction_items(transaction_docs)).items() if delta
+    ]
+    if ops:
+        try:
+            collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # 버전이 어긋난 달은 upsert 가 (username, month) 유니크 인덱스에 걸림 → 그 달만 stale 로 남김
+            print(f"⚠️ 월별 집계 {len(e.details.get('writeErrors', []))}개월 갱신 건너뜀 ({username})")
+    # 이번 추가와 무관한 달도 같은 버전까지 반영된 상태
+    collection.update_many(
+        {"username": username, "ledger_version": ledger_version},
+        {"$set": {"ledger_version": ledger_version + 1}},
+    )
+
+
+def diary_change_deltas(added=(), removed=()):
+    """추가/삭제된 일기 → {month: {필드: 증가량}} (날짜 수정은 이전 값 삭제 + 새 값 추가)"""
+    deltas = diary_deltas(added)
+    for month, delta in diary_deltas(removed, -1).items():
+        for field, value in delta.items():
+            deltas[month][field] += value
+    return deltas
+
+
+async def _diary_rollup_ops(username, deltas, extra_inc):
+    db = get_async_consumption_db()
+    user = await db.users.find_one({"username": username}, {"ledger_version": 1})
+    # 일기만 있는 달이 새로 생기면 현재 소비 기록 버전으로 표시 (소비 항목은 없으므로 최신 상태)
+    ledger_version = (user or {}).get("ledger_version", 0)
+    now = datetime.now()
+    ops = [
+        UpdateOne(
+            {"username": username, "month": month},
+            {"$inc": {**delta, **extra_inc}, "$set": {"updated_at": now}, "$setOnInsert": {"ledger_version": ledger_version}},
+            upsert=True,
+        )
+        for month, delta in deltas.items()
+    ]
+    if ops:
+        await db.monthly_rollups.bulk_write(ops, ordered=False)
+
+
+async def _mark_stale_after_failure(username, error):
+    print(f"⚠️ 월별 집계 갱신 실패 ({username}): {error} → 재계산 전까지 원본 계산")
+    try:
+        await mark_rollups_stale_async(username)
+    except Exception as e:
+        print(f"⚠️ rollups_ready 해제 실패 ({username}): {e}")
+
+
+@asynccontextmanager
+async def diary_rollup_update(username, added=(), removed=()):
+    """일기 쓰기를 감싸 월별 집계 갱신 (날짜 수정은 removed=[이전], added=[수정 후])
+
+    쓰기 전에 해당 달을 진행 중(diary_pending)으로 표시하고, 쓰기가 성공하면 증가량을 반영하며 해제한다.
+    집계 쪽 실패는 요청을 실패시키지 않고 rollups_ready 를 내린다 (scripts/rebuild_rollups.py 로 복구).
+    """
+    deltas = diary_change_deltas(added, removed)
+    try:
+        await _diary_rollup_ops(username, {month: {} for month in deltas}, {"diary_pending": 1, "diary_seq": 1})
+        started = True
+    except Exception as e:
+        await _mark_stale_after_failure(username, e)
+        started = False
+
+    written = False
+    try:
+        yield
+        written = True
+    finally:
+        if started:
+            try:
+                # 쓰기가 실패했으면 증가량 없이 진행 중 표시만 해제
+                applied = {month: dict(delta) if written else {} for month, delta in deltas.items()}
+                await _diary_rollup_ops(username, applied, {"diary_pending": -1, "diary_seq": 1})
+            except Exception as e:
+                await _mark_stale_after_failure(username, e)
+
+
+# ---------- 조회 ----------
+
+def summarize_month(username, month, ledger_items, diary_entries=()):
+    """한 달치 LedgerItem(또는 같은 형태의 튜플)으로 집계를 바로 계산 (rollups_ready 전 사용자, 재계산용)"""
+    rollup = empty_rollup(username, month)
+    for deltas in (ledger_deltas(ledger_items), diary_deltas(diary_entries)):
+        for delta in deltas.values():
+            for field, value in delta.items():
+                if "." in field:
+                    parent, key = field.split(".", 1)
+                    rollup[parent][key] = rollup[parent].get(key, 0) + value
+                else:
+                    rollup[field] += value
+    return decode_rollup(rollup)
+
+
+def get_month_rollup(user, month):
+    """최신 상태의 월 집계, 재계산 전이거나 버전이 어긋났으면 None (호출 측이 원본으로 계산)"""
+    if not rollups_ready(user):
+        return None
+    doc = get_rollups_collection().find_one({"username": user["username"], "month": month}, {"_id": 0})
+    if not rollup_is_fresh(user, doc):
+        return None
+    return decode_rollup({**empty_rollup(user["username"], month), **doc})
+
+
+async def get_user_rollups_async(user):
+    """사용자의 전체 월 집계, 하나라도 버전이 어긋났으면 None"""
+    if not rollups_ready(user):
+        return None
+    cursor = get_async_consumption_db().monthly_rollups.find({"username": user["username"]}, {"_id": 0})
+    docs = [doc async for doc in cursor]
+    if not all(rollup_is_fresh(user, doc) for doc in docs):
+        return None
+    return [decode_rollup({**empty_rollup(user["username"]), **doc}) for doc in docs]
+
+
+# ---------- 전체 재계산 ----------
+
+def diary_rollup_state(username):
+    """{month: diary_seq} - 일기 스냅샷을 읽기 전에 호출, 진행 중인 일기 쓰기가 있으면 None"""
+    state = {}
+    for doc in get_rollups_collection().find({"username": username}, {"_id": 0, "month": 1, "diary_seq": 1, "diary_pending": 1}):
+        if doc.get("diary_pending"):
+            return None
+        state[doc.get("month")] = doc.get("diary_seq")
+    return state
+
+
+def _seq_filter(username, month, state):
+    seq = state.get(month)
+    return {"username": username, "month": month, "diary_seq": seq if seq is not None else {"$exists": False}}
+
+
+def rebuild_user_rollups(username, ledger, diary_entries, ledger_version, diary_state):
+    """사용자의 월별 집계를 CanonicalLedger 와 일기로부터 다시 만들고 rollups_ready 표시
+
+    ledger_version 은 ledger 를 읽기 전의 users.ledger_version, diary_state 는 일기를 읽기 전의 diary_rollup_state().
+    달마다 집계 필드를 $set 으로 덮어쓰므로 재계산 중에도 읽기 API 가 0 을 보지 않고,
+    그 사이 diary_seq 가 바뀐 달(일기 쓰기가 끼어든 달)은 건드리지 않는다.
+    반환값은 갱신한 달 수, 끼어든 쓰기가 있었으면 None (호출 측이 다시 계산).
+    """
+    by_month_diary = defaultdict(list)
+    for entry in diary_entries:
+        date_value = entry.get("date")
+        by_month_diary[date_value[:7] if isinstance(date_value, str) and len(date_value) >= 7 else None].append(entry)
+
+    now = datetime.now()
+    rollups = []
+    for month in set(ledger.by_month) | set(by_month_diary):
+        rollup = summarize_month(username, month, ledger.month_items(month), by_month_diary[month])
+        for field in DICT_FIELDS:
+            rollup[field] = {encode_key(k): v for k, v in rollup[field].items()}
+        rollup["ledger_version"] = ledger_version
+        rollup["updated_at"] = now
+        rollups.append(rollup)
+
+    collection = get_rollups_collection()
+    conflicts = 0
+    if rollups:
+        try:
+            # diary_seq 가 바뀐 달은 필터가 맞지 않아 upsert → (username, month) 유니크 인덱스에 걸림
+            collection.bulk_write([
+                UpdateOne(_seq_filter(username, rollup["month"], diary_state), {"$set": rollup}, upsert=True)
+                for rollup in rollups
+            ], ordered=False)
+        except BulkWriteError as e:
+            conflicts += len(e.details.get("writeErrors", []))
+    # 기록이 사라진 달만 삭제 (그 사이 일기가 들어온 달은 남김)
+    months = {rollup["month"] for rollup in rollups}
+    for month in set(diary_state) - months:
+        conflicts += collection.delete_one(_seq_filter(username, month, diary_state)).deleted_count == 0
+    ledger_cache.invalidate(username)
+    if conflicts:
+        return None
+    get_consumption_db().users.update_one({"username": username}, {"$set": {"rollups_ready": True}})
+    return len(rollups)
@@ -0,0 +1,42 @@
+# app/s3.py ← S3 공용 클라이언트 (tts_upload / tts_replay / tts_cache)
+#
+# S3_ENDPOINT_URL 을 주면 AWS 대신 로컬 S3 호환 서버(moto_server, MinIO 등)를 사용한다.
+#   moto_server -p 5005 &
+#   S3_ENDPOINT_URL=http://127.0.0.1:5005 S3_BUCKET_NAME=tts-local AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x ...
+# 재시도는 app.resilience 전역 예산으로 하므로 botocore 자체 재시도는 끈다.
+import os
+import boto3
+from botocore.config import Config
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+S3_REGION = os.getenv("S3_REGION", "ap-southeast-2")
+S3_ENDPOINT_URL = (os.getenv("S3_ENDPOINT_URL") or "").rstrip("/") or None
+
+_s3_client = None
+
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
+            "s3",
+            aws_access_key_id=AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+            region_name=S3_REGION,
+            endpoint_url=S3_ENDPOINT_URL,
+            config=Config(retries={"mode": "standard", "max_attempts": 1}, connect_timeout=5, read_timeout=30),
+        )
+    return _s3_client
+
+
+def s3_object_url(s3_key, bucket=None):
+    """객체의 (비공개) 고정 URL - 재생에는 presigned URL 을 쓴다"""
+    bucket = bucket or S3_BUCKET_NAME
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL}/{bucket}/{s3_key}"
+    return f"https://{bucket}.s3.{S3_REGION}.amazonaws.com/{s3_key}"
@@ -0,0 +1,90 @@
+# app/s3_uploader.py ← S3 백그라운드 업로드 워커
+#
+# /tts_upload 의 즉시 응답 모드에서 mp3 를 먼저 돌려주고, S3 PUT 은 여기 스레드 풀에서 처리한다.
+#   - 큰 파일은 boto3 TransferConfig 로 멀티파트 업로드 (S3_MULTIPART_THRESHOLD_MB 이상)
+#   - 재시도/브레이커는 app.resilience 의 "s3" 공급자 그대로
+#   - 완료/실패 시 on_done(ok) 콜백 (tts_audio 메타데이터 status 갱신 등)
+# 종료 시 shutdown_uploads() 가 남은 업로드를 기다린다 (main.py lifespan).
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from boto3.s3.transfer import TransferConfig
+from app.resilience import call_sync
+from app.s3 import S3_BUCKET_NAME, get_s3_client
+
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "4"))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+    multipart_chunksize=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+    max_concurrency=4,
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_counters_lock = threading.Lock()
+upload_counters = {"submitted": 0, "in_flight": 0, "completed": 0, "failed": 0}
+
+
+def _count(**deltas):
+    with _counters_lock:
+        for key, delta in deltas.items():
+            upload_counters[key] += delta
+
+
+def upload_audio(s3_key, audio, bucket=None):
+    """mp3 bytes → S3 (동기, 재시도마다 새 BytesIO 로 처음부터)"""
+    s3_client = get_s3_client()
+    call_sync("s3", lambda: s3_client.upload_fileobj(
+        BytesIO(audio),
+        bucket or S3_BUCKET_NAME,
+        s3_key,
+        ExtraArgs={'ContentType': 'audio/mpeg'},
+        Config=TRANSFER_CONFIG,
+    ))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload")
+        return _executor
+
+
+def _run_upload(s3_key, audio, on_done):
+    ok = False
+    try:
+        upload_audio(s3_key, audio)
+        ok = True
+        _count(in_flight=-1, completed=1)
+    except Exception as e:
+        print(f"❌ S3 백그라운드 업로드 실패 ({s3_key}): {e}")
+        _count(in_flight=-1, failed=1)
+    if on_done is not None:
+        try:
+            on_done(ok)
+        except Exception as e:
+            print(f"⚠️ 업로드 완료 처리 실패 ({s3_key}): {e}")
+
+
+def submit_upload(s3_key, audio, on_done=None):
+    """업로드를 워커에 넘기고 바로 반환"""
+    _count(submitted=1, in_flight=1)
+    return _get_executor().submit(_run_upload, s3_key, audio, on_done)
+
+
+def shutdown_uploads():
+    """남은 업로드가 끝날 때까지 대기 (서버 종료 시)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def upload_stats():
+    with _counters_lock:
+        return {**upload_counters, "workers": S3_UPLOAD_WORKERS}
@@ -0,0 +1,59 @@
+# app/single_flight.py ← 같은 키로 동시에 들어온 요청을 한 번의 계산으로 합치기 (워커 단위)
+#
+# 대시보드가 열리면 프론트와 Node 게이트웨이가 같은 사용자의 /coach 를 거의 동시에 여러 번 호출한다.
+# 먼저 온 요청(leader)만 실제 계산(기록 조회 + LLM 호출)을 하고, 그 사이 들어온 같은 키의 요청은
+# 결과(또는 예외)를 그대로 공유한다. 계산이 끝나면 키를 지우므로 캐시가 아니다.
+#
+#   coach_flight = SingleFlight("coach")
+#   data = await coach_flight.do(user_id, lambda: compute_coaching(user_id))
+import asyncio
+from threading import Lock
+
+_groups = {}
+_groups_lock = Lock()
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._in_flight = {}
+        self.counters = {"calls": 0, "executions": 0, "shared": 0, "errors": 0}
+        with _groups_lock:
+            _groups[name] = self
+
+    async def do(self, key, make_call):
+        """key 가 같은 진행 중 계산이 있으면 그 결과를 기다리고, 없으면 make_call() 을 실행
+
+        make_call: 인자 없는 코루틴 팩토리
+        계산은 별도 Task 로 돌리므로 leader 요청이 끊겨도(취소) 기다리던 다른 요청은 결과를 받는다.
+        """
+        self.counters["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self.counters["executions"] += 1
+            task = asyncio.create_task(self._run(key, make_call))
+            self._in_flight[key] = task
+        else:
+            self.counters["shared"] += 1
+        return await asyncio.shield(task)
+
+    async def _run(self, key, make_call):
+        try:
+            return await make_call()
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats["in_flight"] = len(self._in_flight)
+        stats["shared_ratio"] = round(stats["shared"] / stats["calls"], 3) if stats["calls"] else 0
+        return stats
+
+
+def single_flight_stats():
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,295 @@
+# app/stt.py ← 긴 녹음 분할 병렬 전사 (Whisper)
+#
+# 업로드 → 임시 파일로 조각 복사(메모리에 전체를 올리지 않음) → ffmpeg silencedetect 로 길이/무음 구간 파악
+# → 최대 STT_CHUNK_SECONDS 길이로, 가능하면 무음 한가운데에서 자름 → 조각별 전사를 STT_CONCURRENCY 개씩 동시에
+# → 순서대로 이어 붙임. 조각별 소요 시간(추출/전사)을 같이 돌려준다.
+#
+# ffmpeg 가 없거나 분석에 실패하면 분할 없이 한 번에 전사 (Whisper 업로드 한도 STT_CHUNK_MAX_BYTES 이내일 때만).
+#
+# 모바일에서 같은 녹음을 다시 올리는 재시도가 많아, 임시 파일로 복사하면서 sha256 을 같이 계산하고
+# (내용 해시 + 모델 + 전사 옵션) 키로 결과를 stt_cache 에 둔다 (메모리 LRU + STT_CACHE_MONGO=1 이면 MongoDB).
+#
+# preprocess=True 면 WAV 입력을 앞뒤 무음 제거 + 16kHz 모노로 줄인 뒤 전사 (app/audio_preprocess.py).
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from pymongo import ASCENDING
+from app.llm import transcribe
+from app.response_cache import ResponseCache
+from app.audio_preprocess import is_wav, preprocess_wav, STT_PREPROCESS_MAX_BYTES, UnsupportedAudioError
+
+STT_MODEL = "whisper-1"
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "60"))
+# 이보다 짧은 마지막 조각은 앞 조각에 붙임 (Whisper 는 0.1초 미만 오디오를 거부)
+STT_MIN_CHUNK_SECONDS = float(os.getenv("STT_MIN_CHUNK_SECONDS", "1"))
+# Whisper API 파일 한도 25MB - 여유를 둠
+STT_CHUNK_MAX_BYTES = int(os.getenv("STT_CHUNK_MAX_BYTES", str(24 * 1024 * 1024)))
+STT_MAX_UPLOAD_BYTES = int(os.getenv("STT_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+STT_CONCURRENCY = int(os.getenv("STT_CONCURRENCY", "4"))
+# 전사 한 번의 deadline = 기본 + MB 당 추가 (분할 없이 24MB 를 한 번에 보내는 경우도 감당하도록)
+STT_TIMEOUT_SECONDS = float(os.getenv("STT_TIMEOUT_SECONDS", "30"))
+STT_TIMEOUT_PER_MB_SECONDS = float(os.getenv("STT_TIMEOUT_PER_MB_SECONDS", "10"))
+STT_SILENCE_DB = float(os.getenv("STT_SILENCE_DB", "-35"))
+STT_SILENCE_MIN_SECONDS = float(os.getenv("STT_SILENCE_MIN_SECONDS", "0.4"))
+# 요청에서 preprocess 를 따로 지정하지 않았을 때 기본값
+STT_PREPROCESS = os.getenv("STT_PREPROCESS", "0") == "1"
+COPY_BUFFER_BYTES = 1024 * 1024
+
+STT_CACHE_COLLECTION = "stt_result_cache"
+STT_CACHE_INDEXES = [
+    ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+]
+stt_cache = ResponseCache(
+    max_entries=int(os.getenv("STT_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("STT_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    use_mongo=os.getenv("STT_CACHE_MONGO", "0") == "1",
+    collection=STT_CACHE_COLLECTION,
+)
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+_PROGRESS_TIME = re.compile(r"time=(\d+):(\d+):([\d.]+)")
+
+
+class AudioTooLargeError(Exception):
+    pass
+
+
+def ffmpeg_available():
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+def _ms(since):
+    return round((time.perf_counter() - since) * 1000)
+
+
+def spool_upload(source, directory, suffix):
+    """업로드 파일 객체 → 임시 파일 (COPY_BUFFER_BYTES 씩 복사하며 sha256 계산) - 블로킹이라 to_thread 로 호출"""
+    path = os.path.join(directory, f"input{suffix}")
+    size = 0
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        while True:
+            block = source.read(COPY_BUFFER_BYTES)
+            if not block:
+                break
+            size += len(block)
+            if size > STT_MAX_UPLOAD_BYTES:
+                raise AudioTooLargeError(f"녹음 파일이 너무 큽니다 (최대 {STT_MAX_UPLOAD_BYTES // (1024 * 1024)}MB)")
+            digest.update(block)
+            out.write(block)
+    return path, size, digest.hexdigest()
+
+
+def stt_cache_key(content_hash, model=STT_MODEL, **kwargs):
+    """내용 해시 + 모델 (+ language/prompt 등 전사 옵션) - 모델을 바꾸면 이전 결과는 자연히 무효"""
+    raw = json.dumps({"audio": content_hash, "model": model, "options": kwargs}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _run_ffmpeg(*args):
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_BIN, "-hide_banner", "-nostdin", *args,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg 실패 ({process.returncode}): {stderr.decode(errors='replace')[-300:]}")
+    return stderr.decode(errors="replace")
+
+
+async def analyze_audio(path):
+    """(전체 길이 초, [(무음 시작, 무음 끝)]) - MediaRecorder webm 은 헤더에 길이가 없어 끝까지 디코딩해서 구함"""
+    log = await _run_ffmpeg(
+        "-i", path, "-vn",
+        "-af", f"silencedetect=noise={STT_SILENCE_DB}dB:d={STT_SILENCE_MIN_SECONDS}",
+        "-f", "null", "-",
+    )
+    starts = [float(value) for value in _SILENCE_START.findall(log)]
+    ends = [float(value) for value in _SILENCE_END.findall(log)]
+    progress = _PROGRESS_TIME.findall(log)
+    duration = 0.0
+    if progress:
+        hours, minutes, seconds = progress[-1]
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    # 끝까지 무음이면 silence_end 가 없음 → 파일 끝으로
+    silences = [(start, ends[i] if i < len(ends) else duration) for i, start in enumerate(starts)]
+    return duration, silences
+
+
+def plan_chunks(duration, silences, max_seconds=STT_CHUNK_SECONDS, min_seconds=STT_MIN_CHUNK_SECONDS):
+    """[(start, end)] - 각 조각은 max_seconds 이하, 뒤쪽 절반 안에 무음이 있으면 가장 늦은 무음 한가운데에서 자름
+
+    마지막 조각이 min_seconds 보다 짧으면 앞 조각에 합친다 (그 조각만 max_seconds 를 조금 넘을 수 있음).
+    """
+    chunks = []
+    start = 0.0
+    while duration - start > max_seconds:
+        limit = start + max_seconds
+        cut = limit
+        candidates = [(s + e) / 2 for s, e in silences if start + max_seconds / 2 <= (s + e) / 2 <= limit]
+        if candidates:
+            cut = max(candidates)
+        chunks.append((start, cut))
+        start = cut
+    if chunks and duration - start < min_seconds:
+        chunks[-1] = (chunks[-1][0], duration)
+    else:
+        chunks.append((start, duration))
+    return chunks
+
+
+async def extract_chunk(path, directory, index, start, end, suffix):
+    out_path = os.path.join(directory, f"chunk_{index:03d}{suffix}")
+    # 같은 코덱 그대로 잘라냄 (재인코딩 없음) - opus/mp3 패킷 단위라 수십 ms 오차
+    await _run_ffmpeg("-ss", f"{start:.3f}", "-to", f"{end:.3f}", "-i", path, "-vn", "-c", "copy", "-y", out_path)
+    return out_path
+
+
+def _read_file(path, size=-1):
+    with open(path, "rb") as f:
+        return f.read(size)
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def preprocess_input(path, size, directory):
+    """WAV 면 무음 제거 + 16kHz 모노 WAV 로 바꿔 (새 경로, 보고) - 대상이 아니면 (None, 이유 포함 보고)"""
+    started = time.perf_counter()
+    if size > STT_PREPROCESS_MAX_BYTES:
+        return None, {"applied": False, "reason": "too_large"}
+    if not is_wav(await asyncio.to_thread(_read_file, path, 12)):
+        return None, {"applied": False, "reason": "not_wav"}
+    try:
+        data = await asyncio.to_thread(_read_file, path)
+        encoded, report = await asyncio.to_thread(preprocess_wav, data)
+    except UnsupportedAudioError as e:
+        return None, {"applied": False, "reason": str(e)}
+    if len(encoded) >= size:
+        # 이미 16kHz 모노이고 무음도 없으면 원본 그대로
+        return None, {"applied": False, "reason": "no_gain", **report}
+    out_path = os.path.join(directory, "preprocessed.wav")
+    await asyncio.to_thread(_write_file, out_path, encoded)
+    return out_path, {
+        "applied": True,
+        "input_bytes": size,
+        "output_bytes": len(encoded),
+        "bytes_saved": size - len(encoded),
+        **report,
+        "preprocess_ms": _ms(started),
+    }
+
+
+def transcribe_timeout(size):
+    """조각 크기에 비례한 전사 deadline (초) - LLM 기본 타임아웃(30초)은 긴 녹음에 너무 짧음"""
+    return STT_TIMEOUT_SECONDS + size / (1024 * 1024) * STT_TIMEOUT_PER_MB_SECONDS
+
+
+async def _transcribe_path(path, filename, content_type, **kwargs):
+    # 재시도 때 처음부터 다시 보낼 수 있도록 bytes 로 (조각 하나는 STT_CHUNK_MAX_BYTES 이하)
+    data = await asyncio.to_thread(_read_file, path)
+    response = await transcribe(
+        (filename, data, content_type), model=STT_MODEL, timeout=transcribe_timeout(len(data)), **kwargs
+    )
+    return response.text.strip()
+
+
+async def transcribe_upload(file, preprocess=None, **kwargs):
+    """UploadFile → {"text", "chunks": [...조각별 구간/크기/소요 시간], "timings": {...}, "cached", "preprocess"}"""
+    preprocess = STT_PREPROCESS if preprocess is None else preprocess
+    started = time.perf_counter()
+    filename = file.filename or "audio.webm"
+    suffix = os.path.splitext(filename)[1].lower() or ".webm"
+    content_type = file.content_type or "application/octet-stream"
+
+    with tempfile.TemporaryDirectory(prefix="stt_") as directory:
+        path, size, content_hash = await asyncio.to_thread(spool_upload, file.file, directory, suffix)
+        timings = {"spool_ms": _ms(started)}
+
+        # 전처리 결과는 원본 전사와 다를 수 있어 키를 나눔 (키는 원본 내용 기준 → 재업로드도 히트)
+        cache_key = stt_cache_key(content_hash, **({**kwargs, "preprocess": True} if preprocess else kwargs))
+        cached = await stt_cache.get(cache_key)
+        if cached is not None:
+            timings["total_ms"] = _ms(started)
+            print(f"🎙️ STT 캐시 히트 {size}B {timings}")
+            return {**cached, "timings": timings, "cached": True, "preprocess": None}
+
+        preprocess_report = None
+        if preprocess:
+            preprocessed_path, preprocess_report = await preprocess_input(path, size, directory)
+            if preprocessed_path:
+                path, size, suffix, content_type = preprocessed_path, preprocess_report["output_bytes"], ".wav", "audio/wav"
+                filename = os.path.splitext(filename)[0] + ".wav"
+                timings["preprocess_ms"] = preprocess_report["preprocess_ms"]
+
+        duration, silences = None, []
+        if ffmpeg_available():
+            analyze_started = time.perf_counter()
+            try:
+                duration, silences = await analyze_audio(path)
+            except Exception as e:
+                print(f"⚠️ 오디오 분석 실패 - 분할 없이 전사: {e}")
+            timings["analyze_ms"] = _ms(analyze_started)
+
+        if duration and (duration > STT_CHUNK_SECONDS or size > STT_CHUNK_MAX_BYTES):
+            spans = plan_chunks(duration, silences)
+        else:
+            if size > STT_CHUNK_MAX_BYTES:
+                raise AudioTooLargeError("녹음 파일이 너무 커서 분할 없이 전사할 수 없습니다")
+            spans = [(0.0, duration)]
+
+        semaphore = asyncio.Semaphore(STT_CONCURRENCY)
+
+        async def run(index, start, end):
+            async with semaphore:
+                chunk_started = time.perf_counter()
+                chunk_path, chunk_name = path, filename
+                if len(spans) > 1:
+                    chunk_path = await extract_chunk(path, directory, index, start, end, suffix)
+                    chunk_name = os.path.basename(chunk_path)
+                extract_ms = _ms(chunk_started)
+                transcribe_started = time.perf_counter()
+                text = await _transcribe_path(chunk_path, chunk_name, content_type, **kwargs)
+                return {
+                    "index": index,
+                    "start": round(start, 2),
+                    "end": round(end, 2) if end is not None else None,
+                    "bytes": os.path.getsize(chunk_path),
+                    "extract_ms": extract_ms,
+                    "transcribe_ms": _ms(transcribe_started),
+                    "chars": len(text),
+                    "text": text,
+                }
+
+        transcribe_started = time.perf_counter()
+        tasks = [asyncio.create_task(run(index, start, end)) for index, (start, end) in enumerate(spans)]
+        try:
+            chunks = await asyncio.gather(*tasks)
+        except BaseException:
+            # 한 조각이라도 실패하면 나머지를 멈추고 정리한 뒤 임시 디렉터리를 지움
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        timings["transcribe_ms"] = _ms(transcribe_started)
+
+    timings["total_ms"] = _ms(started)
+    text = " ".join(text for text in (chunk.pop("text") for chunk in chunks) if text)
+    print(f"🎙️ STT {len(chunks)}조각 {size}B {timings}")
+    result = {
+        "text": text,
+        "duration_seconds": round(duration, 2) if duration else None,
+        "chunks": chunks,
+    }
+    if text:
+        await stt_cache.put(cache_key, result)
+    return {**result, "timings": timings, "cached": False, "preprocess": preprocess_report}
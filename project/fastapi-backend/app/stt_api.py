@@ -1,23 +1,27 @@
 # stt_api.py
-from fastapi import APIRouter, UploadFile, File
-from openai import OpenAI
-import os
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from typing import Optional
 from dotenv import load_dotenv
+from app.resilience import CircuitOpenError
+from app.stt import transcribe_upload, AudioTooLargeError
 
 load_dotenv()
 
 router = APIRouter()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# 업로드를 임시 파일로 흘려 쓰고, 긴 녹음은 무음 구간에서 나눠 병렬 전사 (app/stt.py)
+# preprocess=true: WAV 입력의 앞뒤 무음 제거 + 16kHz 모노 변환 후 전사 (생략 시 STT_PREPROCESS 환경변수)
 @router.post("/stt")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(
+    file: UploadFile = File(...),
+    preprocess: Optional[bool] = Query(None, description="WAV 무음 제거 + 16kHz 모노 변환"),
+):
     try:
-        audio_data = await file.read()
-        response = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=(file.filename, audio_data, file.content_type)
-        )
-        return {"text": response.text}
+        return await transcribe_upload(file, preprocess=preprocess)
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         print("STT 오류:", e)
         return {"error": str(e)}
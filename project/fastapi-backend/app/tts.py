@@ -0,0 +1,157 @@
+# app/tts.py ← ElevenLabs 음성 합성 공용 클라이언트 (비동기)
+#
+# - keep-alive httpx 풀 하나를 공유 (문장 단위 파이프라인은 한 응답에 여러 번 호출)
+# - app.resilience 의 "elevenlabs" 브레이커 + 재시도 예산 적용
+# - ELEVEN_BASE_URL 로 로컬 가짜 서버(scripts/fake_llm_server.py) 지정 가능
+# - 같은 요청(payload + voice_id)은 app.tts_cache 에서 바로 꺼냄 (업스트림 호출 없음)
+import asyncio
+import os
+import re
+import httpx
+from dotenv import load_dotenv
+from app.resilience import call_async, get_breaker, UpstreamStatusError
+from app.tts_cache import tts_cache, tts_cache_key
+
+load_dotenv()
+
+ELEVEN_API_KEY = os.getenv("ELEVEN_API_KEY")
+ELEVEN_BASE_URL = os.getenv("ELEVEN_BASE_URL", "https://api.elevenlabs.io").rstrip("/")
+VOICE_ID = os.getenv("VOICE_ID", "uyVNoMrnUku1dZyVEXwD")
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_TIMEOUT_SECONDS = float(os.getenv("TTS_TIMEOUT_SECONDS", "30"))
+TTS_MAX_CHARS = 4900
+VOICE_SETTINGS = {"stability": 0.7, "similarity_boost": 0.7}
+
+_http_client = None
+
+
+def get_tts_client():
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=ELEVEN_BASE_URL,
+            timeout=httpx.Timeout(TTS_TIMEOUT_SECONDS, connect=5),
+            headers={"xi-api-key": ELEVEN_API_KEY or "", "Accept": "audio/mpeg"},
+        )
+    return _http_client
+
+
+async def close_tts():
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def tts_payload(text, previous_text=None, next_text=None):
+    payload = {
+        "text": text[:TTS_MAX_CHARS],
+        "model_id": TTS_MODEL_ID,
+        "voice_settings": VOICE_SETTINGS,
+    }
+    # 문장 단위로 나눠 합성할 때 앞뒤 문맥을 주면 억양이 끊기지 않음
+    if previous_text:
+        payload["previous_text"] = previous_text
+    if next_text:
+        payload["next_text"] = next_text
+    return payload
+
+
+async def synthesize(text, previous_text=None, next_text=None, voice_id=VOICE_ID, refresh=False):
+    """텍스트 → mp3 bytes (캐시 히트면 ElevenLabs 호출 없음, refresh=True 면 다시 합성해 덮어씀)"""
+    payload = tts_payload(text, previous_text, next_text)
+    cache_key = tts_cache_key(payload, voice_id)
+    if not refresh:
+        cached = await asyncio.to_thread(tts_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    async def post():
+        response = await get_tts_client().post(f"/v1/text-to-speech/{voice_id}", json=payload)
+        if response.status_code != 200:
+            raise UpstreamStatusError("elevenlabs", response.status_code, response.text)
+        return response.content
+
+    audio = await call_async("elevenlabs", post)
+    await asyncio.to_thread(tts_cache.put, cache_key, audio)
+    return audio
+
+
+async def synthesize_stream(text, voice_id=VOICE_ID):
+    """텍스트 → mp3 조각을 ElevenLabs 스트리밍 엔드포인트에서 받는 대로 yield
+
+    캐시 히트면 캐시된 mp3 를 그대로 돌려줌. 미스면 받은 조각을 캐시 디렉터리의 임시 파일에도 써 두고
+    끝까지 받았을 때만 캐시에 넣는다 → 요청당 메모리는 조각 크기로 일정.
+    이미 오디오를 보낸 뒤에는 다시 시도할 수 없으므로 재시도 없이 브레이커만 적용 (llm.stream_llm 과 같은 방식)
+    """
+    payload = tts_payload(text)
+    cache_key = tts_cache_key(payload, voice_id)
+    cached = await asyncio.to_thread(tts_cache.get, cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    breaker = get_breaker("elevenlabs")
+    breaker.before_call()
+    spool = tts_cache.open_spool() if tts_cache.enabled else None
+    sent_any = False
+    completed = False
+    try:
+        async with get_tts_client().stream("POST", f"/v1/text-to-speech/{voice_id}/stream", json=payload) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode("utf-8", errors="replace")
+                raise UpstreamStatusError("elevenlabs", response.status_code, body)
+            # chunk_size 를 주면 httpx 가 그만큼 모을 때까지 기다리므로 소켓에서 읽힌 그대로 전달
+            async for chunk in response.aiter_bytes():
+                if spool is not None:
+                    spool.write(chunk)
+                sent_any = True
+                yield chunk
+        completed = True
+        breaker.record_success()
+    except (GeneratorExit, asyncio.CancelledError):
+        # 클라이언트가 연결을 끊은 경우 - 오류로 세지 않음
+        if sent_any:
+            breaker.record_success()
+        raise
+    except Exception as e:
+        breaker.record(e)
+        raise
+    finally:
+        if spool is not None:
+            spool.close()
+            if completed:
+                await asyncio.to_thread(tts_cache.put_file, cache_key, spool.name)
+            else:
+                os.remove(spool.name)
+
+
+# 문장 끝: 마침표/물음표/느낌표/말줄임표(와 뒤따르는 닫는 따옴표·괄호) + 공백, 또는 줄바꿈
+_SENTENCE_END = re.compile(r"(?<=[.!?。…~])[\"'”’)\]]*\s+|\n+")
+
+
+class SentenceSplitter:
+    """스트리밍 텍스트를 문장 단위로 잘라냄 - 너무 짧은 문장("네.")은 다음 문장과 합쳐서 TTS 호출 수를 줄임"""
+
+    def __init__(self, min_chars=10):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """새 텍스트 조각 추가 → 완성된 문장 목록"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """스트림 종료 시 남은 텍스트"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
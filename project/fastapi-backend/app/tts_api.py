@@ -1,45 +1,51 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from fastapi.responses import StreamingResponse
-from io import BytesIO
-import requests, os
+import time
 from dotenv import load_dotenv
+from app.resilience import CircuitOpenError
+from app.tts import TTS_MAX_CHARS, synthesize_stream
 
 load_dotenv()
 router = APIRouter()
 
-ELEVEN_API_KEY = os.getenv("ELEVEN_API_KEY")
-VOICE_ID = "uyVNoMrnUku1dZyVEXwD"
-
 class TTSRequest(BaseModel):
     user_id: str
     message: str
 
+# ElevenLabs 스트리밍 합성을 그대로 중계 - 첫 조각이 오면 바로 재생 시작 (전체 mp3 를 메모리에 모으지 않음)
 @router.post("/tts")
-def tts(req: TTSRequest):
+async def tts(req: TTSRequest):
+    started = time.perf_counter()
     text = req.message.strip()
-    if len(text) > 4900:
-        text = text[:4900]
-
-    headers = {
-        "xi-api-key": ELEVEN_API_KEY,
-        "Content-Type": "application/json",
-        "Accept": "audio/mpeg"
-    }
-    payload = {
-        "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {"stability": 0.7, "similarity_boost": 0.7}
-    }
+    if len(text) > TTS_MAX_CHARS:
+        text = text[:TTS_MAX_CHARS]
+
+    chunks = synthesize_stream(text)
 
+    # 첫 조각까지는 기다렸다가 응답 시작 → ElevenLabs 실패를 정상적인 HTTP 오류로 돌려줄 수 있음
     try:
-        r = requests.post(f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}",
-                          headers=headers, json=payload)
-        if r.status_code != 200:
-            raise Exception(r.text)
-        return StreamingResponse(BytesIO(r.content), media_type="audio/mpeg")
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="TTS 생성 실패: 빈 응답")
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS 생성 실패: {str(e)}")
+    print(f"🔊 첫 오디오 조각 {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    async def body():
+        yield first
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            # 이미 일부 오디오를 보낸 뒤라 상태 코드를 바꿀 수 없음 - 여기서 끊음
+            print(f"TTS 스트리밍 중간 실패: {e}")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(body(), media_type="audio/mpeg", headers={"X-Accel-Buffering": "no"})
 
 
 # from fastapi import APIRouter, HTTPException
@@ -0,0 +1,135 @@
+# app/tts_audio.py ← 업로드한 TTS 음성 메타데이터 (다시듣기 인덱스)
+#
+# emotion_spending.tts_audio 에 /tts_upload 한 건마다 문서 1개:
+#   { user_id, s3_key, text_hash, size_bytes, duration_seconds, created_at }
+# /tts_replay 는 S3 목록(list_objects_v2, O(객체 수), 1000개 넘으면 틀림) 대신
+# (user_id, _id 내림차순) 인덱스로 사용자별 최신/이전 기록을 찾는다.
+# 이 인덱스가 생기기 전에 올라간 음성은 scripts/backfill_tts_audio.py 로 한 번 채워 넣는다.
+import hashlib
+import os
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from app.db import get_emotion_db
+
+TTS_AUDIO_COLLECTION = "tts_audio"
+TTS_AUDIO_PREFIX = "tts_audio/"
+TTS_AUDIO_INDEXES = [
+    # 사용자별 최신순 + before 커서 페이지
+    ([("user_id", ASCENDING), ("_id", DESCENDING)], {"name": "user_id_id"}),
+    # 파일명으로 다시듣기 (node-backend 는 s3_key 의 파일명을 넘김)
+    ([("s3_key", ASCENDING)], {"name": "s3_key", "unique": True}),
+]
+
+TTS_AUDIO_PENDING = "pending"
+TTS_AUDIO_READY = "ready"
+TTS_AUDIO_FAILED = "failed"
+# 다시듣기 대상 (status 없는 예전 문서 포함)
+REPLAYABLE = {"status": {"$nin": [TTS_AUDIO_PENDING, TTS_AUDIO_FAILED]}}
+
+# MPEG-1 Layer III 비트레이트 (kbps) - 프레임 헤더 비트레이트 인덱스 순
+_MP3_BITRATES_KBPS = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+DEFAULT_MP3_BITRATE_KBPS = 128  # ElevenLabs 기본 출력 mp3_44100_128
+
+
+def tts_audio_collection():
+    return get_emotion_db()[TTS_AUDIO_COLLECTION]
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def estimate_mp3_duration(audio):
+    """고정 비트레이트 mp3 길이(초) - 첫 프레임 헤더의 비트레이트로 계산 (못 읽으면 128kbps 가정)"""
+    bitrate = DEFAULT_MP3_BITRATE_KBPS
+    start = 0
+    if audio[:3] == b"ID3" and len(audio) >= 10:
+        # ID3v2 태그 크기 (syncsafe 28비트)
+        start = 10 + ((audio[6] & 0x7F) << 21 | (audio[7] & 0x7F) << 14 | (audio[8] & 0x7F) << 7 | (audio[9] & 0x7F))
+    if len(audio) >= start + 4 and audio[start] == 0xFF and (audio[start + 1] & 0xFE) == 0xFA:
+        index = audio[start + 2] >> 4
+        if 0 < index < len(_MP3_BITRATES_KBPS):
+            bitrate = _MP3_BITRATES_KBPS[index]
+    return round(max(0, len(audio) - start) * 8 / (bitrate * 1000), 2)
+
+
+def record_tts_audio(user_id, s3_key, text, audio, status=TTS_AUDIO_READY):
+    """s3_key 기준 upsert - 업로드 전 pending 으로 자리를 잡고, 끝나면 같은 문서를 ready/failed 로"""
+    now = datetime.now()
+    fields = {
+        "user_id": user_id,
+        "text_hash": text_hash(text),
+        "size_bytes": len(audio),
+        "duration_seconds": estimate_mp3_duration(audio),
+        "status": status,
+    }
+    if status == TTS_AUDIO_READY:
+        fields["uploaded_at"] = now
+    tts_audio_collection().update_one(
+        {"s3_key": s3_key},
+        {"$set": fields, "$setOnInsert": {"created_at": now}},
+        upsert=True,
+    )
+
+
+def user_id_of_s3_key(s3_key):
+    """tts_audio/{user_id}_{uuid}.mp3 → user_id (형식이 다르면 None)"""
+    name = s3_key.rsplit("/", 1)[-1]
+    if not name.endswith(".mp3") or "_" not in name:
+        return None
+    return name.rsplit("_", 1)[0] or None
+
+
+def record_legacy_tts_audio(s3_key, size_bytes, last_modified):
+    """메타데이터 없이 올라간 예전 음성을 S3 목록 정보로 등록 (이미 있으면 False)
+
+    _id 의 시각을 S3 LastModified 로 맞춰서 사용자별 최신순(_id 내림차순)에 업로드 순서대로 들어가게 한다.
+    """
+    user_id = user_id_of_s3_key(s3_key)
+    if user_id is None:
+        return False
+    created_at = last_modified.astimezone().replace(tzinfo=None) if last_modified.tzinfo else last_modified
+    doc = {
+        "_id": ObjectId(int(last_modified.timestamp()).to_bytes(4, "big") + os.urandom(8)),
+        "user_id": user_id,
+        "s3_key": s3_key,
+        "text_hash": None,
+        "size_bytes": size_bytes,
+        "duration_seconds": round(size_bytes * 8 / (DEFAULT_MP3_BITRATE_KBPS * 1000), 2),
+        "status": TTS_AUDIO_READY,
+        "created_at": created_at,
+        "uploaded_at": created_at,
+        "backfilled_at": datetime.now(),
+    }
+    try:
+        tts_audio_collection().insert_one(doc)
+    except DuplicateKeyError:
+        # 그 사이 /tts_upload 가 같은 키를 기록함 (s3_key 유니크 인덱스)
+        return False
+    return True
+
+
+def find_tts_audio(s3_key):
+    return tts_audio_collection().find_one({"s3_key": s3_key})
+
+
+def list_tts_audio(user_id, limit, before=None):
+    """다시듣기 가능한 사용자 음성 기록 최신순 limit 개 (before: 이전 페이지 마지막 항목의 id)"""
+    query = {"user_id": user_id, **REPLAYABLE}
+    if before:
+        query["_id"] = {"$lt": ObjectId(before)}
+    return list(tts_audio_collection().find(query).sort("_id", DESCENDING).limit(limit))
+
+
+def serialize_tts_audio(doc):
+    return {
+        "id": str(doc["_id"]),
+        "s3_key": doc["s3_key"],
+        "text_hash": doc.get("text_hash"),
+        "size_bytes": doc.get("size_bytes"),
+        "duration_seconds": doc.get("duration_seconds"),
+        "status": doc.get("status", TTS_AUDIO_READY),
+        "created_at": doc["created_at"].isoformat() if isinstance(doc.get("created_at"), datetime) else None,
+    }
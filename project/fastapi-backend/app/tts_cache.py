@@ -0,0 +1,262 @@
+# app/tts_cache.py ← 내용 주소(content-addressed) TTS 음성 캐시
+#
+# 키 = sha256(text, voice_id, model_id, voice_settings, ...) - 합성 결과를 바꾸는 요청 필드 전체.
+# 같은 문장(특히 diary_api 의 고정 조언 문구)은 ElevenLabs 를 다시 부르지 않는다.
+#   - 1차: 로컬 디스크 TTS_CACHE_DIR (TTS_CACHE_MAX_BYTES 초과 시 가장 오래 안 쓴 파일부터 삭제)
+#   - 2차: S3 TTS_CACHE_S3_BUCKET/TTS_CACHE_S3_PREFIX (설정 시, 여러 파드가 공유 - 만료는 버킷 수명 주기 규칙으로)
+# 디스크/S3 는 블로킹 I/O 라 비동기 코드에서는 asyncio.to_thread 로 호출한다.
+# 전체 조언 카탈로그 미리 합성: scripts/prerender_tts.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from app.resilience import call_sync
+from app.s3 import get_s3_client
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TTS_CACHE_S3_BUCKET = os.getenv("TTS_CACHE_S3_BUCKET") or None
+TTS_CACHE_S3_PREFIX = os.getenv("TTS_CACHE_S3_PREFIX", "tts_cache/")
+
+
+def tts_cache_key(payload, voice_id):
+    """합성 요청 payload(text, model_id, voice_settings, previous_text ...) + voice_id 의 해시"""
+    raw = json.dumps({"voice_id": voice_id, **payload}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES,
+                 s3_bucket=TTS_CACHE_S3_BUCKET, s3_prefix=TTS_CACHE_S3_PREFIX):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix
+        self._lock = threading.Lock()
+        self._index = None  # key → [size, last_used]
+        self._bytes = 0
+        self.counters = {"hits": 0, "s3_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.s3_bucket)
+
+    # ---------- 디스크 ----------
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _load_index(self):
+        """처음 사용할 때 디렉터리를 한 번 훑어 크기/최근 사용 시각 인덱스 구성"""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._bytes = 0
+        if not os.path.isdir(self.directory):
+            return
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".mp3"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                self._index[name[:-4]] = [stat.st_size, stat.st_mtime]
+                self._bytes += stat.st_size
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            del self._index[key]
+            self._bytes -= size
+            self.counters["evictions"] += 1
+
+    def _get_disk(self, key):
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            self._index[key][1] = time.time()
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            os.utime(self._path(key))
+            return audio
+        except FileNotFoundError:
+            with self._lock:
+                entry = self._index.pop(key, None)
+                if entry:
+                    self._bytes -= entry[0]
+            return None
+
+    def _put_disk(self, key, audio):
+        if self.max_bytes <= 0 or len(audio) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 다른 워커가 읽는 중에도 깨진 파일이 보이지 않도록 임시 파일에 쓰고 rename
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        self._index_add(key, len(audio))
+
+    def _index_add(self, key, size):
+        with self._lock:
+            self._load_index()
+            previous = self._index.get(key)
+            if previous:
+                self._bytes -= previous[0]
+            self._index[key] = [size, time.time()]
+            self._bytes += size
+            self._evict()
+
+    # ---------- S3 ----------
+
+    def _get_s3(self, key):
+        if not self.s3_bucket:
+            return None
+        client = get_s3_client()
+        try:
+            response = call_sync("s3", lambda: client.get_object(Bucket=self.s3_bucket, Key=self.s3_prefix + key + ".mp3"),
+                                 retries=0)
+            return response["Body"].read()
+        except client.exceptions.NoSuchKey:
+            return None
+
+    def _head_s3(self, key):
+        """S3 에 객체가 있는지 HEAD 로만 확인 (본문은 받지 않음)"""
+        if not self.s3_bucket:
+            return False
+        client = get_s3_client()
+        try:
+            call_sync("s3", lambda: client.head_object(Bucket=self.s3_bucket, Key=self.s3_prefix + key + ".mp3"),
+                      retries=0)
+            return True
+        except client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _put_s3(self, key, audio):
+        if not self.s3_bucket:
+            return
+        client = get_s3_client()
+        call_sync("s3", lambda: client.put_object(
+            Bucket=self.s3_bucket, Key=self.s3_prefix + key + ".mp3", Body=audio, ContentType="audio/mpeg",
+        ))
+
+    def _put_s3_file(self, key, file_path):
+        if not self.s3_bucket:
+            return
+        client = get_s3_client()
+
+        def upload():
+            with open(file_path, "rb") as f:
+                return client.put_object(
+                    Bucket=self.s3_bucket, Key=self.s3_prefix + key + ".mp3", Body=f, ContentType="audio/mpeg",
+                )
+
+        call_sync("s3", upload)
+
+    # ---------- 공개 API (블로킹) ----------
+
+    def get(self, key):
+        """캐시된 mp3 bytes (없으면 None) - 디스크 → S3 순, S3 히트는 디스크에도 채움"""
+        if not self.enabled:
+            return None
+        audio = self._get_disk(key)
+        if audio is not None:
+            self._count("hits")
+            return audio
+        try:
+            audio = self._get_s3(key)
+        except Exception as e:
+            print(f"⚠️ TTS 캐시 S3 조회 실패: {e}")
+            self._count("errors")
+            audio = None
+        if audio is not None:
+            self._count("s3_hits")
+            self._put_disk(key, audio)
+            return audio
+        self._count("misses")
+        return None
+
+    def contains(self, key):
+        """캐시에 있는지 (디스크 → S3 HEAD 순) - 디스크가 비어 있는 새 서버에서도 S3 에 있으면 True"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            self._load_index()
+            if key in self._index:
+                return True
+        try:
+            return self._head_s3(key)
+        except Exception as e:
+            print(f"⚠️ TTS 캐시 S3 조회 실패: {e}")
+            self._count("errors")
+            return False
+
+    def put(self, key, audio):
+        if not self.enabled or not audio:
+            return
+        try:
+            self._put_disk(key, audio)
+            self._put_s3(key, audio)
+            self._count("stores")
+        except Exception as e:
+            print(f"⚠️ TTS 캐시 저장 실패: {e}")
+            self._count("errors")
+
+    def open_spool(self):
+        """스트리밍으로 받는 음성을 조각째 쓸 임시 파일 (캐시 디렉터리 안 - 완료 후 put_file 로 rename)"""
+        os.makedirs(self.directory, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False)
+
+    def put_file(self, key, tmp_path):
+        """open_spool 로 받아 둔 파일을 메모리에 올리지 않고 캐시에 넣음 (tmp_path 는 항상 정리됨)"""
+        try:
+            size = os.path.getsize(tmp_path)
+            if not self.enabled or size == 0:
+                return
+            self._put_s3_file(key, tmp_path)
+            if 0 < size <= self.max_bytes:
+                path = self._path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                self._index_add(key, size)
+            self._count("stores")
+        except Exception as e:
+            print(f"⚠️ TTS 캐시 저장 실패: {e}")
+            self._count("errors")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._index) if self._index is not None else None
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        stats["s3_bucket"] = self.s3_bucket
+        lookups = stats["hits"] + stats["s3_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["s3_hits"]) / lookups, 3) if lookups else 0
+        return stats
+
+
+tts_cache = TTSCache()
@@ -1,48 +1,92 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
-import os, boto3
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
 from dotenv import load_dotenv
+from app.resilience import call_sync
+from app.s3 import S3_BUCKET_NAME, get_s3_client
+from app.tts_audio import find_tts_audio, list_tts_audio, serialize_tts_audio, TTS_AUDIO_PENDING, TTS_AUDIO_FAILED
 
 load_dotenv()
 router = APIRouter()
 
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
-S3_REGION = os.getenv("S3_REGION", "ap-southeast-2")
+TTS_REPLAY_PAGE_MAX = 50
+PRESIGNED_URL_EXPIRES = 3600
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=S3_REGION
-)
 
+def presigned_url(s3_key):
+    # presigned URL 은 로컬 서명이라 S3 호출 없음
+    return get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': S3_BUCKET_NAME, 'Key': s3_key},
+        ExpiresIn=PRESIGNED_URL_EXPIRES
+    )
+
+
+def audio_exists(s3_key):
+    """메타데이터가 없는 예전 업로드 - 객체가 실제로 있는지 HEAD 로만 확인"""
+    s3_client = get_s3_client()
+    try:
+        call_sync("s3", lambda: s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=s3_key), retries=0)
+        return True
+    except s3_client.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+
+# 다시듣기 - tts_audio 메타데이터 인덱스로 조회 (S3 목록을 훑지 않음)
+#   ?filename=xxx.mp3           → 그 파일
+#   ?user_id=u                  → 사용자의 가장 최근 음성
+#   ?user_id=u&limit=20&before= → 사용자 음성 기록 페이지 (최신순)
 @router.get("/tts_replay")
-def tts_replay_latest():
+def tts_replay_latest(
+    user_id: Optional[str] = None,
+    filename: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=TTS_REPLAY_PAGE_MAX),
+    before: Optional[str] = Query(None, description="이전 응답의 next_cursor"),
+):
     try:
-        
-        response = s3_client.list_objects_v2(
-            Bucket=S3_BUCKET_NAME,
-            Prefix="tts_audio/"
-        )
+        if filename:
+            s3_key = f"tts_audio/{filename.split('/')[-1]}"
+            doc = find_tts_audio(s3_key)
+            status = doc.get("status") if doc else None
+            if status == TTS_AUDIO_PENDING:
+                # 백그라운드 업로드 중 (/tts_upload 즉시 응답 모드)
+                raise HTTPException(status_code=409, detail="음성을 아직 업로드하는 중입니다.", headers={"Retry-After": "1"})
+            if status == TTS_AUDIO_FAILED or (doc is None and not audio_exists(s3_key)):
+                raise HTTPException(status_code=404, detail="TTS 파일이 존재하지 않습니다.")
+            item = serialize_tts_audio(doc) if doc else {"s3_key": s3_key}
+            return JSONResponse({"url": presigned_url(s3_key), **item})
+
+        if not user_id:
+            raise HTTPException(status_code=400, detail="user_id 또는 filename 이 필요합니다.")
 
-        
-        if 'Contents' not in response or not response['Contents']:
-            raise HTTPException(status_code=404, detail="TTS 파일이 존재하지 않습니다.")
+        if before:
+            try:
+                ObjectId(before)
+            except (InvalidId, TypeError):
+                raise HTTPException(status_code=400, detail="잘못된 before 커서입니다")
 
-        
-        latest_file = max(response['Contents'], key=lambda x: x['LastModified'])
-        s3_key = latest_file['Key']
+        page_size = limit or 1
+        docs = list_tts_audio(user_id, page_size + 1, before)
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
 
-        
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': S3_BUCKET_NAME, 'Key': s3_key},
-            ExpiresIn=3600
-        )
+        if limit is None:
+            # 기존 응답 형태 유지: 가장 최근 1건
+            if not docs:
+                raise HTTPException(status_code=404, detail="TTS 파일이 존재하지 않습니다.")
+            return JSONResponse({"url": presigned_url(docs[0]["s3_key"]), **serialize_tts_audio(docs[0])})
 
-        return JSONResponse({"url": presigned_url, "s3_key": s3_key})
+        return JSONResponse({
+            "items": [{"url": presigned_url(doc["s3_key"]), **serialize_tts_audio(doc)} for doc in docs],
+            "has_more": has_more,
+            "next_cursor": str(docs[-1]["_id"]) if has_more else None,
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Presigned URL 생성 실패: {str(e)}")
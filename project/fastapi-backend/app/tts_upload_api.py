@@ -1,37 +1,45 @@
 # 📄 tts_upload_api.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from io import BytesIO
-import requests, os, uuid, boto3
+import requests, time, uuid
 from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
+from app.resilience import call_sync, CircuitOpenError, UpstreamStatusError
+from app.tts import ELEVEN_API_KEY, ELEVEN_BASE_URL, VOICE_ID, TTS_TIMEOUT_SECONDS, tts_payload
+from app.tts_cache import tts_cache, tts_cache_key
+from app.tts_audio import record_tts_audio, TTS_AUDIO_PENDING, TTS_AUDIO_READY, TTS_AUDIO_FAILED
+from app.s3 import s3_object_url
+from app.s3_uploader import upload_audio, submit_upload
 
 load_dotenv()
 router = APIRouter()
 
-# 환경 변수 로드
-ELEVEN_API_KEY = os.getenv("ELEVEN_API_KEY")
-VOICE_ID = os.getenv("VOICE_ID", "uyVNoMrnUku1dZyVEXwD")
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
-S3_REGION = os.getenv("S3_REGION", "ap-southeast-2")
-
-# S3 클라이언트 생성
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=S3_REGION
-)
+# ElevenLabs 설정은 app/tts.py, S3 클라이언트/버킷은 app/s3.py 공용
 
 # 요청 Body 모델
 class TTSUploadRequest(BaseModel):
     user_id: str
     message: str
+    # "url": JSON {url, s3_key} / "stream": mp3 바로 응답 (s3_key 는 X-Audio-S3-Key 헤더)
+    return_type: str = "url"
+    # True 면 S3 업로드 완료를 기다리지 않음 (return_type="stream" 은 항상 백그라운드)
+    background: bool = False
+
+
+def save_metadata(user_id, s3_key, text, audio, status):
+    # 다시듣기 인덱스 기록 - 실패해도 업로드 자체는 성공 (/tts_replay?filename= 은 S3 HEAD 로 폴백)
+    try:
+        record_tts_audio(user_id, s3_key, text, audio, status)
+    except PyMongoError as e:
+        print(f"⚠️ TTS 메타데이터 저장 실패: {e}")
 
 @router.post("/tts_upload")
 def tts_upload(req: TTSUploadRequest):
+    started = time.perf_counter()
+    if req.return_type not in ("url", "stream"):
+        raise HTTPException(status_code=400, detail="return_type 은 url 또는 stream 이어야 합니다.")
     text = req.message.strip()
     if not text:
         raise HTTPException(status_code=400, detail="메시지가 비어 있습니다.")
@@ -44,31 +52,50 @@ def tts_upload(req: TTSUploadRequest):
         "Content-Type": "application/json",
         "Accept": "audio/mpeg"
     }
-    payload = {
-        "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {"stability": 0.7, "similarity_boost": 0.7}
-    }
+    payload = tts_payload(text)
+    cache_key = tts_cache_key(payload, VOICE_ID)
 
-    try:
-        # TTS 음성 생성
-        r = requests.post(f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}",
-                          headers=headers, json=payload)
+    def synthesize():
+        r = requests.post(f"{ELEVEN_BASE_URL}/v1/text-to-speech/{VOICE_ID}",
+                          headers=headers, json=payload, timeout=TTS_TIMEOUT_SECONDS)
         if r.status_code != 200:
-            raise Exception(f"ElevenLabs 오류: {r.status_code} - {r.text}")
+            raise UpstreamStatusError("elevenlabs", r.status_code, r.text)
+        return r.content
+
+    try:
+        # TTS 음성 생성 (캐시 히트면 ElevenLabs 호출 생략)
+        audio = tts_cache.get(cache_key)
+        if audio is None:
+            audio = call_sync("elevenlabs", synthesize)
+            tts_cache.put(cache_key, audio)
 
-        # S3에 업로드
+        # S3 키(와 URL)는 업로드 전에 미리 정해 둠
         filename = f"{req.user_id}_{uuid.uuid4().hex}.mp3"
         s3_key = f"tts_audio/{filename}"
-        s3_client.upload_fileobj(
-            BytesIO(r.content),
-            S3_BUCKET_NAME,
-            s3_key,
-            ExtraArgs={'ContentType': 'audio/mpeg'}
-        )
+        s3_url = s3_object_url(s3_key)
+
+        if req.return_type == "url" and not req.background:
+            upload_audio(s3_key, audio)
+            save_metadata(req.user_id, s3_key, text, audio, TTS_AUDIO_READY)
+            return JSONResponse({"url": s3_url, "s3_key": s3_key})
+
+        # 즉시 응답 모드: pending 으로 자리를 잡고 업로드는 워커에서 → 끝나면 ready/failed
+        save_metadata(req.user_id, s3_key, text, audio, TTS_AUDIO_PENDING)
+        submit_upload(s3_key, audio, lambda ok: save_metadata(
+            req.user_id, s3_key, text, audio, TTS_AUDIO_READY if ok else TTS_AUDIO_FAILED,
+        ))
+        print(f"📤 TTS 응답 {(time.perf_counter() - started) * 1000:.0f}ms (S3 업로드는 백그라운드)")
 
-        s3_url = f"https://{S3_BUCKET_NAME}.s3.{S3_REGION}.amazonaws.com/{s3_key}"
-        return JSONResponse({"url": s3_url, "s3_key": s3_key})
+        if req.return_type == "stream":
+            return StreamingResponse(BytesIO(audio), media_type="audio/mpeg", headers={
+                "X-Audio-S3-Key": s3_key,
+                "X-Audio-URL": s3_url,
+                "X-Upload-Status": TTS_AUDIO_PENDING,
+                "Access-Control-Expose-Headers": "X-Audio-S3-Key, X-Audio-URL, X-Upload-Status",
+            })
+        return JSONResponse({"url": s3_url, "s3_key": s3_key, "status": TTS_AUDIO_PENDING})
 
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS 업로드 실패: {str(e)}")
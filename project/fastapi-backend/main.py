@@ -1,7 +1,21 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv; load_dotenv();
 
+from app.db import init_mongo, init_async_mongo, close_mongo, pool_stats
+from app import indexes
+from app.ledger_cache import ledger_cache
+from app.llm import close_llm, llm_stats
+from app.tts import close_tts
+from app.tts_cache import tts_cache
+from app.s3_uploader import shutdown_uploads, upload_stats
+from app.stt import stt_cache
+from app.response_cache import response_cache
+from app.single_flight import single_flight_stats
+from app.resilience import breaker_states, resilience_stats
+
 from app.chat_api import router as chat_router
 from app.log_api import router as log_router
 from app.logs_api import router as logs_router
@@ -11,7 +25,7 @@ from app.tts_replay_api import router as tts_replay_router
 from app.tts_upload_api import router as tts_upload_router
 from app.chat_tts_api import router as chat_tts_router
 from app.stt_api import router as stt_router
-from app.coach import router as coach_router
+from app.coach import router as coach_router, coach_stats
 from app.actual_spending_api import router as actual_spending_router
 from app.summary_api import router as summary_router
 from app.diary_api import router as diary_router
@@ -19,7 +33,24 @@ from app.conversation_api import router as conversation_router
 from app.ocr_api import router as ocr_router
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ✅ 공용 MongoDB 커넥션 풀 (ping 없이 생성 → 콜드 스타트 지연 없음)
+    init_mongo()
+    init_async_mongo()
+    # ✅ 인덱스 생성/점검은 백그라운드 스레드에서 (시작을 막지 않음)
+    index_task = asyncio.create_task(asyncio.to_thread(indexes.provision_indexes)) if indexes.MONGO_ENSURE_INDEXES else None
+    yield
+    if index_task and not index_task.done():
+        index_task.cancel()
+    await close_llm()
+    await close_tts()
+    # 백그라운드 S3 업로드가 끝난 뒤(완료 기록 포함) Mongo 를 닫음
+    await asyncio.to_thread(shutdown_uploads)
+    close_mongo()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -60,4 +91,21 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "OK", "message": "서버가 정상 작동 중입니다."}
\ No newline at end of file
+    # 서버 자체는 정상 (200) - 외부 공급자 브레이커 상태는 참고용으로 같이 보여줌
+    return {"status": "OK", "message": "서버가 정상 작동 중입니다.", "providers": breaker_states()}
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "mongo_pool": pool_stats(),
+        "indexes": indexes.last_report,
+        "ledger_cache": ledger_cache.stats(),
+        "llm": llm_stats(),
+        "response_cache": response_cache.stats(),
+        "tts_cache": tts_cache.stats(),
+        "s3_uploads": upload_stats(),
+        "stt_cache": stt_cache.stats(),
+        "single_flight": single_flight_stats(),
+        "coach": coach_stats(),
+        "resilience": resilience_stats(),
+    }
@@ -0,0 +1,77 @@
+# scripts/backfill_tts_audio.py ← tts_audio 인덱스 이전에 업로드된 음성을 emotion_spending.tts_audio 에 등록
+#
+# 사용 예:
+#   MONGODB_URI=mongodb://localhost:27017 S3_BUCKET_NAME=... python scripts/backfill_tts_audio.py
+#   python scripts/backfill_tts_audio.py --dry-run      # 등록 없이 대상 수만 출력
+#
+# /tts_replay?user_id= 는 tts_audio 문서만 보므로, 메타데이터 없이 올라간 예전 음성은 이 스크립트를
+# 한 번 돌려야 다시듣기 목록에 나온다. s3_key 기준으로 이미 있는 문서는 건너뛰어서 여러 번 돌려도 된다.
+# 파일명이 {user_id}_{uuid}.mp3 형식이 아닌 객체는 사용자를 알 수 없어 건너뛴다.
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import close_mongo  # noqa: E402
+from app.s3 import S3_BUCKET_NAME, get_s3_client  # noqa: E402
+from app.tts_audio import (  # noqa: E402
+    TTS_AUDIO_INDEXES,
+    TTS_AUDIO_PREFIX,
+    find_tts_audio,
+    record_legacy_tts_audio,
+    tts_audio_collection,
+    user_id_of_s3_key,
+)
+
+
+def ensure_tts_audio_indexes():
+    collection = tts_audio_collection()
+    for keys, options in TTS_AUDIO_INDEXES:
+        collection.create_index(keys, **options)
+
+
+def backfill(s3_client, bucket, prefix=TTS_AUDIO_PREFIX, dry_run=False):
+    """S3 목록(1000개 단위 페이지)을 훑어 메타데이터가 없는 음성을 등록, 건수 dict 반환"""
+    counts = {"objects": 0, "recorded": 0, "existing": 0, "skipped": 0}
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            counts["objects"] += 1
+            s3_key = obj["Key"]
+            if user_id_of_s3_key(s3_key) is None:
+                counts["skipped"] += 1
+                continue
+            if find_tts_audio(s3_key):
+                counts["existing"] += 1
+                continue
+            if dry_run or record_legacy_tts_audio(s3_key, obj["Size"], obj["LastModified"]):
+                counts["recorded"] += 1
+            else:
+                counts["existing"] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="예전 TTS 음성을 tts_audio 메타데이터로 등록")
+    parser.add_argument("--bucket", default=S3_BUCKET_NAME)
+    parser.add_argument("--prefix", default=TTS_AUDIO_PREFIX)
+    parser.add_argument("--dry-run", action="store_true", help="등록 없이 대상 수만 출력")
+    args = parser.parse_args()
+
+    if not args.bucket:
+        parser.error("S3_BUCKET_NAME 환경변수나 --bucket 이 필요합니다")
+
+    try:
+        if not args.dry_run:
+            ensure_tts_audio_indexes()
+        counts = backfill(get_s3_client(), args.bucket, args.prefix, args.dry_run)
+        label = "등록 예정" if args.dry_run else "등록"
+        print(f"✅ 객체 {counts['objects']}개 중 {label} {counts['recorded']}개, "
+              f"기존 {counts['existing']}개, 형식 불일치 {counts['skipped']}개")
+    finally:
+        close_mongo()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# scripts/bench_chat_stream.py ← /chat (JSON) vs /chat/stream (SSE) 첫 토큰 시간(TTFT) 비교
+#
+# 사용 예 (터미널 3개):
+#   python scripts/fake_llm_server.py --port 8765 --ttft-ms 600 --token-ms 40
+#   OPENAI_BASE_URL=http://localhost:8765/v1 OPENAI_API_KEY=fake uvicorn main:app --port 3000
+#   python scripts/bench_chat_stream.py --base-url http://localhost:3000 --requests 50 --concurrency 10
+#
+# JSON 엔드포인트는 응답 전체가 와야 첫 글자를 보여줄 수 있으므로 TTFT = 전체 응답 시간.
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+PAYLOAD = {"user_id": "bench_user", "message": "오늘 스트레스 받아서 충동구매를 했어요"}
+
+
+def percentile(values, q):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def one_json(client):
+    t0 = time.perf_counter()
+    r = await client.post("/chat", json=PAYLOAD)
+    r.raise_for_status()
+    elapsed = time.perf_counter() - t0
+    return elapsed, elapsed
+
+
+async def one_stream(client):
+    t0 = time.perf_counter()
+    ttft = None
+    async with client.stream("POST", "/chat/stream", json=PAYLOAD) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if ttft is None and line.startswith("event: token"):
+                ttft = time.perf_counter() - t0
+            if line.startswith("event: error"):
+                raise RuntimeError("stream error event")
+    total = time.perf_counter() - t0
+    return (ttft if ttft is not None else total), total
+
+
+async def run(base_url, fn, total, concurrency):
+    ttfts, totals, errors = [], [], 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            try:
+                ttft, elapsed = await fn(client)
+                ttfts.append(ttft * 1000)
+                totals.append(elapsed * 1000)
+            except (httpx.HTTPError, RuntimeError):
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return ttfts, totals, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat TTFT 벤치마크")
+    parser.add_argument("--base-url", default="http://localhost:3000")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<14} {'ttft p50':>9} {'ttft p95':>9} {'total p50':>10} {'total p95':>10} {'errors':>7}")
+    for name, fn in [("/chat", one_json), ("/chat/stream", one_stream)]:
+        ttfts, totals, errors = asyncio.run(run(args.base_url, fn, args.requests, args.concurrency))
+        print(f"{name:<14} {statistics.median(ttfts) if ttfts else 0:>9.0f} {percentile(ttfts, 0.95):>9.0f} "
+              f"{statistics.median(totals) if totals else 0:>10.0f} {percentile(totals, 0.95):>10.0f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
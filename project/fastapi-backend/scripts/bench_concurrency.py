@@ -0,0 +1,134 @@
+# scripts/bench_concurrency.py ← 동시 요청 처리량 벤치마크 (로컬 mongod + 실행 중인 FastAPI 서버)
+#
+# 사용 예:
+#   MONGODB_URI=mongodb://localhost:27017 python scripts/bench_concurrency.py --seed --records 2000
+#   python scripts/bench_concurrency.py --base-url http://localhost:3000 --concurrency 1 10 50
+#
+# 변경 전/후 비교: 이전 커밋으로 서버를 띄워 한 번, 현재 커밋으로 한 번 실행한 뒤
+# 같은 concurrency 에서의 req/s 와 p95 를 비교한다.
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/diary/entries/{user}",
+    "/diary/analytics/{user}",
+    "/conversations/{user}",
+    "/conversations/{user}/analytics",
+]
+
+
+def seed(mongo_uri, user, records):
+    """벤치마크용 가짜 사용자/일기/대화 데이터 생성"""
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_uri)
+    start = datetime(2024, 1, 1)
+    items = ["카페", "점심식사", "스트레스 쇼핑", "패션", "교통"]
+    docs = []
+    for i in range(records):
+        day = (start + timedelta(days=i)).strftime("%Y-%m-%d")
+        docs.append({
+            "날짜": day,
+            "소비목록": [
+                {"분류": "지출", "항목": random.choice(items), "금액": random.randint(1000, 90000),
+                 "상세내역": "스트레스 받아서 샀다", "감정개입": "스트레스"},
+                {"분류": "수입", "항목": "급여", "금액": 100000, "상세내역": "", "감정개입": ""},
+            ],
+        })
+    users = client.consumption_db.users
+    users.delete_many({"username": user})
+    users.insert_one({"username": user, "profile": {"records": docs}})
+
+    diary = client.consumption_db.diary_entries
+    diary.delete_many({"user_id": user})
+    diary.insert_many([
+        {"user_id": user, "date": d["날짜"], "text": "야식 시켰다", "emotion": "스트레스",
+         "consumptionType": "폭식", "amount": 20000, "satisfaction": 2, "advice": "물 한 잔"}
+        for d in docs[: records // 4 or 1]
+    ])
+
+    convos = client.emotion_spending.conversations
+    convos.delete_many({"user_id": user})
+    convos.insert_many([
+        {"user_id": user, "date": d["날짜"], "history": [
+            {"role": "user", "content": "옷 샀어"}, {"role": "user", "content": "스트레스"},
+            {"role": "user", "content": "좋아짐"}, {"role": "gpt", "content": "잘했어요"}]}
+        for d in docs[: records // 4 or 1]
+    ])
+    client.close()
+    print(f"✅ seeded user={user} records={records}")
+
+
+async def run_level(base_url, paths, concurrency, total):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker(client):
+        nonlocal errors
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            try:
+                r = await client.get(path)
+                if r.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "req_per_sec": total / elapsed if elapsed else 0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": p95 * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FastAPI 동시 요청 처리량 측정")
+    parser.add_argument("--base-url", default="http://localhost:3000")
+    parser.add_argument("--user", default="bench_user")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200, help="concurrency 단계별 총 요청 수")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--seed", action="store_true", help="측정 전에 로컬 mongod 에 데이터 생성")
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.mongo_uri, args.user, args.records)
+
+    paths = [p.format(user=args.user) for p in args.paths]
+    print(f"{'conc':>5} {'req/s':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'errors':>7}")
+    for level in args.concurrency:
+        result = asyncio.run(run_level(args.base_url, paths, level, args.requests))
+        print(f"{result['concurrency']:>5} {result['req_per_sec']:>9.1f} {result['p50_ms']:>9.1f} "
+              f"{result['p95_ms']:>9.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# scripts/bench_ledger_aggregation.py ← /summary, /actuals 계산 방식 비교 (로컬 mongod 필요)
+#
+# 사용 예:
+#   MONGODB_URI=mongodb://localhost:27017 python scripts/bench_ledger_aggregation.py --items 12000
+#
+# 비교 대상:
+#   python        : 사용자 문서 전체를 받아 파이썬 루프로 합계 계산 (기존 방식)
+#   agg-embedded  : users 임베디드 배열에 $unwind/$match/$group 파이프라인
+#   agg-txn       : transactions 컬렉션 (username, month) 인덱스 + $group
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import get_consumption_db, close_mongo  # noqa: E402
+from app.ledger_store import (  # noqa: E402
+    MIGRATED_MARKER,
+    ensure_transaction_indexes,
+    explode_records,
+    get_transactions_collection,
+    month_category_totals,
+    month_summary,
+)
+
+CATEGORIES = ["카페", "점심식사", "스트레스 쇼핑", "패션", "업무비품", "교통"]
+
+
+def make_records(items, items_per_day):
+    records = []
+    day = 0
+    while sum(len(r["소비목록"]) for r in records) < items:
+        year, rest = divmod(day, 360)
+        month, dom = divmod(rest, 30)
+        records.append({
+            "날짜": f"{2020 + year}-{month + 1:02d}-{dom + 1:02d}",
+            "소비목록": [
+                {"분류": "수입" if i == 0 and dom == 0 else "지출", "항목": random.choice(CATEGORIES),
+                 "금액": random.randint(1000, 200000), "상세내역": "벤치마크 항목 " * 8, "감정개입": "스트레스"}
+                for i in range(items_per_day)
+            ],
+        })
+        day += 1
+    return records
+
+
+def python_summary(user_doc, month):
+    income = expense = processed = 0
+    actuals = defaultdict(int)
+    for record in user_doc["profile"]["records"]:
+        if not record.get("날짜", "").startswith(month):
+            continue
+        for item in record.get("소비목록", []):
+            amount = item.get("금액", 0)
+            if isinstance(amount, (int, float)) and amount > 0:
+                if item.get("분류") == "수입":
+                    income += amount
+                elif item.get("분류") == "지출":
+                    expense += amount
+                    actuals[item.get("항목", "").strip()] += amount
+                processed += 1
+    return income, expense, processed, dict(actuals)
+
+
+def timed(fn, runs):
+    samples = []
+    result = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="월 합계 계산 방식 벤치마크")
+    parser.add_argument("--items", type=int, default=12000)
+    parser.add_argument("--items-per-day", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    users = get_consumption_db().users
+    records = make_records(args.items, args.items_per_day)
+    month = records[-1]["날짜"][:7]
+
+    users.delete_many({"username": {"$in": ["bench_embedded", "bench_txn"]}})
+    get_transactions_collection().delete_many({"username": "bench_txn"})
+    ensure_transaction_indexes()
+    embedded_id = users.insert_one({"username": "bench_embedded", "profile": {"records": records}}).inserted_id
+    txn_id = users.insert_one({"username": "bench_txn", "ledger_storage": MIGRATED_MARKER,
+                               "profile": {"records": []}}).inserted_id
+    get_transactions_collection().insert_many(explode_records("bench_txn", records))
+
+    embedded_user = {"_id": embedded_id, "username": "bench_embedded"}
+    txn_user = {"_id": txn_id, "username": "bench_txn", "ledger_storage": MIGRATED_MARKER}
+    doc_bytes = len(bson.encode(users.find_one({"_id": embedded_id})))
+    print(f"items={args.items} records={len(records)} month={month} user_doc={doc_bytes / 1024:.0f}KB")
+
+    def legacy():
+        return python_summary(users.find_one({"username": "bench_embedded"}), month)
+
+    def agg(user):
+        return lambda: (*month_summary(user, month), month_category_totals(user, month))
+
+    print(f"{'method':<14} {'median(ms)':>11}")
+    baseline = None
+    for name, fn in [("python", legacy), ("agg-embedded", agg(embedded_user)), ("agg-txn", agg(txn_user))]:
+        elapsed, result = timed(fn, args.runs)
+        baseline = baseline or result
+        match = "OK" if result == baseline else "MISMATCH"
+        print(f"{name:<14} {elapsed:>11.2f}  {match}")
+
+    users.delete_many({"_id": {"$in": [embedded_id, txn_id]}})
+    get_transactions_collection().delete_many({"username": "bench_txn"})
+    close_mongo()
+
+
+if __name__ == "__main__":
+    main()
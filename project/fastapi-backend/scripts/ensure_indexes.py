@@ -0,0 +1,42 @@
+# scripts/ensure_indexes.py ← 인덱스 생성 + 누락/미사용 인덱스, COLLSCAN 조회 점검
+#
+# 사용 예:
+#   MONGODB_URI=mongodb://localhost:27017 python scripts/ensure_indexes.py
+#   python scripts/ensure_indexes.py --check-only      # 생성 없이 점검만
+#
+# COLLSCAN 으로 실행되는 조회나 누락된 인덱스가 있으면 종료 코드 1 (배포 파이프라인에서 사용)
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import close_mongo  # noqa: E402
+from app.indexes import check_query_plans, index_report, provision_indexes  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MongoDB 인덱스 생성 및 점검")
+    parser.add_argument("--check-only", action="store_true", help="인덱스를 만들지 않고 점검만")
+    args = parser.parse_args()
+
+    try:
+        if args.check_only:
+            plans = check_query_plans()
+            report = {
+                "collections": index_report(),
+                "plans": plans,
+                "collscans": sorted(name for name, stages in plans.items() if "COLLSCAN" in stages),
+            }
+        else:
+            report = provision_indexes()
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+        missing = any(c["missing"] for c in report.get("collections", {}).values())
+        sys.exit(1 if report.get("error") or missing or report.get("collscans") else 0)
+    finally:
+        close_mongo()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# scripts/fake_llm_server.py ← 벤치마크/로컬 개발용 가짜 OpenAI + ElevenLabs 서버
+#
+# 사용 예:
+#   python scripts/fake_llm_server.py --port 8765 --ttft-ms 600 --token-ms 40
+#   OPENAI_BASE_URL=http://localhost:8765/v1 ELEVEN_BASE_URL=http://localhost:8765 OPENAI_API_KEY=fake \
+#       uvicorn main:app --port 3000
+#
+# /v1/chat/completions (stream=true 면 SSE 청크), /v1/audio/transcriptions,
+# /v1/text-to-speech/{voice_id}(/stream) 만 흉내낸다.
+# 첫 토큰까지 --ttft-ms, 이후 토큰마다 --token-ms 만큼 지연해서 GPT-4 응답 패턴을 재현하고,
+# TTS 는 --tts-ms + 글자당 --tts-char-ms 만큼 지연 후 가짜 mp3 바이트를 돌려주고,
+# 전사는 --ttft-ms + 업로드 KB 당 --stt-kb-ms 만큼 지연한다.
+import argparse
+import asyncio
+import json
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+DEFAULT_REPLY = ("오늘 하루 정말 많이 지치셨겠어요. 힘든 마음을 물건으로 달래고 싶은 건 자연스러운 일이에요. "
+                 "대신 오늘 저녁은 따뜻한 차 한 잔과 함께 짧게 산책하면서 마음을 정리해보는 건 어떨까요?")
+COACH_REPLY = json.dumps({
+    "budgets": {"식비": 600000, "쇼핑": 300000, "교통": 150000, "문화": 150000, "의료": 100000, "기타": 200000},
+    "saving_goal": 500000,
+    "tips": ["쇼핑 전 24시간 기다리기", "점심 도시락 주 2회", "구독 서비스 점검"],
+}, ensure_ascii=False)
+
+
+def create_app(ttft_ms, token_ms, chars_per_token, tts_ms=400, tts_char_ms=5, stt_kb_ms=0):
+    app = FastAPI()
+
+    def tokens_of(text):
+        return [text[i:i + chars_per_token] for i in range(0, len(text), chars_per_token)]
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        reply = COACH_REPLY if body.get("response_format") else DEFAULT_REPLY
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep((ttft_ms + token_ms * len(tokens_of(reply))) / 1000)
+            return {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        async def chunks():
+            await asyncio.sleep(ttft_ms / 1000)
+            for i, token in enumerate(tokens_of(reply)):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        size_kb = len(await upload.read()) / 1024 if upload is not None else 0
+        await asyncio.sleep((ttft_ms + stt_kb_ms * size_kb) / 1000)
+        # 분할 전사 순서 확인용으로 조각 파일명(chunk_000.webm ...)을 붙여 돌려줌
+        name = getattr(upload, "filename", "") or ""
+        suffix = f" [{name}]" if name.startswith("chunk_") else ""
+        return {"text": "오늘 스트레스 받아서 옷을 샀어요" + suffix}
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        body = await request.json()
+        text = body.get("text", "")
+        await asyncio.sleep((tts_ms + tts_char_ms * len(text)) / 1000)
+        # MPEG 프레임 헤더처럼 보이는 더미 바이트 (글자 수에 비례)
+        return Response(content=b"\xff\xfb\x90\x64" + b"\x00" * (len(text) * 200), media_type="audio/mpeg")
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech_stream(voice_id: str, request: Request):
+        body = await request.json()
+        text = body.get("text", "")
+
+        # 첫 조각은 --tts-ms 뒤, 나머지는 10글자 분량씩 글자당 --tts-char-ms 간격으로
+        async def chunks():
+            await asyncio.sleep(tts_ms / 1000)
+            yield b"\xff\xfb\x90\x64"
+            for start in range(0, len(text), 10):
+                piece = text[start:start + 10]
+                await asyncio.sleep(tts_char_ms * len(piece) / 1000)
+                yield b"\x00" * (len(piece) * 200)
+
+        return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 OpenAI 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft-ms", type=float, default=600)
+    parser.add_argument("--token-ms", type=float, default=40)
+    parser.add_argument("--chars-per-token", type=int, default=2)
+    parser.add_argument("--tts-ms", type=float, default=400)
+    parser.add_argument("--tts-char-ms", type=float, default=5)
+    parser.add_argument("--stt-kb-ms", type=float, default=0, help="전사 지연 (업로드 KB 당 ms)")
+    args = parser.parse_args()
+
+    app = create_app(args.ttft_ms, args.token_ms, args.chars_per_token, args.tts_ms, args.tts_char_ms,
+                     args.stt_kb_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# scripts/migrate_transactions.py ← users.profile.records → consumption_db.transactions 마이그레이션
+#
+# 사용 예:
+#   MONGODB_URI=mongodb://localhost:27017 python scripts/migrate_transactions.py
+#   python scripts/migrate_transactions.py --verify      # 사용자별 항목 수 비교만
+#   python scripts/migrate_transactions.py --restart     # 체크포인트 초기화 후 처음부터
+#
+# 재시작 가능: 사용자 단위로 migrations 컬렉션에 체크포인트(_id)를 남기고,
+# 항목은 (username, record_index, item_index) 기준 upsert 라서 중간에 끊겨도 다시 실행하면 된다.
+# 사용자별 이관이 끝나면 users 문서에 ledger_storage="transactions" 를 표시하고,
+# LEDGER_READ_MODE=dual(기본값) 인 서버는 그때부터 해당 사용자를 transactions 에서 읽는다.
+import argparse
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import get_consumption_db, close_mongo  # noqa: E402
+from app.ledger_store import (  # noqa: E402
+    MIGRATED_MARKER,
+    ensure_transaction_indexes,
+    explode_records,
+    get_transactions_collection,
+)
+
+CHECKPOINT_ID = "users_to_transactions"
+
+
+def migrate_user(user, batch_size):
+    records = user.get("profile", {}).get("records", [])
+    if not isinstance(records, list):
+        records = []
+    docs = explode_records(user["username"], records)
+    transactions = get_transactions_collection()
+
+    for start in range(0, len(docs), batch_size):
+        ops = [
+            UpdateOne(
+                {"username": doc["username"], "record_index": doc["record_index"], "item_index": doc["item_index"]},
+                {"$set": doc},
+                upsert=True,
+            )
+            for doc in docs[start:start + batch_size]
+        ]
+        transactions.bulk_write(ops, ordered=False)
+
+    # 원본에서 사라진 항목 정리 (재실행 시 기록이나 레코드 안 항목이 줄어든 경우)
+    # 방금 upsert 한 (record_index, item_index) 외에는 모두 삭제
+    item_indexes = defaultdict(list)
+    for doc in docs:
+        item_indexes[doc["record_index"]].append(doc["item_index"])
+    stale = [{"record_index": {"$nin": list(item_indexes)}}] + [
+        {"record_index": record_index, "item_index": {"$nin": indexes}}
+        for record_index, indexes in item_indexes.items()
+    ]
+    for start in range(0, len(stale), batch_size):
+        transactions.delete_many({"username": user["username"], "$or": stale[start:start + batch_size]})
+
+    get_consumption_db().users.update_one(
+        {"_id": user["_id"]},
+        {"$set": {"ledger_storage": MIGRATED_MARKER, "ledger_migrated_at": datetime.now()}},
+    )
+    return len(docs)
+
+
+def run(batch_size, restart):
+    db = get_consumption_db()
+    migrations = db.migrations
+    if restart:
+        migrations.delete_one({"_id": CHECKPOINT_ID})
+
+    ensure_transaction_indexes()
+
+    checkpoint = migrations.find_one({"_id": CHECKPOINT_ID}) or {}
+    query = {}
+    if checkpoint.get("last_user_id") is not None:
+        query["_id"] = {"$gt": checkpoint["last_user_id"]}
+        print(f"🔁 체크포인트에서 재개: {checkpoint['last_user_id']}")
+
+    migrated_users = 0
+    migrated_items = 0
+    for user in db.users.find(query).sort("_id", 1):
+        if not user.get("username"):
+            continue
+        count = migrate_user(user, batch_size)
+        migrations.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"last_user_id": user["_id"], "updated_at": datetime.now()},
+             "$inc": {"users": 1, "items": count}},
+            upsert=True,
+        )
+        migrated_users += 1
+        migrated_items += count
+        print(f"✅ {user['username']}: {count}개 항목 이관")
+
+    migrations.update_one({"_id": CHECKPOINT_ID}, {"$set": {"completed_at": datetime.now()}}, upsert=True)
+    print(f"완료: 사용자 {migrated_users}명, 항목 {migrated_items}개")
+
+
+def verify():
+    """users 임베디드 항목 수 vs transactions 문서 수 비교"""
+    db = get_consumption_db()
+    transactions = get_transactions_collection()
+    mismatches = 0
+    for user in db.users.find({}, {"username": 1, "profile.records": 1, "ledger_storage": 1}):
+        expected = len(explode_records(user.get("username"), user.get("profile", {}).get("records", []) or []))
+        actual = transactions.count_documents({"username": user.get("username")})
+        status = "OK" if expected == actual else "MISMATCH"
+        if expected != actual:
+            mismatches += 1
+        print(f"{status:8} {user.get('username')}: embedded={expected} transactions={actual} "
+              f"storage={user.get('ledger_storage', 'embedded')}")
+    print(f"불일치 {mismatches}건")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="소비 기록을 transactions 컬렉션으로 이관")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 지우고 처음부터 다시 이관")
+    parser.add_argument("--verify", action="store_true", help="이관 없이 항목 수만 비교")
+    args = parser.parse_args()
+
+    try:
+        if args.verify:
+            sys.exit(1 if verify() else 0)
+        run(args.batch_size, args.restart)
+    finally:
+        close_mongo()
+
+
+if __name__ == "__main__":
+    main()
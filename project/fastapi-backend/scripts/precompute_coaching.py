@@ -0,0 +1,97 @@
+# scripts/precompute_coaching.py ← 전체 사용자 /coach 결과 야간 일괄 계산
+#
+# 사용 예 (cron 등으로 하루 한 번):
+#   MONGODB_URI=mongodb://localhost:27017 python scripts/precompute_coaching.py --concurrency 8
+#   python scripts/precompute_coaching.py --user alice --force
+#
+# 사용자별로 최근 월 집계 → 지문(fingerprint) 계산 → 저장된 지문과 같으면 건너뛰고,
+# 다르면 build_coaching(LLM 포함)을 돌려 consumption_db.coaching_results 에 저장한다.
+# 이후 /coach/{user_id} 는 지문이 맞는 동안 저장된 결과를 바로 돌려준다.
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+from app.db import get_consumption_db, close_mongo  # noqa: E402
+from app.coach import load_coach_month, build_coaching, coaching_fingerprint  # noqa: E402
+from app.coach_results import get_stored_fingerprint, save_coaching  # noqa: E402
+from app.llm import close_llm  # noqa: E402
+
+
+def list_usernames(username=None):
+    query = {"username": username} if username else {"username": {"$exists": True}}
+    return [doc["username"] for doc in get_consumption_db().users.find(query, {"_id": 0, "username": 1})
+            if doc.get("username")]
+
+
+async def precompute_user(username, force, counts):
+    started = time.perf_counter()
+    try:
+        last_month, rollup = await asyncio.to_thread(load_coach_month, username)
+    except HTTPException as e:
+        counts["no_data"] += 1
+        print(f"⏭️ {username}: {e.detail}")
+        return
+    if rollup["processed_items"] == 0:
+        counts["no_data"] += 1
+        print(f"⏭️ {username}: {last_month} 소비 데이터 없음")
+        return
+
+    fingerprint = coaching_fingerprint(last_month, rollup)
+    if not force and await get_stored_fingerprint(username) == fingerprint:
+        counts["unchanged"] += 1
+        return
+
+    result, used_ai = await build_coaching(last_month, rollup)
+    if not used_ai:
+        # 폴백 결과는 저장하지 않음 → 다음 요청/배치에서 LLM 재시도
+        counts["fallback"] += 1
+        print(f"⚠️ {username}: AI 응답 실패, 저장하지 않음")
+        return
+    await save_coaching(username, last_month, fingerprint, result, computed_by="batch")
+    counts["computed"] += 1
+    print(f"✅ {username}: {last_month} ({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+
+async def precompute(usernames, concurrency, force):
+    counts = {"computed": 0, "unchanged": 0, "fallback": 0, "no_data": 0, "errors": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(username):
+        async with semaphore:
+            try:
+                await precompute_user(username, force, counts)
+            except Exception as e:
+                counts["errors"] += 1
+                print(f"❌ {username}: {e}")
+
+    try:
+        await asyncio.gather(*(run(username) for username in usernames))
+    finally:
+        await close_llm()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/coach 결과 일괄 사전 계산")
+    parser.add_argument("--user", help="지정한 사용자만 계산")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 처리할 사용자 수")
+    parser.add_argument("--force", action="store_true", help="지문이 같아도 다시 계산")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        usernames = list_usernames(args.user)
+        print(f"대상 사용자 {len(usernames)}명 (동시 {args.concurrency})")
+        counts = asyncio.run(precompute(usernames, max(1, args.concurrency), args.force))
+    finally:
+        close_mongo()
+    print(f"완료 ({time.perf_counter() - started:.1f}s): {counts}")
+
+
+if __name__ == "__main__":
+    main()
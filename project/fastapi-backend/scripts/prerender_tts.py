@@ -0,0 +1,68 @@
+# scripts/prerender_tts.py ← 고정 조언 문구 전체를 미리 음성 합성해 TTS 캐시에 채움
+#
+# 사용 예 (배포 후 한 번, 또는 조언 문구/음성 설정을 바꾼 뒤):
+#   TTS_CACHE_S3_BUCKET=my-bucket python scripts/prerender_tts.py --concurrency 4
+#   python scripts/prerender_tts.py --dry-run
+#
+# diary_api.advice_catalog() 의 문장마다 캐시 키(text, voice_id, model_id, voice_settings)를 계산해
+# 이미 캐시에 있으면 건너뛰고, 없으면 ElevenLabs 로 합성해 app.tts_cache 에 저장한다.
+# 금액/소비 유형이 들어가는 동적 문구는 대상이 아니다 (요청 시 합성 후 캐시).
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.diary_api import advice_catalog  # noqa: E402
+from app.tts import VOICE_ID, tts_payload, synthesize, close_tts  # noqa: E402
+from app.tts_cache import tts_cache, tts_cache_key  # noqa: E402
+
+
+async def prerender(texts, concurrency, force, dry_run):
+    counts = {"rendered": 0, "cached": 0, "errors": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(text):
+        cache_key = tts_cache_key(tts_payload(text), VOICE_ID)
+        if not force and await asyncio.to_thread(tts_cache.contains, cache_key):
+            counts["cached"] += 1
+            return
+        if dry_run:
+            print(f"📝 합성 필요: {text}")
+            counts["rendered"] += 1
+            return
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                audio = await synthesize(text, refresh=force)
+                counts["rendered"] += 1
+                print(f"✅ {len(audio)}B ({(time.perf_counter() - started) * 1000:.0f}ms) {text}")
+            except Exception as e:
+                counts["errors"] += 1
+                print(f"❌ {text}: {e}")
+
+    try:
+        await asyncio.gather(*(run(text) for text in texts))
+    finally:
+        await close_tts()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="고정 조언 문구 TTS 사전 합성")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 합성할 문장 수")
+    parser.add_argument("--force", action="store_true", help="캐시에 있어도 다시 합성")
+    parser.add_argument("--dry-run", action="store_true", help="합성하지 않고 캐시에 없는 문장만 출력")
+    args = parser.parse_args()
+
+    texts = advice_catalog()
+    print(f"조언 문구 {len(texts)}개 (동시 {args.concurrency}, 캐시 {tts_cache.directory})")
+    started = time.perf_counter()
+    counts = asyncio.run(prerender(texts, max(1, args.concurrency), args.force, args.dry_run))
+    print(f"완료 ({time.perf_counter() - started:.1f}s): {counts} / 캐시 {tts_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
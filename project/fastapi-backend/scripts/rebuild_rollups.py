@@ -0,0 +1,77 @@
+# scripts/rebuild_rollups.py ← consumption_db.monthly_rollups 전체 재계산
+#
+# 사용 예:
+#   MONGODB_URI=mongodb://localhost:27017 python scripts/rebuild_rollups.py
+#   python scripts/rebuild_rollups.py --user alice      # 한 사용자만
+#
+# 사용자별로 소비 기록(transactions 또는 임베디드 배열)과 diary_entries 를 읽어 월별 집계를 새로 만들고
+# users 문서에 rollups_ready=True 를 표시한다. 그 뒤로는 저장 시 $inc 로 증분 갱신되므로
+# 집계가 어긋났을 때만 다시 실행하면 된다.
+# 재계산 도중 기록이 추가되거나(ledger_version 변경) 일기가 저장되면(diary_seq 변경) 그 사용자는 다시 계산한다.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import get_consumption_db, close_mongo  # noqa: E402
+from app.ledger_store import USER_ROUTING_PROJECTION, load_ledger  # noqa: E402
+from app.rollups import ensure_rollup_indexes, diary_rollup_state, rebuild_user_rollups  # noqa: E402
+
+DIARY_PROJECTION = {"_id": 0, "date": 1, "amount": 1, "consumptionType": 1}
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 0.5
+
+
+def rebuild_user(db, user):
+    """(소비 항목 수, 일기 수, 월 수) - 계산 중 기록/일기가 바뀌면 최신 상태로 다시 계산"""
+    name = user["username"]
+    ledger, diary_entries, months = None, [], None
+    for _ in range(MAX_ATTEMPTS):
+        ledger_version = user.get("ledger_version", 0)
+        # 일기 스냅샷보다 먼저 diary_seq 를 읽어 둬야 그 사이 들어온 일기를 알아챈다
+        diary_state = diary_rollup_state(name)
+        if diary_state is not None:
+            ledger = load_ledger(user)
+            diary_entries = list(db.diary_entries.find({"user_id": name}, DIARY_PROJECTION))
+            months = rebuild_user_rollups(name, ledger, diary_entries, ledger_version, diary_state)
+            user = db.users.find_one({"_id": user["_id"]}, USER_ROUTING_PROJECTION)
+            if user is None or (months is not None and user.get("ledger_version", 0) == ledger_version):
+                break
+        print(f"🔁 {name}: 재계산 중 기록/일기 저장됨 → 다시 계산")
+        time.sleep(RETRY_DELAY_SECONDS)
+    else:
+        print(f"⚠️ {name}: 쓰기가 계속 들어오는 중 - 맞지 않는 달은 원본 계산으로 조회됩니다")
+    return len(ledger.items) if ledger else 0, len(diary_entries), months or 0
+
+
+def rebuild(username=None):
+    db = get_consumption_db()
+    ensure_rollup_indexes()
+
+    query = {"username": username} if username else {"username": {"$exists": True}}
+    users = 0
+    for user in db.users.find(query, USER_ROUTING_PROJECTION):
+        name = user.get("username")
+        if not name:
+            continue
+        item_count, diary_count, months = rebuild_user(db, user)
+        users += 1
+        print(f"✅ {name}: 소비 항목 {item_count}개, 일기 {diary_count}개 → {months}개월")
+    print(f"완료: 사용자 {users}명")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="월별 집계(monthly_rollups) 재계산")
+    parser.add_argument("--user", help="지정한 사용자만 재계산")
+    args = parser.parse_args()
+
+    try:
+        rebuild(args.user)
+    finally:
+        close_mongo()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# tests/test_tts_replay.py ← /tts_replay 다시듣기 (파일명 조회 / 최신 / 페이지) + 예전 음성 backfill
+#
+# S3 는 moto, MongoDB 는 mongomock 으로 대신한다 (외부 서비스 없이 실행).
+#   pip install pytest moto mongomock httpx
+#   python -m pytest tests/test_tts_replay.py -q
+import os
+import sys
+import time
+
+import mongomock
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db as db_module  # noqa: E402
+from app import s3 as s3_module  # noqa: E402
+from app import tts_replay_api  # noqa: E402
+from app.tts_audio import (  # noqa: E402
+    TTS_AUDIO_PENDING,
+    TTS_AUDIO_READY,
+    find_tts_audio,
+    record_tts_audio,
+)
+from scripts.backfill_tts_audio import backfill, ensure_tts_audio_indexes  # noqa: E402
+
+BUCKET = "tts-bucket"
+MP3 = b"\xff\xfb\x90\x00" + b"\x00" * 4000
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    with mock_aws():
+        monkeypatch.setattr(s3_module, "_s3_client", None)
+        monkeypatch.setattr(s3_module, "S3_ENDPOINT_URL", None)
+        monkeypatch.setattr(tts_replay_api, "S3_BUCKET_NAME", BUCKET)
+        client = s3_module.get_s3_client()
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": s3_module.S3_REGION})
+        yield client
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(db_module, "_client", client)
+    ensure_tts_audio_indexes()
+    return client
+
+
+@pytest.fixture
+def api(s3, mongo):
+    app = FastAPI()
+    app.include_router(tts_replay_api.router)
+    return TestClient(app)
+
+
+def upload(s3, user_id, name, status=TTS_AUDIO_READY, text="안녕하세요"):
+    """/tts_upload 와 같은 키 형식으로 올리고 메타데이터 기록"""
+    s3_key = f"tts_audio/{user_id}_{name}.mp3"
+    s3.put_object(Bucket=BUCKET, Key=s3_key, Body=MP3)
+    record_tts_audio(user_id, s3_key, text, MP3, status)
+    return s3_key
+
+
+def upload_legacy(s3, user_id, name):
+    """메타데이터 인덱스 이전 업로드 - S3 객체만 있음"""
+    s3_key = f"tts_audio/{user_id}_{name}.mp3"
+    s3.put_object(Bucket=BUCKET, Key=s3_key, Body=MP3)
+    return s3_key
+
+
+def test_filename_lookup(api, s3):
+    s3_key = upload(s3, "u1", "a")
+    upload(s3, "u1", "b", status=TTS_AUDIO_PENDING)
+    upload_legacy(s3, "u1", "old")
+
+    res = api.get("/tts_replay", params={"filename": "u1_a.mp3"})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["s3_key"] == s3_key
+    assert body["status"] == TTS_AUDIO_READY
+    assert f"/{s3_key}" in body["url"]
+
+    # 업로드 중 / 메타데이터 없는 예전 객체 / 없는 파일
+    assert api.get("/tts_replay", params={"filename": "u1_b.mp3"}).status_code == 409
+    assert api.get("/tts_replay", params={"filename": "u1_old.mp3"}).json()["s3_key"] == "tts_audio/u1_old.mp3"
+    assert api.get("/tts_replay", params={"filename": "u1_missing.mp3"}).status_code == 404
+
+
+def test_latest_and_paging(api, s3):
+    keys = [upload(s3, "u1", f"n{i}") for i in range(5)]
+    upload(s3, "u2", "other")
+    upload(s3, "u1", "pending", status=TTS_AUDIO_PENDING)
+
+    latest = api.get("/tts_replay", params={"user_id": "u1"})
+    assert latest.status_code == 200
+    assert latest.json()["s3_key"] == keys[-1]
+
+    seen = []
+    before = None
+    while True:
+        params = {"user_id": "u1", "limit": 2, **({"before": before} if before else {})}
+        page = api.get("/tts_replay", params=params).json()
+        seen += [item["s3_key"] for item in page["items"]]
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            break
+        before = page["next_cursor"]
+    assert seen == keys[::-1]
+
+    assert api.get("/tts_replay", params={"user_id": "nobody"}).status_code == 404
+    assert api.get("/tts_replay", params={"user_id": "u1", "before": "bad"}).status_code == 400
+
+
+def test_backfill_indexes_legacy_uploads(api, s3):
+    legacy = [upload_legacy(s3, "u1", f"old{i}") for i in range(3)]
+    s3.put_object(Bucket=BUCKET, Key="tts_audio/noprefix.mp3", Body=MP3)
+    time.sleep(1)  # LastModified 가 1초 단위라 새 업로드가 확실히 더 최근이 되도록
+    recent = upload(s3, "u1", "new")
+
+    # 인덱스 전에는 예전 음성이 사용자 목록에 없음
+    assert api.get("/tts_replay", params={"user_id": "u1", "limit": 10}).json()["items"][0]["s3_key"] == recent
+    assert len(api.get("/tts_replay", params={"user_id": "u1", "limit": 10}).json()["items"]) == 1
+
+    counts = backfill(s3, BUCKET)
+    assert counts == {"objects": 5, "recorded": 3, "existing": 1, "skipped": 1}
+    assert find_tts_audio(legacy[0])["size_bytes"] == len(MP3)
+
+    # 다시 돌려도 중복 등록 없음
+    assert backfill(s3, BUCKET)["recorded"] == 0
+
+    # 최신은 그대로 새 업로드, 예전 음성은 그 뒤 페이지로 이어짐
+    assert api.get("/tts_replay", params={"user_id": "u1"}).json()["s3_key"] == recent
+    first = api.get("/tts_replay", params={"user_id": "u1", "limit": 2}).json()
+    assert first["items"][0]["s3_key"] == recent and first["has_more"]
+    second = api.get("/tts_replay", params={"user_id": "u1", "limit": 2, "before": first["next_cursor"]}).json()
+    keys = [item["s3_key"] for item in first["items"] + second["items"]]
+    assert sorted(keys[1:]) == sorted(legacy)
+    assert not second["has_more"]
@@ -355,24 +355,42 @@ export default function EmotionConsumptionDiary() {
       setLoading(true);
       setError(null);
       
-      const [entriesResponse, analyticsResponse] = await Promise.all([
-        fetch(`https://eunbie.site/api/diary/entries/${user_id}`),
+      // 현재 월 데이터만 표시
+      const currentDate = new Date();
+      const currentYear = currentDate.getFullYear();
+      const currentMonth = currentDate.getMonth();
+      const monthStart = `${currentYear}-${String(currentMonth + 1).padStart(2, '0')}-01`;
+
+      // 최신순 페이지를 이번 달 이전 날짜가 나올 때까지만 불러오기
+      const loadCurrentMonthEntries = async () => {
+        const entries = [];
+        let cursor = null;
+        do {
+          const params = new URLSearchParams({ limit: '100', ...(cursor && { before: cursor }) });
+          const response = await fetch(`https://eunbie.site/api/diary/entries/${user_id}?${params}`);
+          if (!response.ok) {
+            throw new Error('API 서버에 연결할 수 없습니다.');
+          }
+          const page = await response.json();
+          entries.push(...(page.entries || []));
+          const last = entries[entries.length - 1];
+          cursor = last && last.date < monthStart ? null : page.next_cursor;
+        } while (cursor);
+        return entries;
+      };
+
+      const [entries, analyticsResponse] = await Promise.all([
+        loadCurrentMonthEntries(),
         fetch(`https://eunbie.site/api/diary/analytics/${user_id}`)
       ]);
 
-      if (!entriesResponse.ok || !analyticsResponse.ok) {
+      if (!analyticsResponse.ok) {
         throw new Error('API 서버에 연결할 수 없습니다.');
       }
 
-      const entriesData = await entriesResponse.json();
       const analyticsData = await analyticsResponse.json();
-
-      // 현재 월 데이터만 표시
-      const currentDate = new Date();
-      const currentYear = currentDate.getFullYear();
-      const currentMonth = currentDate.getMonth();
       
-      const filteredEntries = (entriesData.entries || []).filter(entry => {
+      const filteredEntries = entries.filter(entry => {
         const validatedDate = validateAndFixDate(entry.date);
         entry.date = validatedDate;
         
@@ -23,4 +23,26 @@ router.post('/', async (req, res) => {
   }
 });
 
+// 토큰 스트리밍 (SSE) - FastAPI /chat/stream 응답을 그대로 흘려보냄
+router.post('/stream', async (req, res) => {
+  try {
+    const fastApiUrl = process.env.FASTAPI_URL || 'http://localhost:3000';
+    const requestData = {
+      message: req.body.message,
+      user_id: req.body.user_id || 'default_user'
+    };
+
+    const upstream = await axios.post(`${fastApiUrl}/chat/stream`, requestData, { responseType: 'stream' });
+    res.setHeader('Content-Type', 'text/event-stream');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('X-Accel-Buffering', 'no');
+    res.flushHeaders();
+    upstream.data.pipe(res);
+    req.on('close', () => upstream.data.destroy());
+  } catch (err) {
+    console.error('FastAPI 스트리밍 프록시 오류:', err.message);
+    res.status(500).json({ error: 'FastAPI 서버 응답 실패' });
+  }
+});
+
 module.exports = router;
@@ -16,7 +16,8 @@ router.get('/entries/:userId', async (req, res) => {
     const fastApiUrl = process.env.FASTAPI_URL || 'http://localhost:3000';
     console.log('🔵 감정-소비 다이어리 조회:', req.params.userId);
      
-    const response = await axios.get(`${fastApiUrl}/diary/entries/${req.params.userId}`);
+    // limit / before(커서) 쿼리는 그대로 전달
+    const response = await axios.get(`${fastApiUrl}/diary/entries/${req.params.userId}`, { params: req.query });
     res.json(response.data);
   } catch (error) {
     console.error('다이어리 조회 에러:', error.message);